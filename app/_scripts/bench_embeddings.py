@@ -0,0 +1,81 @@
+"""
+Benchmark chunk embedding throughput: one model call per chunk (previous
+ingestion loop) against `Vectorizer.generate_embeddings_batch`.
+
+Usage:
+    python -m app._scripts.bench_embeddings [--n 512] [--batch-size 64]
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from app.rag import Vectorizer
+
+
+def synthetic_chunks(n: int, chunk_size: int, seed: int = 0) -> list[str]:
+    """
+    Generate chunks of random words, with lengths spread like a document tail
+
+    Args:
+        n (int): Number of chunks
+        chunk_size (int): Maximum number of characters per chunk
+        seed (int): Random seed. Default to 0
+
+    Returns:
+        list[str]: Chunks
+    """
+    rng = random.Random(seed)
+    words = ["data", "science", "master", "python", "lyon", "annecy", "ski",
+             "trampoline", "video", "programmation", "projet", "stage", "rag"]
+
+    chunks = []
+    for _ in range(n):
+        length = rng.randint(chunk_size // 4, chunk_size)
+        text = ""
+        while len(text) < length:
+            text += rng.choice(words) + " "
+        chunks.append(text[:length])
+
+    return chunks
+
+
+def bench(name: str, func, n: int) -> np.ndarray:
+    start = time.perf_counter()
+    embeddings = func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:8.2f} s {n / elapsed:10.1f} chunks/s")
+    return embeddings
+
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=512, help="Number of chunks")
+    parser.add_argument("--batch-size", type=int, default=64)
+    args = parser.parse_args()
+
+    vectorizer = Vectorizer()
+    chunks = synthetic_chunks(args.n, vectorizer.chunk_size)
+
+    # Warm up
+    vectorizer.generate_embeddings_batch(chunks[:args.batch_size], batch_size=args.batch_size)
+
+    # Model called directly: `generate_embeddings` would serve repeated chunks from `embedding_cache`
+    loop = bench(
+        "per chunk (before)",
+        lambda: np.asarray(
+            [vectorizer.model.encode(chunk, show_progress_bar=False) for chunk in chunks],
+            dtype=np.float32
+        ),
+        args.n
+    )
+    batched = bench(
+        "batch",
+        lambda: vectorizer.generate_embeddings_batch(chunks, args.batch_size),
+        args.n
+    )
+
+    print(f"max abs difference: {np.abs(loop - batched).max():.2e}")
@@ -0,0 +1,120 @@
+"""
+Benchmark PDF extraction and chunking: time and peak memory of the whole text
+(`ParsePDF` then `chunk_text`) against the streamed pages (`ParsePDF.iter_pages`
+then `chunk_stream`), in the current process or in worker processes, from a
+path or an uploaded file. Each mode runs in a fresh process so that its peak
+RSS is its own.
+
+Usage:
+    python -m app._scripts.bench_pdf [--pages 500] [--path file.pdf] [--workers 2 4]
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import pymupdf
+from werkzeug.datastructures import FileStorage
+
+from app.parser import ParsePDF
+from app.rag.vectorizer import Vectorizer
+
+
+def synthetic_pdf(path: str, pages: int, seed: int = 0) -> None:
+    """
+    Write a PDF of text pages
+
+    Args:
+        path (str): Output path
+        pages (int): Number of pages
+        seed (int): Random seed. Default to 0
+    """
+    rng = random.Random(seed)
+    words = [''.join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10))) for _ in range(2000)]
+
+    with pymupdf.open() as doc:
+        for _ in range(pages):
+            page = doc.new_page()
+            lines = [' '.join(rng.choices(words, k=12)) for _ in range(60)]
+            page.insert_text((40, 40), '\n'.join(lines), fontsize=8)
+        doc.save(path)
+
+
+def run_mode(mode: str, path: str, workers: int) -> dict:
+    """
+    Extract and chunk a PDF (in the current process)
+
+    Returns:
+        dict: chunks, seconds, peak RSS of the process and its increase during
+            the extraction (MB, worker processes excluded)
+    """
+    chunker = Vectorizer()
+    # Peak before extraction (interpreter, app and model)
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    match mode:
+        case "whole":
+            chunks = sum(1 for _ in chunker.chunk_text(ParsePDF(path)))
+        case "upload-whole":
+            with open(path, 'rb') as f:
+                chunks = sum(1 for _ in chunker.chunk_text(ParsePDF(FileStorage(f))))
+        case "stream":
+            chunks = sum(1 for _ in chunker.chunk_stream(ParsePDF.iter_pages(path, workers)))
+        case "upload-stream":
+            with open(path, 'rb') as f:
+                chunks = sum(1 for _ in chunker.chunk_stream(ParsePDF.iter_pages(FileStorage(f), workers)))
+        case _:
+            raise ValueError(f"Unknown mode '{mode}'")
+    seconds = time.perf_counter() - start
+
+    return {
+        "chunks": chunks,
+        "seconds": seconds,
+        "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "extra_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_rss) / 1024,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=500, help="Pages of the synthetic PDF")
+    parser.add_argument("--path", type=str, default=None, help="PDF to benchmark instead of a synthetic one")
+    parser.add_argument("--workers", type=int, nargs="*", default=[2, 4], help="Worker processes to compare")
+    parser.add_argument("--run", nargs=2, metavar=("MODE", "WORKERS"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run_mode(args.run[0], args.path, int(args.run[1]))))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path
+        if path is None:
+            path = os.path.join(tmp, "bench.pdf")
+            synthetic_pdf(path, args.pages)
+
+        with pymupdf.open(path) as doc:
+            print(f"{path}: {doc.page_count} pages, {os.path.getsize(path) / 1e6:.1f} MB, {os.cpu_count()} CPUs")
+
+        modes = [("whole", 0), ("stream", 0)] + [("stream", w) for w in args.workers] \
+            + [("upload-whole", 0), ("upload-stream", 0)]
+
+        print(f"{'mode':<14} {'workers':>7} {'chunks':>8} {'seconds':>8} {'peak MB':>8} {'extra MB':>9}")
+        for mode, workers in modes:
+            output = subprocess.run(
+                [sys.executable, "-m", "app._scripts.bench_pdf", "--path", path, "--run", mode, str(workers)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{mode:<14} {workers:>7} {result['chunks']:>8} {result['seconds']:>8.2f} {result['rss_mb']:>8.1f} {result['extra_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
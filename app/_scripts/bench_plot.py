@@ -0,0 +1,96 @@
+"""
+Benchmark the 3d scatterplot payload: size and encoding time of the full figure
+JSON, default (number lists) against compact (typed arrays) `Scatter3D`, with
+the stdlib and orjson encoders, and the size after gzip / brotli compression.
+
+Usage:
+    python -m app._scripts.bench_plot [--n 50000] [--k 10] [--repeat 5]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.plots import Scatter3D
+from app.plots import base_plot
+from app.services.compression import brotli, compress
+
+
+def synthetic_corpus(n: int, seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Generate chunk IDs and t-SNE like 3d projections (clusters)
+
+    Args:
+        n (int): Number of chunks
+        seed (int): Random seed. Default to 0
+
+    Returns:
+        np.ndarray: Chunk IDs (n,)
+        np.ndarray: Projections (n, 3)
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(scale=30, size=(max(n // 500, 1), 3))
+    coords = centers[rng.integers(len(centers), size=n)] + rng.normal(scale=4, size=(n, 3))
+
+    return np.arange(1, n + 1, dtype=np.int64), coords.astype(np.float32)
+
+
+def bench(scatter_3d: Scatter3D, ids: np.ndarray, coords: np.ndarray, k: int, repeat: int) -> tuple[str, float]:
+    """
+    Encode the full figure (chunks trace, layout and overlay) `repeat` times
+
+    Returns:
+        str: Figure JSON
+        float: Best encoding time in seconds
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fig_json = scatter_3d.combine(
+            scatter_3d.base_json(ids, coords),
+            scatter_3d.overlay_json(coords[:k], coords[0])
+        )
+        best = min(best, time.perf_counter() - start)
+
+    return fig_json, best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=50000, help="Number of chunks")
+    parser.add_argument("--k", type=int, default=10, help="Number of context chunks")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per configuration (best time kept)")
+    args = parser.parse_args()
+
+    ids, coords = synthetic_corpus(args.n)
+    orjson = base_plot.orjson
+
+    encoders = [("json", None)] + ([("orjson", orjson)] if orjson is not None else [])
+    print(f"{args.n} chunks, {args.k} context chunks"
+          + ("" if orjson is not None else " (orjson not installed)")
+          + ("" if brotli is not None else " (brotli not installed)"))
+    print(f"{'mode':<8} {'encoder':<7} {'encode ms':>10} {'bytes':>11} {'gzip':>10} {'gzip ms':>8} {'br':>10} {'br ms':>7}")
+
+    try:
+        for compact in (False, True):
+            for encoder_name, encoder in encoders:
+                base_plot.orjson = encoder
+                fig_json, seconds = bench(Scatter3D(compact=compact), ids, coords, args.k, args.repeat)
+                body = fig_json.encode()
+
+                row = f"{'compact' if compact else 'default':<8} {encoder_name:<7} {seconds * 1000:>10.1f} {len(body):>11,}"
+                for encoding in ("gzip", "br"):
+                    if encoding == "br" and brotli is None:
+                        row += f" {'-':>10} {'-':>7}"
+                        continue
+                    start = time.perf_counter()
+                    compressed, _ = compress(body, encoding)
+                    row += f" {len(compressed):>10,} {(time.perf_counter() - start) * 1000:>{8 if encoding == 'gzip' else 7}.1f}"
+                print(row)
+    finally:
+        base_plot.orjson = orjson
+
+
+if __name__ == "__main__":
+    main()
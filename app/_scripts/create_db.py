@@ -14,17 +14,29 @@ schema_statements = [
         id          INTEGER PRIMARY KEY,
         name        TEXT,
         category    TEXT,
-        url         TEXT
+        url         TEXT,
+        content_hash TEXT,
+        mtime       REAL,
+        size        INTEGER
     );
     """,
     """
     CREATE VIRTUAL TABLE IF NOT EXISTS Chunk
     USING vec0(
-        emb_384d        FLOAT[384],
+        emb_384d        FLOAT[384] distance_metric=cosine,
+        emb_int8        INT8[384] distance_metric=cosine,
+        emb_bit         BIT[384],
         emb_3d          FLOAT[3],
         content         TEXT,
         document_id     INTEGER
     );
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS ChunkSequence (
+        id          INTEGER PRIMARY KEY CHECK (id = 0),
+        last_id     INTEGER NOT NULL,
+        version     INTEGER NOT NULL
+    );
     """
 ]
 
@@ -1,17 +1,34 @@
+"""
+Feed the database with the documents of DATA_PATH/files.
+
+The files are compared with the stored documents (size and mtime, then content
+hash): unchanged files are skipped, new and modified ones are chunked and
+embedded, and the documents of removed files are deleted, in one transaction.
+The IVF index file is updated when it is the configured index (VECTOR_INDEX=ivf).
+
+Usage:
+    python -m app._scripts.feed_db                  # t-SNE refitted on every chunk after a change
+    python -m app._scripts.feed_db --incremental    # new chunks placed in the fitted t-SNE
+    python -m app._scripts.feed_db --incremental --refit
+"""
+
+import argparse
 import os
+import time
 from typing import Generator
 
-from app.models import Document, Chunk
-from app.database import db
-from app.rag import Vectorizer, Reductor
-from app.parser import ParsePDF, ParseMD
+from app.models import Document
+from app.database import db, DocumentDB
+from app.config import settings
+from app.rag import Vectorizer, Reductor, IVFIndex
+from app.ingestion import IngestionPipeline, IngestionProgress, Changes, diff_documents
 
-import numpy as np
+import sqlean as sqlite3
 
 
 def load_documents(path: str) -> Generator:
     """
-    Load documents from data/files
+    Load documents from a files directory
 
     Args:
         path (str): files directory (where the documents are stored)
@@ -23,66 +40,155 @@ def load_documents(path: str) -> Generator:
         category_path = os.path.join(path, category)
         for _, _, files in os.walk(category_path):
             for f in files:
+                file_path = os.path.join(category_path, f)
+                stat = os.stat(file_path)
                 document = Document(
                     name = ''.join(f.split('.')[:-1]), #type: ignore
-                    category = category
+                    category = category,
+                    mtime = stat.st_mtime,
+                    size = stat.st_size
                 )
-                yield (document, os.path.join(category_path, f))
+                yield (document, file_path)
 
 
-def parse_content(path: str) -> str:
+def fit_projections(document_db: DocumentDB, reductor: Reductor, conn: sqlite3.Connection) -> None:
     """
-    Load a file and parse its content
+    Fit the 3d reduction on all embeddings and store the projections
 
     Args:
-        path (str): The path of the file to parse
+        document_db (DocumentDB): Document database
+        reductor (Reductor): Reductor, its model is refitted and saved
+        conn (sqlite3.Connection): DB connection (writer)
+    """
+    chunk_ids, _, emb_384ds = document_db.get_embeddings(conn)
+    emb_3ds = reductor.fit_transform(emb_384ds)
+    document_db.set_projections(chunk_ids, emb_3ds, conn=conn)
+
+
+def print_summary(
+        changes: Changes,
+        chunk_counts: dict[int, int],
+        embedded: int,
+        deleted: int,
+        embed_time: float
+    ) -> None:
+    """
+    Print the changed files and an estimate of the time saved by skipping the unchanged ones
+    (their chunks at the embedding rate of this run)
+
+    Args:
+        changes (Changes): Differences between the files and the stored documents
+        chunk_counts (dict[int, int]): Stored chunks by document ID, before the changes
+        embedded (int): Number of chunks embedded
+        deleted (int): Number of chunks deleted
+        embed_time (float): Time spent reading, chunking and embedding, in seconds
+    """
+    skipped = sum(chunk_counts.get(document.id, 0) for document in changes.unchanged + changes.touched) #type: ignore
+
+    print(f"{len(changes.added)} added, {len(changes.modified)} modified, {len(changes.removed)} removed, "
+          f"{len(changes.unchanged) + len(changes.touched)} unchanged files")
+    print(f"{embedded} chunks embedded in {embed_time:.1f} s, {deleted} chunks deleted, {skipped} chunks kept")
+
+    if skipped and embedded:
+        print(f"Skipping the unchanged files saved ~{skipped * embed_time / embedded:.1f} s of embedding")
+
 
-    Returns:
-        str: the file content
+
+def feed(
+        path: str,
+        document_db: DocumentDB,
+        pipeline: IngestionPipeline,
+        reductor: Reductor,
+        incremental: bool = False,
+        refit: bool = False
+    ) -> None:
     """
-    ext = path.split('.')[-1]
-    match ext:
-        case 'txt':
-            with open(path, 'r') as f:
-                return f.read()
-        case 'pdf':
-            return ParsePDF(path)
-        case 'md':
-            return ParseMD.from_path(path)
-        case _:
-            raise ValueError(f"Impossible to parse '{ext}' files ({path})")
+    Synchronize the database with the documents of `path` (see `diff_documents`),
+    project the new chunks in 3d and update the IVF index (with VECTOR_INDEX=ivf).
+
+    Args:
+        path (str): files directory (where the documents are stored)
+        document_db (DocumentDB): Document database
+        pipeline (IngestionPipeline): Parsing, chunking and embedding pipeline
+        reductor (Reductor): 3d reduction
+        incremental (bool, optional): Place the new chunks in the fitted t-SNE, refitted only
+            past settings.PROJECTION_REFIT_DRIFT. Default to False (refit after any change)
+        refit (bool, optional): Refit the t-SNE on every chunk, even if nothing changed.
+            Default to False
+    """
+    start = time.perf_counter()
+
+    with document_db.writer(bulk=True) as conn:
+        version_before = document_db.get_chunk_version(conn)
+        chunk_counts = document_db.get_chunk_counts(conn)
+        changes = diff_documents(load_documents(path), document_db.get_document(conn))
+
+        # Remove the chunks of the removed and modified files, re-embed the new and modified ones
+        deleted = document_db.delete_documents([document.id for document in changes.removed], conn) #type: ignore
+        deleted += document_db.delete_chunks([document.id for document, _ in changes.modified], conn) #type: ignore
+        document_db.update_documents(
+            [document for document, _ in changes.modified] + changes.touched,
+            conn=conn
+        )
 
+        to_ingest = changes.added + changes.modified
+        progress = IngestionProgress(total_files=len(to_ingest))
+        new_ids = pipeline.run(to_ingest, conn, progress)
+        embed_time = progress.elapsed
 
+        print_summary(changes, chunk_counts, len(new_ids), deleted, embed_time)
+
+        if not (new_ids or deleted or refit):
+            print("Database up to date")
+            return
+
+        n_chunks, _ = document_db.get_chunk_stats(conn)
+        drift = reductor.drift(n_chunks, deleted)
+        refit = refit or not incremental or reductor.model is None or drift > settings.PROJECTION_REFIT_DRIFT
+
+        appended = None
+        if not n_chunks:
+            # Nothing to fit the t-SNE on, the previous model is kept
+            print("No chunks left, the t-SNE is not refitted")
+        elif refit:
+            print(f"Fitting the t-SNE on {n_chunks} chunks")
+            fit_projections(document_db, reductor, conn)
+        else:
+            # Place the new chunks in the fitted t-SNE, the stored projections are unchanged
+            print(f"Placing {len(new_ids)} chunks in the fitted t-SNE (drift {drift:.1%})")
+            if new_ids:
+                chunk_ids, document_ids, emb_384ds = document_db.get_embeddings(conn, min_id=new_ids[0])
+                document_db.set_projections(chunk_ids, reductor.transform(emb_384ds), conn=conn)
+                appended = (chunk_ids, document_ids, emb_384ds)
+
+        if settings.VECTOR_INDEX == 'ivf':
+            # Append the new chunks to the saved approximate index if up to date, else rebuild it
+            index = IVFIndex.read() if appended is not None and not deleted else None
+            if index is not None and index.version == version_before:
+                index.add(*appended)
+                index.version = document_db.get_chunk_version(conn)
+            else:
+                index = IVFIndex.from_db(document_db, conn)
+            index.save()
+
+    print(f"Done in {time.perf_counter() - start:.1f} s")
 
 if __name__ == '__main__':
-    document_db = db
-    vectorizer = Vectorizer()
-    reductor = Reductor()
-
-    with document_db.connect() as conn:
-        chunks: list[Chunk] = []
-        for document, path in load_documents('data/files'):
-            print(path)
-            # Create document in DB
-            doc_id = document_db.add_document(document, conn=conn)
-            # Read and chunk its content
-            document_content = parse_content(path)
-            chunks_content = vectorizer.chunk_text(document_content)
-            # Vectorize and create the chunks in DB            
-            for content in chunks_content:
-                emb_384d = vectorizer.generate_embeddings(content)
-                chunks.append(
-                    Chunk(
-                        document_id = doc_id,
-                        content = content,
-                        emb_384d = emb_384d,
-                        emb_3d=np.array([])
-                    )
-                )
-        
-        emb_384ds = np.asarray([chunk.emb_384d for chunk in chunks])
-        emb_3ds = reductor.fit_transform(emb_384ds)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    # Where the uploaded documents are stored too (see `IngestionService`)
+    parser.add_argument("--path", default=os.path.join(settings.DATA_PATH, "files"), help="Documents directory")
+    parser.add_argument("--incremental", action="store_true", help="Place the new chunks in the fitted t-SNE")
+    parser.add_argument("--refit", action="store_true", help="Refit the t-SNE on every chunk")
+    parser.add_argument("--workers", type=int, default=None, help="Parsing processes (0: no process pool)")
+    parser.add_argument("--queue-size", type=int, default=None, help="Documents parsed ahead of the embedding")
+    parser.add_argument("--batch-size", type=int, default=None, help="Chunks per embedding model call")
+    args = parser.parse_args()
 
-        for chunk, emb_3d in zip(chunks, emb_3ds):
-            chunk.emb_3d = emb_3d
-            document_db.add_chunk(chunk, conn=conn)
+    pipeline = IngestionPipeline(
+        Vectorizer(),
+        db,
+        parse_workers=args.workers,
+        queue_size=args.queue_size,
+        embed_batch_size=args.batch_size
+    )
+    feed(args.path, db, pipeline, Reductor(), incremental=args.incremental, refit=args.refit)
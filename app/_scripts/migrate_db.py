@@ -0,0 +1,166 @@
+"""
+Migrate an existing document.db to the current schema (see `create_db.py`).
+
+Missing Document columns are added (NULL for the existing rows). vec0 tables can
+neither be altered nor renamed, so the Chunk table is copied to a plain backup
+table, recreated with the current definition and refilled (row IDs are kept).
+Running the script on an up-to-date database is a no-op.
+
+Usage:
+    python -m app._scripts.migrate_db
+"""
+
+import numpy as np
+import sqlean as sqlite3
+import sqlite_vec
+
+from app.database import db
+
+
+CHUNK_SCHEMA = """
+CREATE VIRTUAL TABLE Chunk
+USING vec0(
+    emb_384d        FLOAT[384] distance_metric=cosine,
+    emb_int8        INT8[384] distance_metric=cosine,
+    emb_bit         BIT[384],
+    emb_3d          FLOAT[3],
+    content         TEXT,
+    document_id     INTEGER
+);
+"""
+
+# Columns added to the Document table since its creation, with their type
+DOCUMENT_COLUMNS = {
+    "content_hash": "TEXT",
+    "mtime": "REAL",
+    "size": "INTEGER",
+}
+
+
+def get_chunk_schema(conn: sqlite3.Connection) -> str:
+    """
+    Read the current Chunk table definition
+
+    Args:
+        conn (sqlite3.Connection): DB connection
+
+    Returns:
+        str: CREATE statement of the Chunk table
+    """
+    row = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'Chunk'"
+    ).fetchone()
+
+    if row is None:
+        raise ValueError("No Chunk table found, run `_scripts/create_db.py` first")
+
+    return row[0]
+
+
+def needs_rebuild(schema: str) -> bool:
+    """
+    Check if the Chunk table must be recreated
+
+    Args:
+        schema (str): Current Chunk table definition
+
+    Returns:
+        bool: True if the table is missing the cosine KNN index or the quantized embeddings
+    """
+    required = ("distance_metric=cosine", "emb_int8", "emb_bit")
+    return any(fragment not in schema for fragment in required)
+
+
+def add_document_columns(conn: sqlite3.Connection) -> list[str]:
+    """
+    Add the source file state columns (content hash, mtime and size) to the Document table
+
+    Args:
+        conn (sqlite3.Connection): DB connection
+
+    Returns:
+        list[str]: Added columns
+    """
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(Document)")}
+    added = [column for column in DOCUMENT_COLUMNS if column not in existing]
+
+    with conn:
+        for column in added:
+            conn.execute(f"ALTER TABLE Document ADD COLUMN {column} {DOCUMENT_COLUMNS[column]}")
+
+    return added
+
+
+def rebuild_chunk_table(conn: sqlite3.Connection, batch_size: int = 1000) -> int:
+    """
+    Recreate the Chunk table with the current schema, keeping its rows. The quantized
+    embeddings are computed from emb_384d.
+
+    Args:
+        conn (sqlite3.Connection): DB connection
+        batch_size (int, optional): Number of rows inserted at once. Default to 1000
+
+    Returns:
+        int: Number of migrated chunks
+    """
+    count = 0
+
+    with conn:
+        conn.execute("DROP TABLE IF EXISTS ChunkBackup")
+        conn.execute(
+            """
+            CREATE TABLE ChunkBackup AS
+            SELECT rowid AS id, emb_384d, emb_3d, content, document_id
+            FROM Chunk
+            """
+        )
+        conn.execute("DROP TABLE Chunk")
+        conn.execute(CHUNK_SCHEMA)
+
+        rows = conn.execute(
+            "SELECT id, emb_384d, emb_3d, content, document_id FROM ChunkBackup ORDER BY id"
+        )
+        while batch := rows.fetchmany(batch_size):
+            emb_384ds = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in batch])
+            emb_int8s = db.quantize(emb_384ds, 'int8')
+            emb_bits = db.quantize(emb_384ds, 'bit')
+
+            conn.executemany(
+                """
+                INSERT INTO Chunk (rowid, emb_384d, emb_int8, emb_bit, emb_3d, content, document_id)
+                VALUES (?, ?, vec_int8(?), vec_bit(?), ?, ?, ?)
+                """,
+                [
+                    (id, emb_384d, emb_int8.tobytes(), emb_bit.tobytes(), emb_3d, content, document_id)
+                    for (id, emb_384d, emb_3d, content, document_id), emb_int8, emb_bit
+                    in zip(batch, emb_int8s, emb_bits)
+                ]
+            )
+            count += len(batch)
+
+        conn.execute("DROP TABLE ChunkBackup")
+
+    return count
+
+
+if __name__ == '__main__':
+    conn = sqlite3.connect(db.db_path)
+    conn.enable_load_extension(True)
+    sqlite_vec.load(conn)
+
+    migrated = False
+
+    if added := add_document_columns(conn):
+        print(f"Added {', '.join(added)} to the Document table")
+        migrated = True
+
+    if needs_rebuild(get_chunk_schema(conn)):
+        count = rebuild_chunk_table(conn)
+        conn.execute("VACUUM")
+        print(f"Migrated {count} chunks to the current Chunk schema")
+        migrated = True
+
+    if not migrated:
+        print("Database already up to date")
+
+    conn.close()
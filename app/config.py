@@ -5,6 +5,7 @@ This module exposes a singleton `settings` instance that can be imported
 throughout the project (e.g., from app.config import settings).
 """
 
+from typing import Literal
 from pydantic import SecretStr, Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -22,7 +23,105 @@ class Settings(BaseSettings):
 
     DATA_PATH: str = "data/"
 
+    # Read-only SQLite connection pool (mmap_size in bytes, negative cache_size in KiB)
+    DB_POOL_SIZE: int = 4
+    DB_POOL_TIMEOUT: float|None = 30
+    DB_MMAP_SIZE: int = 256 * 1024 * 1024
+    DB_CACHE_SIZE: int = -64 * 1024
+    # Rows per executemany in DocumentDB bulk methods
+    INGEST_BATCH_SIZE: int = 512
+    # Ingestion pipeline: parsing processes (None for one per CPU, 0 to parse in the main
+    # process), parsed documents queued ahead of the embedding stage, chunks per model call
+    # and seconds between two progress reports
+    INGEST_PARSE_WORKERS: int|None = None
+    INGEST_QUEUE_SIZE: int = 16
+    INGEST_EMBED_BATCH_SIZE: int = 64
+    INGEST_PROGRESS_INTERVAL: float = 10
+    # PDF pages are extracted lazily, by ranges of PDF_PAGES_PER_TASK pages in PDF_PAGE_WORKERS
+    # processes (0 to extract them in the ingestion process). `feed_db` only, uploads are always
+    # extracted in the server process
+    PDF_PAGE_WORKERS: int = 0
+    PDF_PAGES_PER_TASK: int = 16
+    # Uploaded documents are ingested by one background worker (the only writer), at most
+    # INGEST_JOB_QUEUE_SIZE jobs wait, embedded INGEST_JOB_BATCH_SIZE chunks at a time to keep
+    # the chat latency stable. The last INGEST_JOBS_KEPT finished jobs can be queried
+    INGEST_JOB_QUEUE_SIZE: int = 32
+    INGEST_JOB_BATCH_SIZE: int = 16
+    INGEST_JOBS_KEPT: int = 100
+
+    # Threads running the CPU-bound request stages (embedding, KNN, reranking, projection)
+    CPU_WORKERS: int = 2
+
+    # Query embeddings LRU cache (size 0 disables it, TTL in seconds)
+    EMBEDDING_CACHE_SIZE: int = 1024
+    EMBEDDING_CACHE_TTL: float|None = 3600
+    # Chunks resolved from the contexts chunk references (LRU, cleared when the DB changes)
+    CHUNK_CACHE_SIZE: int = 2048
+
+    # Semantic cache of first-turn answers (opt-in), a hit needs a cosine similarity
+    # of at least ANSWER_CACHE_THRESHOLD with a previous question (TTL in seconds)
+    ANSWER_CACHE: bool = False
+    ANSWER_CACHE_SIZE: int = 256
+    ANSWER_CACHE_THRESHOLD: float = .95
+    ANSWER_CACHE_TTL: float|None = 86400
+
+    # Vector search backend: 'sqlite' (vec0 KNN query), 'flat' (in-memory NumPy index)
+    # or 'ivf' (approximate in-memory index, persisted under DATA_PATH)
+    VECTOR_INDEX: Literal["sqlite", "flat", "ivf"] = "sqlite"
+    # 'sqlite' backend query: 'knn' (vec0 index, falls back to 'scan' on a database that was not
+    # migrated to the cosine metric) or 'scan' (exact distance over every chunk)
+    SQLITE_SEARCH_MODE: Literal["knn", "scan"] = "knn"
+    IVF_NLIST: int|None = None
+    IVF_NPROBE: int = 8
+    # First search pass over 'int8' or 'bit' embeddings ('sqlite' and 'flat' backends),
+    # the `k * QUANTIZATION_OVERSAMPLE` candidates are rescored with the float32 embeddings
+    EMBEDDING_QUANTIZATION: Literal["none", "int8", "bit"] = "none"
+    QUANTIZATION_OVERSAMPLE: int = 4
+
+    # Query placement in the 3d plot: 'interpolate' (weighted mean of the nearest chunks
+    # projections), 'parametric' (ridge mapper fitted with the t-SNE) or 'exact' (openTSNE transform)
+    PROJECTION_MODE: Literal["interpolate", "parametric", "exact"] = "interpolate"
+    PROJECTION_NEIGHBORS: int = 10
+
+    # Incremental ingestion places the new chunks in the fitted t-SNE (openTSNE transform), the
+    # t-SNE is refitted on every chunk once more than PROJECTION_REFIT_DRIFT of them were placed so
+    PROJECTION_REFIT_DRIFT: float = .2
+
+    # Plot payloads: typed arrays (base64, needs plotly.js >= 2.28) instead of number lists if
+    # PLOT_COMPACT, compressed (br if the brotli package is installed, else gzip) above
+    # PLOT_COMPRESS_MIN_SIZE bytes
+    PLOT_COMPACT: bool = False
+    PLOT_COMPRESS_MIN_SIZE: int = 1024
+
     MISTRAL_API_KEY: SecretStr = Field(..., alias="mistral_api_key")
+    # Mistral API endpoint (None for the official one), shared connection pool and timeouts in seconds
+    MISTRAL_SERVER_URL: str|None = None
+    MISTRAL_POOL_SIZE: int = 100
+    MISTRAL_KEEPALIVE: float = 30
+    MISTRAL_TIMEOUT: float = 60
+    # Chat sessions: idle ones expire after SESSION_TTL seconds (swept every SESSION_SWEEP_INTERVAL),
+    # the least recently used ones are evicted above SESSION_MAX. Each session keeps its last
+    # SESSION_MAX_CONTEXTS RAG contexts
+    SESSION_MAX: int = 1000
+    SESSION_TTL: float|None = 3600
+    SESSION_SWEEP_INTERVAL: float = 60
+    SESSION_MAX_CONTEXTS: int = 20
+    # Session store: 'memory' (one worker process) or 'sqlite' (shared by the workers, under
+    # DATA_PATH, with SESSION_CACHE_SIZE sessions cached per process)
+    SESSION_BACKEND: Literal["memory", "sqlite"] = "memory"
+    SESSION_CACHE_SIZE: int = 128
+
+    # Conversation history sent to the LLM: the system prompt, the last HISTORY_MAX_EXCHANGES
+    # exchanges within HISTORY_MAX_TOKENS (estimated, ~4 characters per token) and, if
+    # HISTORY_SUMMARY is set, a rolling summary of the older exchanges
+    HISTORY_MAX_TOKENS: int = 6000
+    HISTORY_MAX_EXCHANGES: int = 6
+    HISTORY_SUMMARY: bool = False
+    HISTORY_SUMMARY_MAX_TOKENS: int = 300
+    HISTORY_SUMMARY_PROMPT: str = (
+        "Résume en quelques phrases la conversation suivante entre un utilisateur et toi (assistant). "
+        "Garde les informations utiles pour la suite : questions posées, faits donnés, préférences de l'utilisateur."
+    )
     SYSTEM_PROMPT: str = """
 Tu es Marin NAGY, étudiant en 2ᵉ année de master SISE (data science) à Lyon. Réponds de manière très brève aux SMS de l'utilisateur en le vouvoyant.
 
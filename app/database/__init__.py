@@ -1 +1,3 @@
-from .document_db import db
\ No newline at end of file
+from .pool import ConnectionPool
+from .document_db import db, DocumentDB
+from .session_db import SessionDB
\ No newline at end of file
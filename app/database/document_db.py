@@ -1,22 +1,53 @@
 import os
+import threading
 import numpy as np
+from contextlib import contextmanager
+from itertools import islice
+from typing import Iterable, Iterator, Literal, TypeVar
 
 from app.config import settings
 from app.models import Document, Chunk
+from app.database.pool import ConnectionPool
 
 import sqlean as sqlite3
 import sqlite_vec
 
 
+T = TypeVar("T")
+
 
 class DocumentDB:
 
     path = 'db/document.db'
+    max_distance = 0.65
+
+    # Single row: highest chunk ID ever assigned (IDs are never reused, even after
+    # deletes) and version of the chunk set, bumped whenever chunks are added or deleted
+    chunk_sequence_schema = """
+    CREATE TABLE IF NOT EXISTS ChunkSequence (
+        id          INTEGER PRIMARY KEY CHECK (id = 0),
+        last_id     INTEGER NOT NULL,
+        version     INTEGER NOT NULL
+    )
+    """
+
+    # Document columns of the source file state, added by `_scripts/migrate_db.py`
+    file_state_columns = ('content_hash', 'mtime', 'size')
+
+    # Chunk column, dtype and dimension of each embedding representation
+    embedding_columns = {
+        'none': ('emb_384d', np.float32, 384),
+        'int8': ('emb_int8', np.int8, 384),
+        'bit': ('emb_bit', np.uint8, 48),
+    }
 
     def __init__(self) -> None:
         root = settings.DATA_PATH
         self.db_path = os.path.join(root, self.path)
 
+        self._pool: ConnectionPool|None = None
+        self._pool_lock = threading.Lock()
+
     @staticmethod
     def _vecf32_converter(blob:bytes) -> np.ndarray:
         """
@@ -30,19 +61,170 @@ class DocumentDB:
         """
 
         return np.frombuffer(blob, dtype=np.float32).copy()
+
+    @staticmethod
+    def quantize(embedding: np.ndarray, quantization: Literal["int8", "bit"]) -> np.ndarray:
+        """
+        Compute the compact representation of one or several embeddings.
+
+        'int8' scales each vector by its own max absolute value: cosine similarity is
+        scale invariant, so this uses the whole int8 range without a global calibration.
+        'bit' keeps the sign of each dimension, packed 8 per byte (sqlite-vec bit order).
+
+        Args:
+            embedding (np.ndarray): Vector (d,) or matrix (n, d) to quantize
+            quantization (str): 'int8' or 'bit'
+
+        Returns:
+            np.ndarray: int8 (..., d) or uint8 (..., d / 8) codes
+        """
+        embedding = np.asarray(embedding, dtype=np.float32)
+
+        match quantization:
+            case 'int8':
+                scale = np.abs(embedding).max(axis=-1, keepdims=True)
+                scale[scale == 0] = 1
+                return np.round(embedding / scale * 127).astype(np.int8)
+            case 'bit':
+                return np.packbits(embedding > 0, axis=-1, bitorder='little')
+            case _:
+                raise ValueError(f"Invalid quantization parameter '{quantization}', expected 'int8' or 'bit'")
     
-    def connect(self) -> sqlite3.Connection:
+    def connect(self, readonly: bool = False) -> sqlite3.Connection:
         """
-        Create a connection to the database
+        Create a connection to the database, with sqlite-vec loaded and tuned PRAGMAs
+
+        Args:
+            readonly (bool, optional): Open the database in read-only mode. Default to False
 
         Returns:
             sqlite3.Connection: DB connection
         """
 
-        conn = sqlite3.connect(self.db_path, detect_types=sqlite3.PARSE_DECLTYPES)
+        if readonly:
+            conn = sqlite3.connect(
+                f"file:{self.db_path}?mode=ro",
+                uri=True,
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                check_same_thread=False
+            )
+        else:
+            conn = sqlite3.connect(
+                self.db_path,
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                check_same_thread=False
+            )
+
         conn.enable_load_extension(True)
         sqlite_vec.load(conn) 
+        conn.enable_load_extension(False)
+
+        conn.row_factory = sqlite3.Row
+        conn.execute(f"PRAGMA mmap_size = {int(settings.DB_MMAP_SIZE)}")
+        conn.execute(f"PRAGMA cache_size = {int(settings.DB_CACHE_SIZE)}")
+        if readonly:
+            conn.execute("PRAGMA query_only = ON")
+
         return conn
+
+    @property
+    def pool(self) -> ConnectionPool:
+        """Lazy initialization of the read-only connection pool."""
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self.__enable_wal()
+                    self._pool = ConnectionPool(
+                        factory=lambda: self.connect(readonly=True),
+                        size=settings.DB_POOL_SIZE,
+                        timeout=settings.DB_POOL_TIMEOUT
+                    )
+
+        return self._pool
+
+    def __enable_wal(self) -> None:
+        """
+        Switch the database to WAL so readers never block on (nor block) the writer.
+        The journal mode is persistent, it only needs to be set once per file.
+        """
+        try:
+            conn = self.connect()
+            try:
+                conn.execute("PRAGMA journal_mode = WAL")
+            finally:
+                conn.close()
+        except sqlite3.OperationalError as e:
+            # Read-only deployment: keep the current journal mode
+            print(f"Could not enable WAL on '{self.db_path}': {e}")
+
+    @contextmanager
+    def reader(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a read-only connection from the pool
+
+        Yields:
+            sqlite3.Connection: Read-only DB connection
+        """
+        with self.pool.connection() as conn:
+            yield conn
+
+    @contextmanager
+    def writer(self, bulk: bool = False) -> Iterator[sqlite3.Connection]:
+        """
+        Open a dedicated writer connection (ingestion scripts), committed on
+        success, rolled back on error and closed on exit
+
+        Args:
+            bulk (bool, optional): Trade durability for speed while bulk loading
+                (`synchronous=OFF`, `journal_mode=MEMORY`), WAL is restored on exit.
+                Default to False
+
+        Yields:
+            sqlite3.Connection: DB connection
+        """
+        conn = self.connect()
+        conn.execute("PRAGMA foreign_keys = ON")
+        if bulk:
+            conn.execute("PRAGMA synchronous = OFF")
+            conn.execute("PRAGMA journal_mode = MEMORY")
+        else:
+            conn.execute("PRAGMA journal_mode = WAL")
+
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            if bulk:
+                conn.execute("PRAGMA journal_mode = WAL")
+            conn.close()
+
+    def close(self) -> None:
+        """
+        Close the connection pool
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
+    def signature(self) -> tuple:
+        """
+        Cheap fingerprint of the database files, changes whenever the DB is written
+
+        Returns:
+            tuple: (mtime, size) of the database file and its WAL file
+        """
+        stats = []
+        for suffix in ('', '-wal'):
+            try:
+                stat = os.stat(self.db_path + suffix)
+                stats.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stats.append(None)
+
+        return tuple(stats)
     
     # --------- GET methods
 
@@ -55,11 +237,10 @@ class DocumentDB:
             conn (sqlite3.Connection): DB connection
 
         Returns:
-            list[Document]: Retrived document objects
+            list[Document]: Retrived document objects, without source file state (None)
+                until `_scripts/migrate_db.py` has been run on an older database
         """
         with conn:
-            conn.row_factory = sqlite3.Row
-
             sql_query = "SELECT * from Document"
             params = []
 
@@ -75,7 +256,8 @@ class DocumentDB:
                     id=row['id'],
                     name=row['name'],
                     category=row['category'],
-                    url=row['url']
+                    url=row['url'],
+                    **{column: row[column] for column in self.file_state_columns if column in row.keys()}
                 ) for row in rows
             ]
         
@@ -91,15 +273,13 @@ class DocumentDB:
             list[Chunk]: Retrieved chunk objects
         """
         with conn:
-            conn.row_factory = sqlite3.Row
-
             sql_query = "SELECT * from Chunk"
             params = []
 
             if ids:
                 params = ids
                 placeholders = ",".join("?" for _ in ids)
-                sql_query += f" WHERE id IN ({placeholders})"
+                sql_query += f" WHERE rowid IN ({placeholders})"
 
             rows = conn.execute(sql_query, params).fetchall()
 
@@ -113,11 +293,226 @@ class DocumentDB:
                 ) for row in rows
             ]
     
-    def get_k_nearest(
+    def has_cosine_knn(self, conn: sqlite3.Connection) -> bool:
+        """
+        Check that the Chunk vec0 table was created with the cosine distance metric (and
+        the quantized embeddings), i.e. that KNN distances compare with `max_distance`
+
+        Args:
+            conn (sqlite3.Connection): DB connection
+
+        Returns:
+            bool: False until `_scripts/migrate_db.py` has been run on an older database
+        """
+        row = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'Chunk'"
+        ).fetchone()
+
+        if row is None:
+            return False
+
+        schema = " ".join(row[0].split())
+        return all(
+            fragment in schema
+            for fragment in ("emb_384d FLOAT[384] distance_metric=cosine", "emb_int8", "emb_bit")
+        )
+
+    def get_file_state_columns(self, conn: sqlite3.Connection) -> list[str]:
+        """
+        List the source file state columns of the Document table
+
+        Args:
+            conn (sqlite3.Connection): DB connection
+
+        Returns:
+            list[str]: Columns of `file_state_columns` present, none until
+                `_scripts/migrate_db.py` has been run on an older database
+        """
+        columns = {row['name'] for row in conn.execute("PRAGMA table_info(Document)")}
+        return [column for column in self.file_state_columns if column in columns]
+
+    def get_chunk_stats(self, conn: sqlite3.Connection) -> tuple[int, int|None]:
+        """
+        Count the chunks and get the highest chunk ID
+
+        Args:
+            conn (sqlite3.Connection): DB connection
+
+        Returns:
+            tuple[int, int|None]: Number of chunks and highest chunk ID
+        """
+        with conn:
+            count, max_id = conn.execute("SELECT count(*), max(rowid) FROM Chunk").fetchone()
+            return count, max_id
+
+    def get_chunk_version(self, conn: sqlite3.Connection) -> int:
+        """
+        Version of the chunk set, changes whenever chunks are added or deleted (unlike
+        the number of chunks and the highest chunk ID, after a delete and re-add)
+
+        Args:
+            conn (sqlite3.Connection): DB connection
+
+        Returns:
+            int: Chunk version, 0 if the chunks were never written through `DocumentDB`
+        """
+        try:
+            row = conn.execute("SELECT version FROM ChunkSequence").fetchone()
+        except sqlite3.OperationalError:
+            # Database created before the sequence table, it is created on the first write
+            return 0
+
+        return row[0] if row is not None else 0
+
+    def get_chunk_counts(self, conn: sqlite3.Connection) -> dict[int, int]:
+        """
+        Count the chunks of each document
+
+        Args:
+            conn (sqlite3.Connection): DB connection
+
+        Returns:
+            dict[int, int]: Number of chunks by document ID
+        """
+        with conn:
+            rows = conn.execute("SELECT document_id, count(*) FROM Chunk GROUP BY document_id")
+            return {document_id: count for document_id, count in rows}
+
+    def get_embeddings(
+                self,
+                conn: sqlite3.Connection,
+                quantization: Literal["none", "int8", "bit"] = "none",
+                min_id: int|None = None
+            ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Retrieve every chunk embedding as one contiguous matrix
+
+        Args:
+            conn (sqlite3.Connection): DB connection
+            quantization (str, optional): 'none' for float32 embeddings, 'int8' or 'bit'
+                for their compact codes. Default to 'none'
+            min_id (int, optional): Only the chunks from this ID (e.g. the chunks just
+                added). Default to None (every chunk)
+
+        Returns:
+            np.ndarray: Chunk IDs (n,)
+            np.ndarray: Document IDs (n,)
+            np.ndarray: float32 (n, 384), int8 (n, 384) or packed bits uint8 (n, 48) embeddings
+        """
+        column, dtype, dim = self.embedding_columns[quantization]
+        return self._get_matrix(conn, column, dtype, dim, min_id)
+
+    def get_projections(self, conn: sqlite3.Connection) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Retrieve every chunk 3d projection (emb_3d) as one contiguous matrix, without
+        reading the 384d embeddings nor the content
+
+        Args:
+            conn (sqlite3.Connection): DB connection
+
+        Returns:
+            np.ndarray: Chunk IDs (n,)
+            np.ndarray: Document IDs (n,)
+            np.ndarray: float32 (n, 3) projections
+        """
+        return self._get_matrix(conn, 'emb_3d', np.float32, 3)
+
+    def _get_matrix(
+                self,
+                conn: sqlite3.Connection,
+                column: str,
+                dtype: type,
+                dim: int,
+                min_id: int|None = None
+            ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # No `with conn`: called within ingestion transactions, that must not be committed here
+        where, params = ("WHERE rowid >= ?", (min_id,)) if min_id is not None else ("", ())
+        count = conn.execute(f"SELECT count(*) FROM Chunk {where}", params).fetchone()[0]
+        rows = conn.execute(f"SELECT rowid, document_id, {column} FROM Chunk {where}", params)
+
+        chunk_ids = np.empty(count, dtype=np.int64)
+        document_ids = np.empty(count, dtype=np.int64)
+        embeddings = np.empty((count, dim), dtype=dtype)
+
+        n = 0
+        for n, (chunk_id, document_id, embedding) in enumerate(rows, start=1):
+            chunk_ids[n - 1] = chunk_id
+            document_ids[n - 1] = document_id
+            embeddings[n - 1] = np.frombuffer(embedding, dtype=dtype)
+
+        return chunk_ids[:n], document_ids[:n], embeddings[:n]
+
+    def get_distances(
+                self,
+                embedding: np.ndarray,
+                ids: list[int],
+                conn: sqlite3.Connection
+            ) -> dict[int, float]:
+        """
+        Compute the exact cosine distance between an embedding and some chunks
+
+        Args:
+            embedding (np.ndarray): Embedding to compute cosinus distance with
+            ids (list[int]): Chunk IDs
+            conn (sqlite3.Connection): DB connection
+
+        Returns:
+            dict[int, float]: Distance of each chunk ID
+        """
+        if not ids:
+            return {}
+
+        placeholders = ",".join("?" for _ in ids)
+
+        with conn:
+            rows = conn.execute(
+                f"""
+                SELECT rowid, vec_distance_cosine(emb_384d, vec_f32(?))
+                FROM Chunk
+                WHERE rowid IN ({placeholders})
+                """,
+                (embedding.astype("float32").tobytes(), *ids)
+            )
+
+            return dict(rows.fetchall())
+
+    def get_nearest_ids(
                 self,
                 embedding: np.ndarray,
                 k: int,
                 conn: sqlite3.Connection
+            ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Get the IDs and distances of the k nearest chunks (vec0 KNN query), without
+        distance cutoff nor reading the chunks
+
+        Args:
+            embedding (np.ndarray): Embedding to compute cosinus distance with
+            k (int): Number of chunks to retrieve
+            conn (sqlite3.Connection): DB connection
+
+        Returns:
+            np.ndarray: Chunk IDs (k,), nearest first
+            np.ndarray: Cosine distances (k,)
+        """
+        with conn:
+            rows = conn.execute(
+                "SELECT rowid, distance FROM Chunk WHERE emb_384d MATCH ? AND k = ? ORDER BY distance",
+                (embedding.astype("float32").tobytes(), k)
+            ).fetchall()
+
+        ids = np.asarray([row[0] for row in rows], dtype=np.int64)
+        distances = np.asarray([row[1] for row in rows], dtype=np.float32)
+        return ids, distances
+
+    def get_k_nearest(
+                self,
+                embedding: np.ndarray,
+                k: int,
+                conn: sqlite3.Connection,
+                mode: Literal["knn", "scan"] = "knn",
+                quantization: Literal["none", "int8", "bit"] = "none",
+                oversample: int = 4
             ) -> list[Chunk]:
         """
         Get the k nearest document chunks from a given embedding
@@ -126,6 +521,13 @@ class DocumentDB:
             embeddings (np.ndarray): Embedding to compute cosinus distance with
             k (int): Number of chunks to retrieve
             conn (sqlite3.Connection): DB conneciton
+            mode (str, optional): 'knn' to query the vec0 index (requires the cosine
+                distance metric, see `_scripts/migrate_db.py`) or 'scan' to compute
+                the distance over every chunk. Default to 'knn'
+            quantization (str, optional): In 'knn' mode, run the first pass over the
+                'int8' or 'bit' embeddings and rescore `k * oversample` candidates with
+                the exact float32 distance. Default to 'none'
+            oversample (int, optional): Candidates factor for quantized search. Default to 4
 
         Return:
             list[Chunk]: The list of nearest chunks
@@ -133,28 +535,80 @@ class DocumentDB:
 
         embedding_blob = embedding.astype("float32").tobytes()
 
-        with conn:
-            conn.row_factory = sqlite3.Row
-
-            query = f"""
-            SELECT
-                c.rowid,
-                c.document_id,
-                c.content,
-                c.emb_384d,
-                c.emb_3d,
-                vec_distance_cosine(c.emb_384d, vec_f32(?)) AS query_distance,
-                d.name as source_name,
-                d.category as source_category,
-                d.url as source_url
-            FROM Chunk AS c
-            JOIN Document AS d ON c.document_id = d.id
-            WHERE query_distance <= 0.65
-            ORDER BY query_distance
-            LIMIT {k}
-            """
+        columns = """
+                    c.rowid,
+                    c.document_id,
+                    c.content,
+                    c.emb_384d,
+                    c.emb_3d,
+                    d.name as source_name,
+                    d.category as source_category,
+                    d.url as source_url
+        """
+
+        match mode, quantization:
+            case 'knn', 'none':
+                # Only the k survivors of the vec0 KNN are joined and filtered
+                query = f"""
+                WITH knn AS (
+                    SELECT rowid, distance
+                    FROM Chunk
+                    WHERE emb_384d MATCH ? AND k = ?
+                )
+                SELECT
+                    {columns},
+                    knn.distance AS query_distance
+                FROM knn
+                JOIN Chunk AS c ON c.rowid = knn.rowid
+                JOIN Document AS d ON c.document_id = d.id
+                WHERE query_distance <= ?
+                ORDER BY query_distance
+                """
+                params = (embedding_blob, k, self.max_distance)
+            case 'knn', 'int8' | 'bit':
+                # Compact first pass, exact float32 rescoring of the candidates only
+                column = self.embedding_columns[quantization][0]
+                vec_type = 'vec_int8' if quantization == 'int8' else 'vec_bit'
+                query = f"""
+                WITH candidates AS (
+                    SELECT rowid
+                    FROM Chunk
+                    WHERE {column} MATCH {vec_type}(?) AND k = ?
+                )
+                SELECT
+                    {columns},
+                    vec_distance_cosine(c.emb_384d, vec_f32(?)) AS query_distance
+                FROM candidates
+                JOIN Chunk AS c ON c.rowid = candidates.rowid
+                JOIN Document AS d ON c.document_id = d.id
+                WHERE query_distance <= ?
+                ORDER BY query_distance
+                LIMIT ?
+                """
+                params = (
+                    self.quantize(embedding, quantization).tobytes(),
+                    k * oversample,
+                    embedding_blob,
+                    self.max_distance,
+                    k
+                )
+            case 'scan', _:
+                query = f"""
+                SELECT
+                    {columns},
+                    vec_distance_cosine(c.emb_384d, vec_f32(?)) AS query_distance
+                FROM Chunk AS c
+                JOIN Document AS d ON c.document_id = d.id
+                WHERE query_distance <= ?
+                ORDER BY query_distance
+                LIMIT {k}
+                """
+                params = (embedding_blob, self.max_distance)
+            case _:
+                raise ValueError(f"Invalid mode '{mode}' or quantization '{quantization}'")
 
-            rows = conn.execute(query, (embedding_blob,))
+        with conn:
+            rows = conn.execute(query, params)
 
             chunks = [
                 Chunk(
@@ -205,28 +659,262 @@ class DocumentDB:
 
     def add_chunk(self, chunk: Chunk, conn: sqlite3.Connection) -> int:
         """
-        Write a list of chunks in the database
+        Write a chunk in the database
 
         Args:
-            chunks Chunk: List of chunks to add
+            chunk (Chunk): Chunk to add
 
         Return:
          int: The created chunk ID
         """
 
         with conn:
-            cur = conn.execute(
+            id, = self.add_chunks([chunk], conn)
+            return id
+
+    def _bump_chunk_version(self, conn: sqlite3.Connection, count: int = 0) -> int:
+        """
+        Bump the chunk version and reserve `count` new chunk IDs (see `chunk_sequence_schema`)
+
+        Args:
+            conn (sqlite3.Connection): DB connection (writer)
+            count (int, optional): Number of chunk IDs to reserve. Default to 0
+
+        Returns:
+            int: First reserved chunk ID
+        """
+        conn.execute(self.chunk_sequence_schema)
+
+        row = conn.execute("SELECT last_id FROM ChunkSequence").fetchone()
+        if row is not None:
+            last_id = row[0]
+        else:
+            # First write through the sequence, start after the existing chunks
+            last_id = conn.execute("SELECT coalesce(max(rowid), 0) FROM Chunk").fetchone()[0]
+
+        conn.execute(
+            """
+            INSERT INTO ChunkSequence (id, last_id, version) VALUES (0, ?, 1)
+            ON CONFLICT (id) DO UPDATE SET last_id = excluded.last_id, version = version + 1
+            """,
+            (last_id + count,)
+        )
+
+        return last_id + 1
+
+    # --------- BULK methods
+    # Bulk methods don't commit: every batch is written in the caller's transaction
+    # (see `writer`), which is committed once at the end of the ingestion.
+
+    @staticmethod
+    def _batches(items: Iterable[T], batch_size: int) -> Iterator[list[T]]:
+        """
+        Split an iterable (or a generator) in lists of at most batch_size items
+        """
+        iterator = iter(items)
+        while batch := list(islice(iterator, batch_size)):
+            yield batch
+
+    def add_documents(
+                self,
+                documents: Iterable[Document],
+                conn: sqlite3.Connection,
+                batch_size: int|None = None
+            ) -> list[int]:
+        """
+        Write documents in the database with one executemany per batch
+
+        Args:
+            documents (Iterable[Document]): Documents to add, their `id` is set
+            conn (sqlite3.Connection): DB connection (writer)
+            batch_size (int, optional): Rows per executemany. Default to settings.INGEST_BATCH_SIZE
+
+        Returns:
+            list[int]: The created document IDs
+        """
+        ids: list[int] = []
+        next_id = conn.execute("SELECT coalesce(max(id), 0) + 1 FROM Document").fetchone()[0]
+        # The source file state is only stored once the database is migrated
+        columns = ['id', 'name', 'category', 'url'] + self.get_file_state_columns(conn)
+
+        for batch in self._batches(documents, batch_size or settings.INGEST_BATCH_SIZE):
+            # IDs are assigned here since executemany can't report them
+            for document in batch:
+                document.id = next_id
+                next_id += 1
+
+            conn.executemany(
+                f"""
+                INSERT INTO Document ({', '.join(columns)})
+                VALUES ({', '.join('?' for _ in columns)})
+                """,
+                [tuple(getattr(document, column) for column in columns) for document in batch]
+            )
+            ids.extend(document.id for document in batch) #type: ignore
+
+        return ids
+
+    def add_chunks(
+                self,
+                chunks: Iterable[Chunk],
+                conn: sqlite3.Connection,
+                batch_size: int|None = None
+            ) -> list[int]:
+        """
+        Write chunks in the database with one executemany per batch. Chunks can be
+        streamed from a generator, only one batch is held in memory.
+
+        Args:
+            chunks (Iterable[Chunk]): Chunks to add
+            conn (sqlite3.Connection): DB connection (writer)
+            batch_size (int, optional): Rows per executemany. Default to settings.INGEST_BATCH_SIZE
+
+        Returns:
+            list[int]: The created chunk IDs
+        """
+        ids: list[int] = []
+        # The quantized embeddings are only stored once the database is migrated
+        quantized = self.has_cosine_knn(conn)
+
+        for batch in self._batches(chunks, batch_size or settings.INGEST_BATCH_SIZE):
+            emb_384ds = np.stack([chunk.emb_384d for chunk in batch]).astype(np.float32)
+            # IDs are taken from the sequence, those of deleted chunks are never handed out again
+            next_id = self._bump_chunk_version(conn, len(batch))
+            batch_ids = list(range(next_id, next_id + len(batch)))
+
+            if not quantized:
+                conn.executemany(
+                    """
+                    INSERT INTO Chunk (rowid, emb_384d, emb_3d, content, document_id)
+                    VALUES (?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (id, emb_384d, np.asarray(chunk.emb_3d, dtype=np.float32), chunk.content, chunk.document_id)
+                        for id, chunk, emb_384d in zip(batch_ids, batch, emb_384ds)
+                    ]
+                )
+                ids.extend(batch_ids)
+                continue
+
+            emb_int8s = self.quantize(emb_384ds, 'int8')
+            emb_bits = self.quantize(emb_384ds, 'bit')
+            conn.executemany(
                 """
-                INSERT INTO Chunk (emb_384d, emb_3d, content, document_id)
-                VALUES (?, ?, ?, ?)
+                INSERT INTO Chunk (rowid, emb_384d, emb_int8, emb_bit, emb_3d, content, document_id)
+                VALUES (?, ?, vec_int8(?), vec_bit(?), ?, ?, ?)
                 """,
-                (chunk.emb_384d, chunk.emb_3d, chunk.content, chunk.document_id)
+                [
+                    (
+                        id,
+                        emb_384d,
+                        emb_int8.tobytes(),
+                        emb_bit.tobytes(),
+                        np.asarray(chunk.emb_3d, dtype=np.float32),
+                        chunk.content,
+                        chunk.document_id
+                    )
+                    for id, chunk, emb_384d, emb_int8, emb_bit
+                    in zip(batch_ids, batch, emb_384ds, emb_int8s, emb_bits)
+                ]
             )
+            ids.extend(batch_ids)
 
-            if cur.lastrowid is None:
-                raise ValueError(f"Failed to insert {chunk} into Chunk table")
+        return ids
 
-            return cur.lastrowid
+    def update_documents(
+                self,
+                documents: Iterable[Document],
+                conn: sqlite3.Connection,
+                batch_size: int|None = None
+            ) -> None:
+        """
+        Update the source file state (content_hash, mtime, size) of stored documents
+
+        Args:
+            documents (Iterable[Document]): Documents to update, by `id`
+            conn (sqlite3.Connection): DB connection (writer)
+            batch_size (int, optional): Rows per executemany. Default to settings.INGEST_BATCH_SIZE
+        """
+        if not self.get_file_state_columns(conn):
+            # Database not migrated, there is no file state to update
+            return
+
+        rows = (
+            (document.content_hash, document.mtime, document.size, document.id)
+            for document in documents
+        )
+        for batch in self._batches(rows, batch_size or settings.INGEST_BATCH_SIZE):
+            conn.executemany(
+                "UPDATE Document SET content_hash = ?, mtime = ?, size = ? WHERE id = ?",
+                batch
+            )
+
+    def delete_chunks(self, document_ids: list[int], conn: sqlite3.Connection) -> int:
+        """
+        Delete every chunk of some documents (the documents are kept), the chunk
+        version is bumped
+
+        Args:
+            document_ids (list[int]): Document IDs
+            conn (sqlite3.Connection): DB connection (writer)
+
+        Returns:
+            int: Number of deleted chunks
+        """
+        count = 0
+        for batch in self._batches(document_ids, settings.INGEST_BATCH_SIZE):
+            placeholders = ",".join("?" for _ in batch)
+            count += conn.execute(
+                f"DELETE FROM Chunk WHERE document_id IN ({placeholders})",
+                batch
+            ).rowcount
+
+        if count:
+            # Caches and indexes keyed on the chunk version see the deletion
+            self._bump_chunk_version(conn)
+
+        return count
+
+    def delete_documents(self, ids: list[int], conn: sqlite3.Connection) -> int:
+        """
+        Delete documents and their chunks
+
+        Args:
+            ids (list[int]): Document IDs
+            conn (sqlite3.Connection): DB connection (writer)
+
+        Returns:
+            int: Number of deleted chunks
+        """
+        count = self.delete_chunks(ids, conn)
+        for batch in self._batches(ids, settings.INGEST_BATCH_SIZE):
+            placeholders = ",".join("?" for _ in batch)
+            conn.execute(f"DELETE FROM Document WHERE id IN ({placeholders})", batch)
+
+        return count
+
+    def set_projections(
+                self,
+                ids: Iterable[int],
+                emb_3ds: Iterable[np.ndarray],
+                conn: sqlite3.Connection,
+                batch_size: int|None = None
+            ) -> None:
+        """
+        Update the 3d projection of chunks
+
+        Args:
+            ids (Iterable[int]): Chunk IDs
+            emb_3ds (Iterable[np.ndarray]): 3d embedding of each chunk
+            conn (sqlite3.Connection): DB connection (writer)
+            batch_size (int, optional): Rows per executemany. Default to settings.INGEST_BATCH_SIZE
+        """
+        rows = (
+            (np.asarray(emb_3d, dtype=np.float32), int(id))
+            for id, emb_3d in zip(ids, emb_3ds)
+        )
+        for batch in self._batches(rows, batch_size or settings.INGEST_BATCH_SIZE):
+            conn.executemany("UPDATE Chunk SET emb_3d = ? WHERE rowid = ?", batch)
 
 
 db = DocumentDB()
\ No newline at end of file
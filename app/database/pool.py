@@ -0,0 +1,77 @@
+import queue
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+import sqlean as sqlite3
+
+
+
+class ConnectionPool:
+    """
+    Bounded, thread-safe pool of pre-initialized SQLite connections.
+
+    All connections are opened when the pool is created and are handed out one
+    thread at a time through the `connection` context manager.
+    """
+
+    def __init__(
+            self,
+            factory: Callable[[], sqlite3.Connection],
+            size: int = 4,
+            timeout: float|None = None
+        ) -> None:
+        """
+        Args:
+            factory (Callable): Function opening a new connection
+            size (int, optional): Number of connections. Default to 4
+            timeout (float, optional): Seconds to wait for a free connection. Default to None (wait forever)
+        """
+        if size < 1:
+            raise ValueError(f"Pool size must be at least 1, got {size}")
+
+        self.size = size
+        self.timeout = timeout
+        self._closed = False
+        self._idle: queue.LifoQueue[sqlite3.Connection] = queue.LifoQueue(maxsize=size)
+
+        for _ in range(size):
+            self._idle.put(factory())
+
+    @property
+    def available(self) -> int:
+        return self._idle.qsize()
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow a connection, it goes back to the pool when the context exits
+
+        Yields:
+            sqlite3.Connection: DB connection
+        """
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+
+        try:
+            conn = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection available after {self.timeout}s")
+
+        try:
+            yield conn
+        finally:
+            if self._closed:
+                conn.close()
+            else:
+                self._idle.put(conn)
+
+    def close(self) -> None:
+        """
+        Close the idle connections, borrowed ones are closed when given back
+        """
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
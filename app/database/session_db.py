@@ -0,0 +1,223 @@
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+import sqlean as sqlite3
+
+from app.config import settings
+
+
+
+class SessionDB:
+    """
+    SQLite (WAL) storage of chat sessions, shared by every worker process.
+
+    Sessions are stored as opaque blobs, with a version (changed on each write)
+    to detect updates from other processes and the last access time for expiry.
+    """
+
+    path = 'db/sessions.db'
+
+    def __init__(self) -> None:
+        root = settings.DATA_PATH
+        self.db_path = os.path.join(root, self.path)
+
+        self._conn: sqlite3.Connection|None = None
+        self._lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        """
+        Open a connection to the session database, creating it if needed
+
+        Returns:
+            sqlite3.Connection: DB connection
+        """
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS Session (
+                id TEXT PRIMARY KEY,
+                version INTEGER NOT NULL,
+                last_access REAL NOT NULL,
+                contexts INTEGER NOT NULL DEFAULT 0,
+                data BLOB NOT NULL
+            ) WITHOUT ROWID
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS session_last_access ON Session (last_access)")
+        conn.commit()
+
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        """
+        Use the shared connection (lazy initialization), one thread at a time.
+        Committed on success, rolled back on error.
+
+        Yields:
+            sqlite3.Connection: DB connection
+        """
+        with self._lock:
+            if self._conn is None:
+                self._conn = self.connect()
+
+            with self._conn:
+                yield self._conn
+
+    def close(self) -> None:
+        """
+        Close the shared connection
+        """
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # --------- GET methods
+
+    def get_version(self, id: str) -> int|None:
+        """
+        Get the version of a session
+
+        Args:
+            id (str): Session ID
+
+        Returns:
+            int|None: Session version, None if not found
+        """
+        with self.connection() as conn:
+            row = conn.execute("SELECT version FROM Session WHERE id = ?", (id,)).fetchone()
+            return row[0] if row else None
+
+    def get_session(self, id: str) -> tuple[int, bytes]|None:
+        """
+        Get a stored session
+
+        Args:
+            id (str): Session ID
+
+        Returns:
+            tuple[int, bytes]|None: Session version and data, None if not found
+        """
+        with self.connection() as conn:
+            row = conn.execute("SELECT version, data FROM Session WHERE id = ?", (id,)).fetchone()
+            return (row[0], row[1]) if row else None
+
+    def get_stats(self) -> tuple[int, int, int]:
+        """
+        Count the sessions, their stored contexts and size
+
+        Returns:
+            tuple[int, int, int]: Number of sessions, number of contexts and stored bytes
+        """
+        with self.connection() as conn:
+            count, contexts, size = conn.execute(
+                "SELECT count(*), total(contexts), total(length(data)) FROM Session"
+            ).fetchone()
+            return count, int(contexts), int(size)
+
+    # --------- INSERT / DELETE methods
+
+    def set_sessions(self, rows: list[tuple[str, int, float, int, bytes, int|None]]) -> list[str]:
+        """
+        Insert or update sessions, in one transaction. A stored session is only updated
+        if its version is still the expected one (compare-and-set between processes).
+
+        Args:
+            rows (list[tuple]): (id, version, last_access, contexts, data, expected_version) of
+                each session, expected_version None to overwrite the stored session
+
+        Returns:
+            list[str]: IDs of the sessions not written, updated by another process meanwhile
+        """
+        conflicts = []
+
+        with self.connection() as conn:
+            for id, version, last_access, contexts, data, expected in rows:
+                cur = conn.execute(
+                    """
+                    INSERT INTO Session (id, version, last_access, contexts, data)
+                    VALUES (:id, :version, :last_access, :contexts, :data)
+                    ON CONFLICT (id) DO UPDATE SET
+                        version = excluded.version,
+                        last_access = excluded.last_access,
+                        contexts = excluded.contexts,
+                        data = excluded.data
+                    WHERE :expected IS NULL OR Session.version = :expected
+                    """,
+                    {
+                        'id': id,
+                        'version': version,
+                        'last_access': last_access,
+                        'contexts': contexts,
+                        'data': data,
+                        'expected': expected
+                    }
+                )
+                if cur.rowcount == 0:
+                    conflicts.append(id)
+
+        return conflicts
+
+    def touch_sessions(self, accesses: dict[str, float]) -> None:
+        """
+        Move forward the last access time of sessions, in one transaction
+
+        Args:
+            accesses (dict[str, float]): UNIX timestamp of the last access by session ID
+        """
+        with self.connection() as conn:
+            conn.executemany(
+                "UPDATE Session SET last_access = max(last_access, ?) WHERE id = ?",
+                [(last_access, id) for id, last_access in accesses.items()]
+            )
+
+    def delete_session(self, id: str) -> bool:
+        """
+        Delete a session
+
+        Args:
+            id (str): Session ID
+
+        Returns:
+            bool: True if the session existed
+        """
+        with self.connection() as conn:
+            return conn.execute("DELETE FROM Session WHERE id = ?", (id,)).rowcount > 0
+
+    def delete_expired(self, before: float) -> int:
+        """
+        Delete the sessions not accessed since a given time
+
+        Args:
+            before (float): UNIX timestamp
+
+        Returns:
+            int: Number of deleted sessions
+        """
+        with self.connection() as conn:
+            return conn.execute("DELETE FROM Session WHERE last_access < ?", (before,)).rowcount
+
+    def delete_oldest(self, keep: int) -> int:
+        """
+        Delete the least recently accessed sessions, keeping the `keep` most recent
+
+        Args:
+            keep (int): Number of sessions to keep
+
+        Returns:
+            int: Number of deleted sessions
+        """
+        with self.connection() as conn:
+            return conn.execute(
+                """
+                DELETE FROM Session WHERE id IN (
+                    SELECT id FROM Session ORDER BY last_access DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (keep,)
+            ).rowcount
@@ -0,0 +1,3 @@
+from .parse import parse_content, iter_content
+from .changes import Changes, diff_documents, file_hash
+from .pipeline import IngestionPipeline, IngestionProgress
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""
+Changes between source files and the stored documents.
+"""
+
+import hashlib
+from typing import Iterable, NamedTuple
+
+from app.models import Document
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """
+    SHA-256 of a file content
+
+    Args:
+        path (str): File path
+        block_size (int, optional): Bytes read at once. Default to 1 MiB
+
+    Returns:
+        str: Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Changes(NamedTuple):
+    """
+    Differences between the files and the stored documents
+    """
+    added: list[tuple[Document, str]]
+    modified: list[tuple[Document, str]]
+    unchanged: list[Document]
+    touched: list[Document]
+    removed: list[Document]
+
+
+def diff_documents(documents: Iterable[tuple[Document, str]], stored: list[Document]) -> Changes:
+    """
+    Compare files with the stored documents (by category and name). A file with the same
+    size and mtime is unchanged, else its content hash is compared.
+
+    Args:
+        documents (Iterable[tuple[Document, str]]): Documents and their paths (see `load_documents`)
+        stored (list[Document]): Documents in database
+
+    Returns:
+        Changes: New and modified files (with the stored document ID), unchanged documents,
+            unchanged documents with a new mtime (`touched`) and removed documents
+    """
+    remaining = {(document.category, document.name): document for document in stored}
+    changes = Changes([], [], [], [], [])
+
+    for document, path in documents:
+        previous = remaining.pop((document.category, document.name), None)
+
+        if previous is not None and (previous.size, previous.mtime) == (document.size, document.mtime):
+            changes.unchanged.append(previous)
+            continue
+
+        document.content_hash = file_hash(path)
+        if previous is None:
+            changes.added.append((document, path))
+        elif previous.content_hash == document.content_hash:
+            document.id = previous.id
+            changes.touched.append(document)
+        else:
+            document.id = previous.id
+            changes.modified.append((document, path))
+
+    changes.removed.extend(remaining.values())
+    return changes
@@ -0,0 +1,50 @@
+from typing import Iterable
+
+from app.parser import ParsePDF, ParseMD
+from app.config import settings
+
+
+def parse_content(path: str) -> str:
+    """
+    Load a file and parse its content
+
+    Args:
+        path (str): The path of the file to parse
+
+    Returns:
+        str: the file content
+    """
+    ext = path.split('.')[-1]
+    match ext:
+        case 'txt':
+            with open(path, 'r') as f:
+                return f.read()
+        case 'pdf':
+            return ParsePDF(path)
+        case 'md':
+            return ParseMD.from_path(path)
+        case _:
+            raise ValueError(f"Impossible to parse '{ext}' files ({path})")
+
+
+def iter_content(path: str, pdf_workers: int|None = None) -> Iterable[str]:
+    """
+    Parse a file lazily: the pages of a PDF one at a time (see `ParsePDF.iter_pages`),
+    the whole content for other files
+
+    Args:
+        path (str): The path of the file to parse
+        pdf_workers (int, optional): Processes extracting the PDF pages, 0 to extract them
+            in the current process. Default to settings.PDF_PAGE_WORKERS
+
+    Returns:
+        Iterable[str]: Parts of the file content, to join with a blank line
+    """
+    if path.split('.')[-1] == 'pdf':
+        return ParsePDF.iter_pages(
+            path,
+            workers=settings.PDF_PAGE_WORKERS if pdf_workers is None else pdf_workers,
+            pages_per_task=settings.PDF_PAGES_PER_TASK
+        )
+
+    return [parse_content(path)]
@@ -0,0 +1,303 @@
+"""
+Ingestion Pipeline Module.
+
+This module streams documents into the database in three overlapping stages:
+
+1. parsing (PDF, Markdown, text) in a pool of worker processes, at most
+   `queue_size` documents ahead of the next stage (bounded queue), or lazily
+   in the current process (PDF pages one at a time),
+2. chunking (streamed over the parsed parts) and batched embedding in the
+   current process,
+3. bulk writes of the chunks, `settings.INGEST_BATCH_SIZE` rows at a time.
+
+Only the queued documents and one batch of chunks are held in memory, so
+memory use doesn't grow with the corpus.
+"""
+
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from typing import Any, Iterable, Iterator
+
+import numpy as np
+import sqlean as sqlite3
+
+from app.models import Document, Chunk
+from app.database import DocumentDB
+from app.rag import Vectorizer
+from app.ingestion.parse import parse_content, iter_content
+from app.config import settings
+
+
+class IngestionProgress:
+    """
+    Counters of an ingestion run, reported every `interval` seconds.
+
+    Attributes:
+        files (int): Parsed files.
+        chunks (int): Embedded chunks.
+        characters (int): Characters of the parsed files.
+        parse_wait (float): Seconds the embedding stage waited for parsed files.
+        embed_time (float): Seconds spent embedding.
+    """
+
+    def __init__(self, total_files: int|None = None, interval: float|None = None) -> None:
+        """
+        Args:
+            total_files (int, optional): Number of files to ingest, if known
+            interval (float, optional): Seconds between two reports (None or 0 to disable).
+                Default to settings.INGEST_PROGRESS_INTERVAL
+        """
+        self.total_files = total_files
+        self.interval = settings.INGEST_PROGRESS_INTERVAL if interval is None else interval
+
+        self.files = 0
+        self.chunks = 0
+        self.characters = 0
+        self.parse_wait = 0.
+        self.embed_time = 0.
+
+        self._start = time.perf_counter()
+        self._last_report = self._start
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._start
+
+    def update(self, files: int = 0, chunks: int = 0, characters: int = 0) -> None:
+        with self._lock:
+            self.files += files
+            self.chunks += chunks
+            self.characters += characters
+
+        if self.interval and time.perf_counter() - self._last_report >= self.interval:
+            self._last_report = time.perf_counter()
+            self.report()
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Progress and throughput of the run
+
+        Returns:
+            dict: files, total_files, chunks, elapsed, files_per_s, chunks_per_s,
+                parse_wait and embed_time (seconds)
+        """
+        elapsed = self.elapsed
+        return {
+            "files": self.files,
+            "total_files": self.total_files,
+            "chunks": self.chunks,
+            "elapsed": round(elapsed, 2),
+            "files_per_s": round(self.files / elapsed, 2) if elapsed else None,
+            "chunks_per_s": round(self.chunks / elapsed, 2) if elapsed else None,
+            "parse_wait": round(self.parse_wait, 2),
+            "embed_time": round(self.embed_time, 2),
+        }
+
+    def report(self) -> None:
+        stats = self.stats()
+        total = f"/{stats['total_files']}" if stats['total_files'] is not None else ""
+        print(
+            f"[ingestion] {stats['files']}{total} files, {stats['chunks']} chunks in {stats['elapsed']:.1f} s "
+            f"({stats['files_per_s']} files/s, {stats['chunks_per_s']} chunks/s, "
+            f"waited {stats['parse_wait']:.1f} s for parsing, {stats['embed_time']:.1f} s embedding)"
+        )
+
+
+class IngestionPipeline:
+    """
+    Staged, streaming ingestion of documents (see the module docstring).
+
+    Attributes:
+        parse_workers (int): Parsing processes, 0 to parse in the current process.
+        pdf_workers (int): PDF page extraction processes when parsing in the current process.
+        queue_size (int): Maximum number of documents parsed ahead of the embedding stage.
+        embed_batch_size (int): Chunks embedded per model call.
+    """
+
+    def __init__(
+            self,
+            vectorizer: Vectorizer,
+            document_db: DocumentDB,
+            parse_workers: int|None = None,
+            queue_size: int|None = None,
+            embed_batch_size: int|None = None,
+            pdf_workers: int|None = None
+        ) -> None:
+        """
+        Args:
+            vectorizer (Vectorizer): Vectorizer used to chunk and embed
+            document_db (DocumentDB): Document database
+            parse_workers (int, optional): Parsing processes. Default to settings.INGEST_PARSE_WORKERS,
+                one per CPU if None
+            queue_size (int, optional): Documents parsed ahead. Default to settings.INGEST_QUEUE_SIZE
+            embed_batch_size (int, optional): Chunks per model call. Default to settings.INGEST_EMBED_BATCH_SIZE
+            pdf_workers (int, optional): PDF page extraction processes, when parse_workers is 0.
+                Default to settings.PDF_PAGE_WORKERS
+        """
+        self.vectorizer = vectorizer
+        self.document_db = document_db
+
+        parse_workers = settings.INGEST_PARSE_WORKERS if parse_workers is None else parse_workers
+        self.parse_workers = (os.cpu_count() or 1) if parse_workers is None else parse_workers
+        self.queue_size = max(queue_size or settings.INGEST_QUEUE_SIZE, 1)
+        self.embed_batch_size = embed_batch_size or settings.INGEST_EMBED_BATCH_SIZE
+        self.pdf_workers = settings.PDF_PAGE_WORKERS if pdf_workers is None else pdf_workers
+
+    def _executor(self) -> Executor|None:
+        if self.parse_workers <= 0:
+            return None
+
+        # Forked workers start at once: spawned ones would import the whole app (and torch)
+        # before parsing anything. They only run the parsers, never the embedding model.
+        start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        return ProcessPoolExecutor(
+            max_workers=self.parse_workers,
+            mp_context=multiprocessing.get_context(start_method)
+        )
+
+    def parse(
+            self,
+            documents: Iterable[tuple[Document, str]],
+            progress: IngestionProgress
+        ) -> Iterator[tuple[Document, str, Iterable[str]]]:
+        """
+        Parse the documents in the worker processes, in order, at most `queue_size` ahead
+        of the consumer. Without worker processes, documents are parsed lazily (PDF pages
+        one at a time, see `iter_content`).
+
+        Args:
+            documents (Iterable[tuple[Document, str]]): Documents and their paths
+            progress (IngestionProgress): Run counters
+
+        Yield:
+            tuple[Document, str, Iterable[str]]: Document, its path and its parsed content parts
+        """
+        executor = self._executor()
+
+        if executor is None:
+            for document, path in documents:
+                yield document, path, iter_content(path, self.pdf_workers)
+            return
+
+        pending: deque[tuple[Document, str, Future]] = deque()
+        documents = iter(documents)
+
+        try:
+            while True:
+                # Keep the queue full, the workers parse while the consumer embeds
+                while len(pending) < self.queue_size and (item := next(documents, None)) is not None:
+                    document, path = item
+                    pending.append((document, path, executor.submit(parse_content, path)))
+
+                if not pending:
+                    break
+
+                document, path, future = pending.popleft()
+                start = time.perf_counter()
+                content = future.result()
+                progress.parse_wait += time.perf_counter() - start
+
+                yield document, path, [content]
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def chunks(
+            self,
+            documents: Iterable[tuple[Document, str]],
+            conn: sqlite3.Connection,
+            progress: IngestionProgress
+        ) -> Iterator[Chunk]:
+        """
+        Create the new documents in DB (documents with an `id` are already stored), parse,
+        chunk and vectorize their content. Chunks are embedded `embed_batch_size` at a time,
+        across document boundaries.
+
+        Args:
+            documents (Iterable[tuple[Document, str]]): Documents and their paths
+            conn (sqlite3.Connection): DB connection (writer)
+            progress (IngestionProgress): Run counters
+
+        Yield:
+            Chunk: Chunks to store, their 3d projection is computed once all chunks are stored
+        """
+        pending: list[tuple[int, str]] = []
+
+        def flush() -> Iterator[Chunk]:
+            start = time.perf_counter()
+            emb_384ds = self.vectorizer.generate_embeddings_batch(
+                [content for _, content in pending],
+                batch_size=self.embed_batch_size
+            )
+            progress.embed_time += time.perf_counter() - start
+            progress.update(chunks=len(pending))
+
+            for (doc_id, content), emb_384d in zip(pending, emb_384ds):
+                yield Chunk(
+                    document_id = doc_id,
+                    content = content,
+                    emb_384d = emb_384d,
+                    emb_3d = np.zeros(3, dtype=np.float32)
+                )
+            pending.clear()
+
+        def measure(parts: Iterable[str]) -> Iterator[str]:
+            # Count the parsed characters, and the parsing time of lazy parts
+            parts = iter(parts)
+            while True:
+                start = time.perf_counter()
+                part = next(parts, None)
+                progress.parse_wait += time.perf_counter() - start
+                if part is None:
+                    return
+                progress.update(characters=len(part))
+                yield part
+
+        for document, path, parts in self.parse(documents, progress):
+            # Create document in DB
+            doc_id = document.id
+            if doc_id is None:
+                doc_id, = self.document_db.add_documents([document], conn=conn)
+
+            # Chunk its content as it is parsed, chunks cross the parts (pages) boundaries
+            for content in self.vectorizer.chunk_stream(measure(parts)):
+                pending.append((doc_id, content))
+                # Vectorize the chunks by batch
+                if len(pending) >= self.embed_batch_size:
+                    yield from flush()
+
+            progress.update(files=1)
+
+        if pending:
+            yield from flush()
+
+    def run(
+            self,
+            documents: Iterable[tuple[Document, str]],
+            conn: sqlite3.Connection,
+            progress: IngestionProgress|None = None
+        ) -> list[int]:
+        """
+        Ingest documents: stream their chunks to the database in bulk, within the
+        caller's transaction
+
+        Args:
+            documents (Iterable[tuple[Document, str]]): Documents and their paths
+            conn (sqlite3.Connection): DB connection (writer)
+            progress (IngestionProgress, optional): Run counters. Default to a new one
+
+        Returns:
+            list[int]: The created chunk IDs
+        """
+        progress = progress or IngestionProgress()
+
+        ids = self.document_db.add_chunks(self.chunks(documents, conn, progress), conn=conn)
+
+        if progress.interval:
+            progress.report()
+
+        return ids
@@ -4,7 +4,9 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from .config import settings
 from .routers import api, route
-from app.services import RagService, PlotService
+from app.services import RagService, PlotService, IngestionService
+from app.services.executor import shutdown_cpu_executor
+from app.database import db
 
 
 
@@ -14,12 +16,23 @@ async def lifespan(app: FastAPI):
     # --- startup logic ---
     app.state.rag_service = RagService()
     app.state.plot_service = PlotService()
+    app.state.ingestion_service = IngestionService(
+        app.state.rag_service.vector_store,
+        app.state.plot_service.reductor
+    )
+    app.state.ingestion_service.start()
 
     yield
 
     # --- shutdown logic ---
+    app.state.ingestion_service.close()
+    del app.state.ingestion_service
+    app.state.rag_service.llm_handler.close()
+    await app.state.rag_service.llm_handler.aclose()
     del app.state.rag_service
     del app.state.plot_service
+    shutdown_cpu_executor()
+    db.close()
 
 
 app = FastAPI(
@@ -1,4 +1,4 @@
 from .document import Document
 from .chunk import Chunk
-from .context import Context
+from .context import Context, ChunkRef
 from .body import ChatRequest, Message, SessionRequest
\ No newline at end of file
@@ -1,4 +1,5 @@
-from pydantic import BaseModel, Field, computed_field
+from pydantic import BaseModel, Field, field_serializer
+from typing import Optional
 
 import uuid
 
@@ -6,22 +7,60 @@ from app.models import Chunk
 
 
 
+class ChunkRef(BaseModel):
+    """
+    Reference to a chunk used in a context, with its retrieval scores
+    """
+
+    id: int
+    score: Optional[float] = None
+    distance: Optional[float] = None
+
+    @field_serializer("distance")
+    def serialize_distance(self, d: float|None, _info):
+        # Round distance to 3 digits for json export
+        return round(d, 3) if d is not None else None
+    
+    @field_serializer("score")
+    def serialize_score(self, s: float|None, _info):
+        # Round distance to 2 digits for json export
+        return round(s, 2) if s is not None else None
+
+
 class Context(BaseModel):
 
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     query: str
-    chunks: list[Chunk]
+    chunks: list[ChunkRef]
+    # RAG prompt, only set when built from the chunks (kept in the conversation history)
+    context: str = Field(default="", exclude=True, repr=False)
 
-    @computed_field
-    @property
-    def context(self) -> str:
+    @classmethod
+    def from_chunks(cls, query: str, chunks: list[Chunk]) -> "Context":
+        """
+        Build a context and its RAG prompt from retrieved chunks, keeping only
+        references to the chunks
+
+        Args:
+            query (str): User message query
+            chunks (list[Chunk]): Retrieved chunks, with their source
+
+        Returns:
+            Context: Context object
+        """
         ctx = []
-        for chunk in self.chunks:
+        for chunk in chunks:
             if chunk.source is not None:
                 ctx.append(
                     f"> {chunk.source.name} ({chunk.source.category})"
                     f"\n...{chunk.content}..."
                 )
 
-        return "\n\n".join(ctx)
-
+        return cls(
+            query=query,
+            chunks=[
+                ChunkRef(id=chunk.id, score=chunk.score, distance=chunk.distance)
+                for chunk in chunks if chunk.id is not None
+            ],
+            context="\n\n".join(ctx)
+        )
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 
 
@@ -6,4 +6,9 @@ class Document(BaseModel):
     id: Optional[int] = None
     name: str
     category: str
-    url: Optional[str] = None
\ No newline at end of file
+    url: Optional[str] = None
+
+    # Source file state at ingestion, to skip unchanged files (not exported)
+    content_hash: Optional[str] = Field(default=None, exclude=True, repr=False)
+    mtime: Optional[float] = Field(default=None, exclude=True, repr=False)
+    size: Optional[int] = Field(default=None, exclude=True, repr=False)
\ No newline at end of file
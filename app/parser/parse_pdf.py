@@ -1,10 +1,28 @@
 from werkzeug.datastructures import FileStorage
 import pymupdf
 
+import multiprocessing
+import shutil
+import tempfile
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Iterator
+
+
+def _extract_pages(path: str, start: int, end: int) -> list[str]:
+    """
+    Extract the text of the pages [start, end) of a PDF (run in worker processes)
+    """
+    with pymupdf.open(path) as doc:
+        return [doc[i].get_text() for i in range(start, end)] #type: ignore
+
 
 class ParsePDF:
     """Parse text from PDF file"""
 
+    # Separator between the pages text
+    page_separator = '\n\n'
+
     def __new__(cls, file: str|FileStorage) -> str:
         """
         Args:
@@ -13,21 +31,69 @@ class ParsePDF:
         Returns:
             str: Extracted text string
         """
+        return cls.page_separator.join(cls.iter_pages(file))
+
+    @classmethod
+    def iter_pages(
+            cls,
+            file: str|FileStorage,
+            workers: int = 0,
+            pages_per_task: int = 16
+        ) -> Iterator[str]:
+        """
+        Extract the text of the pages lazily, in order. A file storage is spooled to a
+        temporary file instead of being read in memory.
+
+        Args:
+            file (str|FileStorage): File path or file storage to parse
+            workers (int, optional): Worker processes extracting page ranges in parallel,
+                0 to extract in the current process. Default to 0
+            pages_per_task (int, optional): Pages extracted per worker task. Default to 16
+
+        Yield:
+            str: Text of each page
+        """
+        if isinstance(file, FileStorage):
+            with tempfile.NamedTemporaryFile(suffix='.pdf') as spool:
+                file.stream.seek(0)
+                shutil.copyfileobj(file.stream, spool)
+                spool.flush()
+                yield from cls.iter_pages(spool.name, workers, pages_per_task)
+            return
+
+        with pymupdf.open(file) as doc:
+            page_count = doc.page_count
+
+            if workers <= 0 or page_count <= pages_per_task:
+                for page in doc:
+                    yield page.get_text() #type: ignore
+                return
+
+        yield from cls.__iter_pages_parallel(file, page_count, workers, pages_per_task)
 
-        if isinstance(file, str):
-            return cls.__parse_from_path(file)
-        elif isinstance(file, FileStorage):
-            return cls.__parse_from_file(file) 
-    
-    @staticmethod
-    def __parse_from_path(file_path: str):
-        with pymupdf.open(file_path) as doc:
-            return '\n\n'.join(page.get_text() for page in doc) #type: ignore
-        
     @staticmethod
-    def __parse_from_file(file_storage: FileStorage):
-        file_storage.stream.seek(0)
-        pdf_bytes = file_storage.stream.read()
+    def __iter_pages_parallel(path: str, page_count: int, workers: int, pages_per_task: int) -> Iterator[str]:
+        # Forked workers start at once, spawned ones would import the whole app first
+        start_method = "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+        ranges = iter(range(0, page_count, pages_per_task))
+        pending: deque[Future] = deque()
+
+        with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(start_method)
+            ) as executor:
+            try:
+                while True:
+                    # At most 2 ranges per worker extracted ahead of the consumer
+                    while len(pending) < 2 * workers and (start := next(ranges, None)) is not None:
+                        pending.append(executor.submit(
+                            _extract_pages, path, start, min(start + pages_per_task, page_count)
+                        ))
+
+                    if not pending:
+                        break
 
-        with pymupdf.open(stream=pdf_bytes, filetype="pdf") as doc:
-            return '\n\n'.join(page.get_text() for page in doc) #type: ignore
\ No newline at end of file
+                    yield from pending.popleft().result()
+            finally:
+                for future in pending:
+                    future.cancel()
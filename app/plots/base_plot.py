@@ -4,7 +4,15 @@ from typing import Any
 from plotly.graph_objects import Figure
 from plotly.utils import PlotlyJSONEncoder
 
+import base64
 import json
+import numpy as np
+
+try:
+    # Optional, much faster JSON encoding
+    import orjson
+except ImportError:
+    orjson = None
 
 
 
@@ -15,6 +23,42 @@ class BasePlot(ABC):
         ...
 
     @staticmethod
-    def _get_json(fig: Figure) -> str:
+    def _get_json(fig: Figure|Any) -> str:
+        """
+        Serialize a figure (or any plotly object / JSON serializable value), with
+        orjson if installed
+
+        Args:
+            fig (Figure|Any): Object to serialize
+
+        Returns:
+            str: JSON string
+        """
+        if orjson is not None:
+            data = fig.to_plotly_json() if hasattr(fig, 'to_plotly_json') else fig
+            try:
+                return orjson.dumps(
+                    data,
+                    default=lambda obj: json.loads(json.dumps(obj, cls=PlotlyJSONEncoder)),
+                    option=orjson.OPT_SERIALIZE_NUMPY
+                ).decode()
+            except TypeError:
+                pass
+
         fig_json = json.dumps(fig, cls=PlotlyJSONEncoder)
         return fig_json
+
+    @staticmethod
+    def _typed_array(values: np.ndarray, dtype: str) -> dict:
+        """
+        Encode an array as a plotly.js typed array (base64 `bdata`), instead of a list of numbers
+
+        Args:
+            values (np.ndarray): Values to encode
+            dtype (str): Typed array type ('f4', 'i4', 'u1'...)
+
+        Returns:
+            dict: {dtype, bdata} typed array specification
+        """
+        array = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+        return {"dtype": dtype, "bdata": base64.b64encode(array.tobytes()).decode()}
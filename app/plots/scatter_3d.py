@@ -1,4 +1,3 @@
-from app.models import Chunk
 from app.plots.base_plot import BasePlot
 
 import numpy as np
@@ -6,55 +5,96 @@ import plotly.graph_objects as go
 
 
 class Scatter3D(BasePlot):
+    """
+    3d scatterplot of every chunk projection, with the RAG context chunks and
+    the query drawn on top.
 
-    def plot(
-            self, 
-            chunks: list[Chunk], 
-            query_emb: np.ndarray, 
-            highlight_ids: list[int]
-        ) -> str:
+    The chunks trace only changes with the database, so it can be serialized
+    once (`base_json`) and combined with the per-request overlay (`overlay_json`).
+
+    In compact mode, coordinates and chunk IDs are encoded as plotly.js typed
+    arrays (base64 `bdata`) instead of lists of numbers and hover strings.
+    """
+
+    def __init__(self, compact: bool = False) -> None:
         """
-        Create a 3d scatterplot of query and RAG chunks embeddings
+        Args:
+            compact (bool, optional): Use typed arrays. Default to False
+        """
+        self.compact = compact
 
+    def _coords(self, coords: np.ndarray) -> dict:
+        """
         Args:
-            chunks (list[Chunk]): Chunks to project
-            query_emb (np.ndarray): Query embeddings to project
-            highlight_ids (list[int]): Chunk IDs to highlight
+            coords (np.ndarray): 3d points (n, 3)
 
         Returns:
-            str: JSON formated plotly object
+            dict: x, y and z of the points, as lists or typed arrays
         """
-        xs = [chunk.emb_3d[0] for chunk in chunks]
-        ys = [chunk.emb_3d[1] for chunk in chunks]
-        zs = [chunk.emb_3d[2] for chunk in chunks]
+        if self.compact:
+            return {axis: self._typed_array(coords[:, i], 'f4') for i, axis in enumerate('xyz')}
 
-        colors = ["#00ff00" if chunk.id in highlight_ids else "lightgray" for chunk in chunks]
+        return {axis: coords[:, i].tolist() for i, axis in enumerate('xyz')}
 
-        fig = go.Figure()
+    def base_trace(self, ids: np.ndarray, coords: np.ndarray) -> go.Scatter3d:
+        """
+        Create the trace of every chunk
+
+        Args:
+            ids (np.ndarray): Chunk IDs (n,)
+            coords (np.ndarray): Chunk 3d projections (n, 3)
 
-        # All chunks
-        fig.add_trace(
+        Returns:
+            go.Scatter3d: Chunks trace
+        """
+        if self.compact:
+            hover = dict(
+                customdata=self._typed_array(ids, 'i4'),
+                hovertemplate="chunk_id: %{customdata}<extra></extra>"
+            )
+        else:
+            hover = dict(text=[f"chunk_id: {id}" for id in ids.tolist()])
+
+        return go.Scatter3d(
+            **self._coords(coords),
+            mode="markers",
+            marker=dict(
+                size=2.5,
+                color="lightgray",
+                line=dict(width=1, color="black")
+            ),
+            name="Chunks",
+            **hover
+        )
+
+    def overlay_traces(self, coords: np.ndarray, query_emb: np.ndarray) -> list[go.Scatter3d]:
+        """
+        Create the traces of the highlighted chunks and of the query
+
+        Args:
+            coords (np.ndarray): Highlighted chunks 3d projections (k, 3)
+            query_emb (np.ndarray): Query 3d projection
+
+        Returns:
+            list[go.Scatter3d]: Highlighted chunks and query traces
+        """
+        return [
+            # Context chunks, drawn over their gray point
             go.Scatter3d(
-                x=xs,
-                y=ys,
-                z=zs,
+                **self._coords(coords),
                 mode="markers",
                 marker=dict(
                     size=2.5,
-                    color=colors,
+                    color="#00ff00",
                     line=dict(width=1, color="black")
                 ),
-                text=[f"chunk_id: {chunk.id}" for chunk in chunks],
-                name="Chunks"
-            )
-        )
-
-        # Query point
-        fig.add_trace(
+                name="Context"
+            ),
+            # Query point
             go.Scatter3d(
-                x=[query_emb[0]],
-                y=[query_emb[1]],
-                z=[query_emb[2]],
+                x=[float(query_emb[0])],
+                y=[float(query_emb[1])],
+                z=[float(query_emb[2])],
                 mode="markers",
                 marker=dict(
                     size=2.5, 
@@ -63,7 +103,14 @@ class Scatter3D(BasePlot):
                     symbol="diamond"),
                 name="Query"
             )
-        )
+        ]
+
+    def layout(self) -> go.Layout:
+        """
+        Returns:
+            go.Layout: Figure layout
+        """
+        fig = go.Figure()
 
         fig.update_layout(
             width=62.5,
@@ -112,4 +159,74 @@ class Scatter3D(BasePlot):
             )
         )
 
-        return self._get_json(fig)
+        return fig.layout
+
+    def base_json(self, ids: np.ndarray, coords: np.ndarray) -> tuple[str, str]:
+        """
+        Serialize the static part of the figure (chunks trace and layout)
+
+        Args:
+            ids (np.ndarray): Chunk IDs (n,)
+            coords (np.ndarray): Chunk 3d projections (n, 3)
+
+        Returns:
+            str: JSON formated chunks trace
+            str: JSON formated layout
+        """
+        return (
+            self._get_json(self.base_trace(ids, coords).to_plotly_json()),
+            self._get_json(self.layout().to_plotly_json())
+        )
+
+    def overlay_json(self, coords: np.ndarray, query_emb: np.ndarray) -> str:
+        """
+        Serialize the overlay traces
+
+        Args:
+            coords (np.ndarray): Highlighted chunks 3d projections (k, 3)
+            query_emb (np.ndarray): Query 3d projection
+
+        Returns:
+            str: JSON formated list of traces
+        """
+        return self._get_json([trace.to_plotly_json() for trace in self.overlay_traces(coords, query_emb)])
+
+    @staticmethod
+    def combine(base_json: tuple[str, str], overlay_json: str) -> str:
+        """
+        Assemble a serialized figure from its serialized parts, without parsing them
+
+        Args:
+            base_json (tuple[str, str]): JSON formated chunks trace and layout (see `base_json`)
+            overlay_json (str): JSON formated list of traces (see `overlay_json`)
+
+        Returns:
+            str: JSON formated figure
+        """
+        trace_json, layout_json = base_json
+        overlay = overlay_json.strip()[1:-1].strip()
+        data = f"{trace_json}, {overlay}" if overlay else trace_json
+
+        return f'{{"data": [{data}], "layout": {layout_json}}}'
+
+    def plot(
+            self, 
+            ids: np.ndarray, 
+            coords: np.ndarray,
+            query_emb: np.ndarray, 
+            highlight_ids: list[int]
+        ) -> str:
+        """
+        Create a 3d scatterplot of query and RAG chunks embeddings
+
+        Args:
+            ids (np.ndarray): Chunk IDs to project (n,)
+            coords (np.ndarray): Chunk 3d projections (n, 3)
+            query_emb (np.ndarray): Query embeddings to project
+            highlight_ids (list[int]): Chunk IDs to highlight
+
+        Returns:
+            str: JSON formated plotly object
+        """
+        highlighted = coords[np.isin(ids, highlight_ids)]
+        return self.combine(self.base_json(ids, coords), self.overlay_json(highlighted, query_emb))
@@ -1,5 +1,10 @@
-from .vectorizer import Vectorizer
+from .registry import registry
+from .cache import LRUCache
+from .answer_cache import SemanticCache
+from .session_store import BaseSessionStore, MemorySessionStore, SQLiteSessionStore
+from .vectorizer import Vectorizer, embedding_cache
 from .reductor import Reductor
 from .reranker import Reranker
-from .vector_store import VectorStore
+from .vector_index import BaseIndex, FlatIndex, IVFIndex
+from .vector_store import VectorStore, chunk_cache
 from .llm import LLMHandler
\ No newline at end of file
@@ -0,0 +1,177 @@
+"""
+Semantic Answer Cache Module.
+
+This module provides a bounded cache of LLM answers keyed on the query
+embedding, so that near-duplicate questions are answered without retrieval
+nor LLM call.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Generic, Hashable, Optional, TypeVar
+
+import numpy as np
+
+
+V = TypeVar("V")
+
+
+class SemanticCache(Generic[V]):
+    """
+    LRU cache matching entries by cosine similarity of their embedding.
+
+    Entries are tagged with a version of the data they were computed from
+    (e.g. the chunk set): storing or looking up with another version clears
+    the cache.
+
+    Attributes:
+        maxsize (int): Maximum number of entries (0 disables the cache).
+        threshold (float): Minimum cosine similarity for a hit.
+        ttl (float|None): Entry lifetime in seconds, None for no expiry.
+    """
+
+    def __init__(self, maxsize: int = 256, threshold: float = .95, ttl: Optional[float] = None) -> None:
+        """
+        Args:
+            maxsize (int): Maximum number of entries. Defaults to 256.
+            threshold (float): Minimum cosine similarity for a hit. Defaults to 0.95.
+            ttl (float, optional): Entry lifetime in seconds. Defaults to None (no expiry).
+        """
+        self.maxsize = maxsize
+        self.threshold = threshold
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+        self._entries: OrderedDict[int, tuple[np.ndarray, V, float]] = OrderedDict()
+        self._next_key = 0
+        self._version: Hashable = None
+        self._lock = threading.Lock()
+
+        # Stacked embeddings of the entries, rebuilt after a change
+        self._keys: list[int] = []
+        self._matrix: np.ndarray|None = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        embedding = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+    def _check_version(self, version: Hashable) -> None:
+        # Must be called with the lock held
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self._matrix = None
+            self._version = version
+
+    def _expire(self) -> None:
+        # Must be called with the lock held
+        if self.ttl is None:
+            return
+
+        now = time.monotonic()
+        expired = [key for key, (_, _, expires_at) in self._entries.items() if expires_at < now]
+        for key in expired:
+            del self._entries[key]
+        if expired:
+            self._matrix = None
+
+    def get(self, embedding: np.ndarray, version: Hashable = None) -> Optional[V]:
+        """
+        Get the value of the most similar entry, if similar enough.
+
+        Args:
+            embedding (np.ndarray): Query embedding.
+            version (Hashable, optional): Current version of the source data.
+
+        Returns:
+            V|None: Cached value, None on a miss.
+        """
+        if self.maxsize <= 0:
+            return None
+
+        query = self._normalize(embedding)
+
+        with self._lock:
+            self._check_version(version)
+            self._expire()
+
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            if self._matrix is None:
+                self._keys = list(self._entries)
+                self._matrix = np.stack([self._entries[key][0] for key in self._keys])
+
+            similarities = self._matrix @ query
+            best = int(np.argmax(similarities))
+
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            key = self._keys[best]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key][1]
+
+    def set(self, embedding: np.ndarray, value: V, version: Hashable = None) -> None:
+        """
+        Store a value, evicting the least recently used entries if full.
+
+        Args:
+            embedding (np.ndarray): Query embedding.
+            value (V): Value to cache.
+            version (Hashable, optional): Version of the data the value was computed from.
+        """
+        if self.maxsize <= 0:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else float("inf")
+
+        with self._lock:
+            self._check_version(version)
+
+            self._entries[self._next_key] = (self._normalize(embedding), value, expires_at)
+            self._next_key += 1
+
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+            self._matrix = None
+
+    def clear(self) -> None:
+        """
+        Remove every entry (counters are kept).
+        """
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Cache counters, to tune the threshold and size.
+
+        Returns:
+            dict: size, maxsize, threshold, ttl, hits, misses, hit_rate and invalidations
+        """
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "invalidations": self.invalidations,
+        }
@@ -1,18 +1,30 @@
-from typing import Optional
+from collections import OrderedDict
+from typing import Any, AsyncGenerator, Optional
 from mistralai import Mistral
-from mistralai.models import UserMessage, SystemMessage, Messages
+from mistralai.models import UserMessage, SystemMessage, AssistantMessage, Messages, ChatCompletionResponse
+import httpx
+import threading
 import uuid
 import json
 
 from app.parser import ParseMD
 from app.exceptions import MissingAPIKeyError
-from app.models import Chunk, Context
+from app.models import Chunk, Context, ChunkRef
+from app.rag.session_store import BaseSessionStore, MemorySessionStore, SQLiteSessionStore
 from app.config import settings
 
 
 
 
 
+# Message class of each role, to restore stored messages
+message_types = {
+    'system': SystemMessage,
+    'user': UserMessage,
+    'assistant': AssistantMessage
+}
+
+
 class LLMSession:
     """
     Session handler for Mistral LLM interactions.
@@ -24,8 +36,8 @@ class LLMSession:
     model_name: str
     temperature = .5
     max_tokens = 5000
-    messages: list[Messages] = []
-    contexts: dict[str, Context] = {}
+    messages: list[Messages]
+    contexts: OrderedDict[str, Context]
 
     def __init__(self, model: str = "mistral-small-latest"):
         """
@@ -43,17 +55,14 @@ class LLMSession:
                 "MISTRAL_API_KEY not found in environment variables"
             )
 
-        self._client = None
         self.model_name = model
+        self.contexts = OrderedDict()
         self.__init_messages()
 
     @property
-    def client(self):
-        """Lazy initialization of Mistral client."""
-        if self._client is None:
-            self._client = Mistral(api_key=self._api_key)
-
-        return self._client
+    def client(self) -> Mistral:
+        """Process-wide Mistral client, shared by every session (see LLMHandler)."""
+        return LLMHandler.get_client()
     
     def __init_messages(self) -> None:
         """
@@ -62,10 +71,13 @@ class LLMSession:
         self.messages = [
             SystemMessage(content=self.system_prompt)
         ]
+        # Rolling summary of the first `_summary_upto` exchanges
+        self._summary: str|None = None
+        self._summary_upto = 0
     
     def build_context(self, query: str, chunks: list[Chunk], store=True) -> Context:
         """
-        Create a RAG context / prompt from a list of chunk. Store the context chunks in history
+        Create a RAG context / prompt from a list of chunk. Store the context (chunk references) in history
 
         Args:
             chunks (list[Chunk]): The chunks to build a context from
@@ -75,15 +87,41 @@ class LLMSession:
         Returns:
             Context: Context object
         """
-        context = Context(
-            query=query,
-            chunks=chunks
-        )
+        context = Context.from_chunks(query, chunks)
 
         if store:
-            self.contexts[context.id] = context
+            self._store_context(context)
         
         return context
+
+    def _store_context(self, context: Context) -> None:
+        """
+        Store a context in history, keeping the last settings.SESSION_MAX_CONTEXTS ones
+
+        Args:
+            context (Context): Context to store
+        """
+        self.contexts[context.id] = context
+        self.contexts.move_to_end(context.id)
+
+        while len(self.contexts) > settings.SESSION_MAX_CONTEXTS:
+            self.contexts.popitem(last=False)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Estimated memory used by the session (messages text and contexts references,
+        the RAG prompts are shared with the messages)
+
+        Returns:
+            int: Size in bytes
+        """
+        size = sum(len(str(message.content)) for message in self.messages)
+        for context in self.contexts.values():
+            # Chunk ID, score and distance
+            size += len(context.query) + 24 * len(context.chunks)
+
+        return size
     
     def get_context(self, id: str) -> Context:
         """
@@ -101,21 +139,206 @@ class LLMSession:
         
         return context
 
-    def send_message(
-        self,
-        message: str,
-        context: Optional[Context] = None
-    ) -> str:
+    @property
+    def is_first_turn(self) -> bool:
+        """True until the first user message is sent (only the system prompt in history)."""
+        return not any(isinstance(message, UserMessage) for message in self.messages)
+
+    def add_exchange(self, message: str, response: str, context: Optional[Context] = None) -> None:
         """
-        Generate a response in a conversation context with history.
+        Add an already answered exchange to the conversation (e.g. from a cache)
 
         Args:
             message (str): The user message.
-            history (list[Message], optional): List of previous messages [{"role": "user"|"assistant", "content": "..."}].
-            context (str, optional): Optional RAG context prompt.
+            response (str): The assistant response.
+            context (Context, optional): Optional RAG context, stored in history.
+        """
+        if context:
+            self._store_context(context)
+
+        self._add_user_message(message, context)
+        self.messages.append(
+            AssistantMessage(content=response)
+        )
+
+    @staticmethod
+    def estimate_tokens(messages: list[Messages]) -> int:
+        """
+        Rough token count of messages (~4 characters per token, plus the role)
+
+        Args:
+            messages (list[Messages]): Messages to count
+
+        Returns:
+            int: Estimated number of tokens
+        """
+        return sum(len(str(message.content)) // 4 + 4 for message in messages)
+
+    def _split_history(self) -> tuple[list[list[Messages]], list[Messages]]:
+        """
+        Group the history (after the system prompt) by exchange: RAG context, user
+        message and assistant response. RAG contexts of previous exchanges are dropped,
+        they were only relevant to their own question.
+
+        Returns:
+            list[list[Messages]]: Previous exchanges, without their RAG context
+            list[Messages]: Current exchange (RAG context and user message)
+        """
+        exchanges: list[list[Messages]] = []
+        previous = None
+
+        for message in self.messages[1:]:
+            # An exchange starts with its RAG context, or with the user message if none
+            if isinstance(message, SystemMessage) or (
+                isinstance(message, UserMessage) and not isinstance(previous, SystemMessage)
+            ):
+                exchanges.append([])
+            exchanges[-1].append(message)
+            previous = message
+
+        if not exchanges:
+            return [], []
+
+        stripped = [
+            [message for message in exchange if not isinstance(message, SystemMessage)]
+            for exchange in exchanges[:-1]
+        ]
+        return stripped, exchanges[-1]
+
+    def _history_start(self, previous: list[list[Messages]], current: list[Messages]) -> int:
+        """
+        Index of the first previous exchange to send, so that at most
+        settings.HISTORY_MAX_EXCHANGES exchanges fit in settings.HISTORY_MAX_TOKENS.
+        The system prompt and the current exchange are always sent.
+
+        Args:
+            previous (list[list[Messages]]): Previous exchanges
+            current (list[Messages]): Current exchange
 
         Returns:
-            LLMResponse with content and usage stats
+            int: Index of the first exchange to keep
+        """
+        budget = settings.HISTORY_MAX_TOKENS - self.estimate_tokens([self.messages[0], *current])
+        if settings.HISTORY_SUMMARY:
+            budget -= settings.HISTORY_SUMMARY_MAX_TOKENS
+
+        start = max(self._summary_upto, len(previous) - settings.HISTORY_MAX_EXCHANGES)
+        used = sum(self.estimate_tokens(exchange) for exchange in previous[start:])
+
+        while start < len(previous) and used > budget:
+            used -= self.estimate_tokens(previous[start])
+            start += 1
+
+        return start
+
+    def prompt_messages(self) -> tuple[list[Messages], int]:
+        """
+        Messages sent to the LLM for the current exchange (see `_history_start`)
+
+        Returns:
+            list[Messages]: System prompt, summary, kept exchanges and current exchange
+            int: Estimated number of tokens of these messages
+        """
+        previous, current = self._split_history()
+        start = self._history_start(previous, current)
+
+        messages = [self.messages[0]]
+        if self._summary:
+            messages.append(
+                SystemMessage(content=f"Résumé de la conversation précédente :\n{self._summary}")
+            )
+        for exchange in previous[start:]:
+            messages.extend(exchange)
+        messages.extend(current)
+
+        return messages, self.estimate_tokens(messages)
+
+    def _summary_request(self) -> tuple[list[Messages]|None, int]:
+        """
+        Build the summarization request if exchanges are about to leave the window.
+        Older exchanges are summarized down to half the window, so that the summary
+        isn't updated on every turn.
+
+        Returns:
+            list[Messages]|None: Messages to send, None if the summary is up to date
+            int: Number of exchanges covered by the new summary
+        """
+        if not settings.HISTORY_SUMMARY:
+            return None, self._summary_upto
+
+        previous, current = self._split_history()
+        start = self._history_start(previous, current)
+        if start <= self._summary_upto:
+            return None, self._summary_upto
+
+        upto = max(start, len(previous) - max(1, settings.HISTORY_MAX_EXCHANGES // 2))
+        transcript = "\n".join(
+            f"{message.role}: {message.content}"
+            for exchange in previous[self._summary_upto:upto]
+            for message in exchange
+        )
+        if self._summary:
+            transcript = f"Résumé précédent :\n{self._summary}\n\n{transcript}"
+
+        request = [
+            SystemMessage(content=settings.HISTORY_SUMMARY_PROMPT),
+            UserMessage(content=transcript)
+        ]
+        return request, upto
+
+    def _set_summary(self, response: ChatCompletionResponse|None, upto: int) -> None:
+        if response is None or not response.choices:
+            raise ValueError("Invalid response from Mistral API")
+
+        self._summary = str(response.choices[0].message.content)
+        self._summary_upto = upto
+
+    def _update_summary(self) -> None:
+        """
+        Update the rolling summary of older exchanges, if needed (settings.HISTORY_SUMMARY).
+        On failure, the older exchanges are just dropped from the prompt.
+        """
+        request, upto = self._summary_request()
+        if request is None:
+            return
+
+        try:
+            response = self.client.chat.complete(
+                model=self.model_name,
+                messages=request,
+                temperature=0,
+                max_tokens=settings.HISTORY_SUMMARY_MAX_TOKENS,
+            )
+            self._set_summary(response, upto)
+        except Exception as e:
+            print(f"Error summarizing conversation {self.id}: {e}")
+
+    async def _update_summary_async(self) -> None:
+        """
+        Same as `_update_summary`, awaiting the Mistral API.
+        """
+        request, upto = self._summary_request()
+        if request is None:
+            return
+
+        try:
+            response = await self.client.chat.complete_async(
+                model=self.model_name,
+                messages=request,
+                temperature=0,
+                max_tokens=settings.HISTORY_SUMMARY_MAX_TOKENS,
+            )
+            self._set_summary(response, upto)
+        except Exception as e:
+            print(f"Error summarizing conversation {self.id}: {e}")
+
+    def _add_user_message(self, message: str, context: Optional[Context] = None) -> None:
+        """
+        Add the RAG context (if provided) and the user message to the conversation
+
+        Args:
+            message (str): The user message.
+            context (Context, optional): Optional RAG context.
         """
         # Add RAG context if provided
         if context:
@@ -128,15 +351,23 @@ class LLMSession:
             UserMessage(content=message)
         )
 
-        response = self.client.chat.complete(
-            model=self.model_name,
-            messages=self.messages,
-            temperature=self.temperature,
-            max_tokens=self.max_tokens,
-        )
+    def _read_response(self, response: ChatCompletionResponse|None, prompt_tokens: int) -> tuple[str, int]:
+        """
+        Add the LLM response to the conversation and parse it to plain text
 
-        if not response.choices:
+        Args:
+            response (ChatCompletionResponse): Mistral API response
+            prompt_tokens (int): Estimated tokens of the prompt, if the API doesn't report them
+
+        Returns:
+            str: Text response, without Markdown and emojis
+            int: Tokens of the prompt sent to the LLM
+        """
+        if response is None or not response.choices:
             raise ValueError("Invalid response from Mistral API")
+
+        if response.usage is not None:
+            prompt_tokens = response.usage.prompt_tokens
         
         # Add LLM response to conversation
         self.messages.append(
@@ -149,8 +380,193 @@ class LLMSession:
             remove_emojis=True
         )
 
-        return text_response
+        return text_response, prompt_tokens
+
+    def send_message(
+        self,
+        message: str,
+        context: Optional[Context] = None
+    ) -> tuple[str, int]:
+        """
+        Generate a response in a conversation context with history. The prompt is
+        bounded by the history policy (see `prompt_messages`).
+
+        Args:
+            message (str): The user message.
+            context (Context, optional): Optional RAG context.
+
+        Returns:
+            str: LLM text response
+            int: Tokens of the prompt sent to the LLM
+        """
+        self._add_user_message(message, context)
+        self._update_summary()
+
+        messages, prompt_tokens = self.prompt_messages()
+
+        response = self.client.chat.complete(
+            model=self.model_name,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+        )
+
+        return self._read_response(response, prompt_tokens)
+
+    async def send_message_async(
+        self,
+        message: str,
+        context: Optional[Context] = None
+    ) -> tuple[str, int]:
+        """
+        Same as `send_message`, awaiting the Mistral API on the shared async
+        connection pool instead of blocking a thread.
+
+        Args:
+            message (str): The user message.
+            context (Context, optional): Optional RAG context.
+
+        Returns:
+            str: LLM text response
+            int: Tokens of the prompt sent to the LLM
+        """
+        self._add_user_message(message, context)
+        await self._update_summary_async()
+
+        messages, prompt_tokens = self.prompt_messages()
+
+        response = await self.client.chat.complete_async(
+            model=self.model_name,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+        )
+
+        return self._read_response(response, prompt_tokens)
     
+    async def send_message_stream(
+        self,
+        message: str,
+        context: Optional[Context] = None
+    ) -> AsyncGenerator[tuple[str, Any], None]:
+        """
+        Same as `send_message_async`, yielding the response as the tokens are
+        generated. The exchange is kept in the conversation only once the response
+        is complete: on an LLM error or a client disconnection, it is removed.
+
+        Args:
+            message (str): The user message.
+            context (Context, optional): Optional RAG context.
+
+        Yields:
+            tuple[str, str]: ('token', raw Markdown delta) as the response is generated
+            tuple[str, int]: ('prompt_tokens', tokens of the prompt sent to the LLM), once generated
+            tuple[str, str]: ('response', whole response as plain text, without Markdown and emojis), last
+        """
+        start = len(self.messages)
+        self._add_user_message(message, context)
+        exchange = self.messages[start:]
+        completed = False
+
+        try:
+            await self._update_summary_async()
+
+            messages, prompt_tokens = self.prompt_messages()
+
+            stream = await self.client.chat.stream_async(
+                model=self.model_name,
+                messages=messages,
+                temperature=self.temperature,
+                max_tokens=self.max_tokens,
+            )
+
+            content: list[str] = []
+
+            async with stream as events:
+                async for event in events:
+                    if event.data.usage is not None:
+                        prompt_tokens = event.data.usage.prompt_tokens
+
+                    if not event.data.choices:
+                        continue
+
+                    delta = event.data.choices[0].delta.content
+                    if isinstance(delta, str) and delta:
+                        content.append(delta)
+                        yield 'token', delta
+
+            # Add LLM response to conversation
+            response = "".join(content)
+            self.messages.append(
+                AssistantMessage(content=response)
+            )
+            completed = True
+
+            yield 'prompt_tokens', prompt_tokens
+            # Markdown can only be parsed on the whole response (multi-line emphasis, code blocks, lists)
+            yield 'response', ParseMD.from_string(response, remove_emojis=True)
+        finally:
+            if not completed:
+                # Unanswered: drop the exchange, later prompts must not include it
+                self.messages[:] = [
+                    message for message in self.messages
+                    if all(message is not added for added in exchange)
+                ]
+    
+    def to_dict(self) -> dict:
+        """
+        Export the session state
+
+        Returns:
+            dict: JSON serializable session state
+        """
+        return {
+            'id': self.id,
+            'model': self.model_name,
+            'messages': [message.model_dump() for message in self.messages],
+            'contexts': [
+                {
+                    'id': context.id,
+                    'query': context.query,
+                    'chunks': [[chunk.id, chunk.score, chunk.distance] for chunk in context.chunks]
+                } for context in self.contexts.values()
+            ],
+            'summary': self._summary,
+            'summary_upto': self._summary_upto
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LLMSession":
+        """
+        Restore a session exported with `to_dict`
+
+        Args:
+            data (dict): Session state
+
+        Returns:
+            LLMSession: The restored session
+        """
+        session = cls(model=data['model'])
+        session.id = data['id']
+        session.messages = [
+            message_types[message['role']].model_validate(message)
+            for message in data['messages']
+        ]
+        session._summary = data['summary']
+        session._summary_upto = data['summary_upto']
+
+        for context in data['contexts']:
+            session.contexts[context['id']] = Context(
+                id=context['id'],
+                query=context['query'],
+                chunks=[
+                    ChunkRef(id=id, score=score, distance=distance)
+                    for id, score, distance in context['chunks']
+                ]
+            )
+
+        return session
+
     def dump_messages(self, format='txt') -> str:
         """
         Format message history to a string or json for export
@@ -184,14 +600,93 @@ class LLMSession:
 
 class LLMHandler:
     """
-    Manage LLMHandler sessions
+    Manage LLMHandler sessions and the Mistral client they share
     """
 
-    sessions: dict[str, LLMSession] = {}
+    _client: Optional[Mistral] = None
+    _client_lock = threading.Lock()
+
+    def __init__(self, backend: Optional[str] = None) -> None:
+        """
+        Args:
+            backend (str, optional): Session store, 'memory' (this process only) or 'sqlite'
+                (shared by every worker process). Default to settings.SESSION_BACKEND
+        """
+        self.backend = backend or settings.SESSION_BACKEND
+
+        options = {
+            'max_sessions': settings.SESSION_MAX,
+            'ttl': settings.SESSION_TTL,
+            'sweep_interval': settings.SESSION_SWEEP_INTERVAL
+        }
+        self.sessions: BaseSessionStore[LLMSession]
+        match self.backend:
+            case 'memory':
+                self.sessions = MemorySessionStore(**options)
+            case 'sqlite':
+                self.sessions = SQLiteSessionStore(
+                    **options,
+                    dump=LLMSession.to_dict,
+                    load=LLMSession.from_dict,
+                    cache_size=settings.SESSION_CACHE_SIZE
+                )
+            case _:
+                raise ValueError(f"Unknown session backend '{self.backend}', expected 'memory' or 'sqlite'")
+
+        self.sessions.start()
+
+    def close(self) -> None:
+        """
+        Stop the session store background threads (pending sessions are written)
+        """
+        self.sessions.stop()
+
+    @classmethod
+    def get_client(cls) -> Mistral:
+        """
+        Lazy initialization of the process-wide Mistral client. Sync and async
+        calls go through pooled keep-alive connections (settings.MISTRAL_POOL_SIZE).
+
+        Returns:
+            Mistral: Mistral client
+        """
+        if cls._client is None:
+            # Built once, concurrent first calls (threadpool, CPU executor, ingestion) wait for it
+            with cls._client_lock:
+                if cls._client is None:
+                    limits = httpx.Limits(
+                        max_connections=settings.MISTRAL_POOL_SIZE,
+                        max_keepalive_connections=settings.MISTRAL_POOL_SIZE,
+                        keepalive_expiry=settings.MISTRAL_KEEPALIVE
+                    )
+                    timeout = httpx.Timeout(settings.MISTRAL_TIMEOUT)
+
+                    cls._client = Mistral(
+                        api_key=settings.MISTRAL_API_KEY.get_secret_value(),
+                        server_url=settings.MISTRAL_SERVER_URL,
+                        client=httpx.Client(limits=limits, timeout=timeout, follow_redirects=True),
+                        async_client=httpx.AsyncClient(limits=limits, timeout=timeout, follow_redirects=True)
+                    )
+
+        return cls._client
+
+    @classmethod
+    async def aclose(cls) -> None:
+        """
+        Close the shared client connections
+        """
+        with cls._client_lock:
+            client, cls._client = cls._client, None
+
+        if client is not None:
+            if client.sdk_configuration.client is not None:
+                client.sdk_configuration.client.close()
+            if client.sdk_configuration.async_client is not None:
+                await client.sdk_configuration.async_client.aclose()
 
     def get_session(self, id: str) -> LLMSession:
         """
-        Retrieve a LLMSession from its uuid
+        Retrieve a LLMSession from its uuid (expired or evicted sessions are not found)
 
         Args:
             id (int): Session uuid
@@ -210,9 +705,18 @@ class LLMHandler:
             LLMHandler: The LLMSession instance
         """
         session = LLMSession()
-        self.sessions[session.id] = session
+        self.sessions.set(session.id, session)
         return session
     
+    def save_session(self, session: LLMSession) -> None:
+        """
+        Persist the changes made to a session (new messages, contexts)
+
+        Args:
+            session (LLMSession): The modified session
+        """
+        self.sessions.save(session.id)
+
     def delete_session(self, id: str) -> None:
         """
         Delete a LLMSession instance
@@ -220,5 +724,5 @@ class LLMHandler:
         Args:
             id (int): Session uuid
         """
-        session = self.get_session(id)
-        self.sessions.pop(session.id)
\ No newline at end of file
+        if self.sessions.pop(id) is None:
+            raise IndexError(f"No session found with uuid {id}")
\ No newline at end of file
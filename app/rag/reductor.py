@@ -1,4 +1,6 @@
 import os
+import tempfile
+import threading
 
 from app.config import settings
 
@@ -8,24 +10,67 @@ import joblib
 
 
 class Reductor:
+    """
+    Reduce 384d embeddings to 3d (t-SNE), to plot the chunks and queries.
+
+    A query can be placed in the fitted 3d space in 3 ways:
+    - 'exact': openTSNE optimization (`transform`), the slowest
+    - 'interpolate': similarity-weighted mean of the nearest chunks projections (`interpolate`)
+    - 'parametric': ridge regression from the embeddings to the projections (`transform_parametric`)
+    """
 
     model_name = "tsne.joblib"
+    mapper_name = "tsne_mapper.npz"
+
+    # Softmax temperature over cosine distances for `interpolate`
+    temperature = .05
 
     def __init__(self) -> None:
         self._model_path = self.__make_model_path()
-        self._model = self.__load_model()
+        # Loaded on first use, 'interpolate' never needs them
+        self._model: TSNEEmbedding|None = None
+        self._mapper: np.ndarray|None = None
+        self._lock = threading.Lock()
 
     def __make_model_path(self) -> str:
         path = settings.DATA_PATH
         return os.path.join(path, 'models')
 
+    @property
+    def model(self) -> TSNEEmbedding|None:
+        """Lazy loading of the fitted t-SNE model."""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._model = self.__load_model()
+
+        return self._model
+
+    @property
+    def mapper(self) -> np.ndarray|None:
+        """Lazy loading of the parametric mapper weights."""
+        if self._mapper is None:
+            with self._lock:
+                if self._mapper is None:
+                    self._mapper = self.__load_mapper()
+
+        return self._mapper
+
     def __load_model(self) -> TSNEEmbedding|None:
         try:
             path = os.path.join(self._model_path, self.model_name)
             return joblib.load(path)
         except FileNotFoundError:
             return None
-        
+
+    def __load_mapper(self) -> np.ndarray|None:
+        try:
+            path = os.path.join(self._model_path, self.mapper_name)
+            with np.load(path) as data:
+                return data['weights']
+        except FileNotFoundError:
+            return None
+
     def __save_model(self, model: TSNEEmbedding) -> None:
         path = os.path.join(self._model_path, self.model_name)
         joblib.dump(model, path)
@@ -33,7 +78,8 @@ class Reductor:
 
     def fit_transform(self, X: np.ndarray, n = 3, p = 30) -> np.ndarray:
         """
-        Fit a TSNE model, reduce the 384d vectors to 3d space and save the model
+        Fit a TSNE model, reduce the 384d vectors to 3d space and save the model.
+        The parametric mapper is fitted on the result.
 
         Args:
             X (np.ndarray): List of vectors to reduce
@@ -44,8 +90,8 @@ class Reductor:
             np.ndarray: 3d reductions
         """
         model = TSNE(
-            n_components=n, 
-            metric='cosine', 
+            n_components=n,
+            metric='cosine',
             perplexity=max(p, 1),
             n_jobs=-1
         )
@@ -53,24 +99,136 @@ class Reductor:
         X_reduced = model.fit(X)
         self.__save_model(X_reduced)
 
-        return np.asarray(X_reduced, dtype=np.float32)
+        X_reduced = np.asarray(X_reduced, dtype=np.float32)
+        self.fit_mapper(X, X_reduced)
+
+        return X_reduced
+
+    @property
+    def fitted_size(self) -> int:
+        """Number of vectors the t-SNE model was fitted on (0 if not fitted)."""
+        model = self.model
+        return len(model) if model is not None else 0
+
+    def drift(self, n: int, deleted: int = 0) -> float:
+        """
+        Share of the layout that doesn't come from the fit, i.e. how far the fitted layout
+        is from a refit on every vector: the `n` stored vectors placed by `transform` and
+        the fitted vectors deleted since (fewer stored than fitted vectors, or `deleted`)
+
+        Args:
+            n (int): Number of stored vectors
+            deleted (int): Number of vectors deleted by the current change. Default to 0
+
+        Returns:
+            float: Drift between 0 and 1 (1 if not fitted, 0 if nothing is stored nor fitted)
+        """
+        size = max(n, self.fitted_size)
+        if size <= 0:
+            return 0.
+        # Fitted vectors still stored, at most
+        kept = max(min(self.fitted_size - deleted, n), 0)
+        return 1 - kept / size
 
     def transform(self, X: np.ndarray) -> np.ndarray:
         """
-        Reduce a 384d vector to 3d space using fitted model
+        Reduce 384d vectors to 3d space using fitted model (the fitted layout is unchanged,
+        new vectors are optimized against it)
 
         Args:
-            X (np.ndarray): Vector to reduce
+            X (np.ndarray): Vectors to reduce (384,) or (n, 384)
 
         Returns:
-            np.ndarray: 3d reduction
+            np.ndarray: 3d reductions (n, 3)
         """
-        if self._model is None:
+        model = self.model
+        if model is None:
             raise Exception("Model must be fitted before transforming embeddings")
-        
+
         # Transform X if only 1 dimension
         if X.ndim == 1:
             X = X.reshape(1, -1)
-        
-        X_reduced = self._model.transform(X)
-        return np.asarray(X_reduced, dtype=np.float32)
\ No newline at end of file
+
+        X_reduced = model.transform(X)
+        return np.asarray(X_reduced, dtype=np.float32)
+
+    @staticmethod
+    def _normalize(X: np.ndarray) -> np.ndarray:
+        X = np.atleast_2d(np.asarray(X, dtype=np.float32))
+        norms = np.linalg.norm(X, axis=1, keepdims=True)
+        return X / np.where(norms == 0, 1, norms)
+
+    def fit_mapper(self, X: np.ndarray, X_reduced: np.ndarray, alpha: float = 1.) -> np.ndarray:
+        """
+        Fit and save a ridge regression from the (normalized) 384d vectors to their 3d reduction
+
+        Args:
+            X (np.ndarray): Vectors (n, 384)
+            X_reduced (np.ndarray): Their 3d reduction (n, 3)
+            alpha (float): L2 regularization. Default to 1
+
+        Returns:
+            np.ndarray: Weights (385, 3), the last row is the intercept
+        """
+        X = np.hstack([self._normalize(X), np.ones((len(X), 1), dtype=np.float32)]).astype(np.float64)
+        Y = np.asarray(X_reduced, dtype=np.float64)
+
+        # Closed form ridge, the intercept is not regularized
+        regularization = alpha * np.eye(X.shape[1])
+        regularization[-1, -1] = 0
+        weights = np.linalg.solve(X.T @ X + regularization, X.T @ Y).astype(np.float32)
+
+        os.makedirs(self._model_path, exist_ok=True)
+        path = os.path.join(self._model_path, self.mapper_name)
+        # Temporary file of its own: several worker processes may fit the mapper at once
+        tmp = tempfile.NamedTemporaryFile(dir=self._model_path, suffix='.tmp.npz', delete=False)
+        try:
+            with tmp:
+                np.savez(tmp, weights=weights)
+            # Atomic replace so another process never reads a partial file
+            os.replace(tmp.name, path)
+        except BaseException:
+            os.remove(tmp.name)
+            raise
+        self._mapper = weights
+
+        return weights
+
+    def transform_parametric(self, X: np.ndarray) -> np.ndarray:
+        """
+        Reduce 384d vectors to 3d space with the parametric mapper (see `fit_mapper`)
+
+        Args:
+            X (np.ndarray): Vectors to reduce (384,) or (n, 384)
+
+        Returns:
+            np.ndarray: 3d reductions (n, 3)
+        """
+        weights = self.mapper
+        if weights is None:
+            raise Exception("Mapper must be fitted before transforming embeddings")
+
+        X = self._normalize(X)
+        return X @ weights[:-1] + weights[-1]
+
+    @classmethod
+    def interpolate(cls, distances: np.ndarray, coords: np.ndarray) -> np.ndarray:
+        """
+        Place a vector in 3d space from its nearest chunks: mean of their 3d reductions,
+        weighted by a softmax of their (negative) cosine distance to the vector
+
+        Args:
+            distances (np.ndarray): Cosine distances to the nearest chunks (k,)
+            coords (np.ndarray): 3d reductions of the nearest chunks (k, 3)
+
+        Returns:
+            np.ndarray: 3d reduction (1, 3)
+        """
+        if len(distances) == 0:
+            raise ValueError("At least one neighbor is needed to interpolate")
+
+        distances = np.asarray(distances, dtype=np.float32)
+        weights = np.exp(-(distances - distances.min()) / cls.temperature)
+        weights /= weights.sum()
+
+        return (weights @ np.asarray(coords, dtype=np.float32)).reshape(1, -1)
@@ -0,0 +1,78 @@
+"""
+Model Registry Module.
+
+This module provides a process-wide registry so that each model is loaded
+once and shared by every Vectorizer, Reranker and service.
+"""
+
+import threading
+from typing import Any, Callable, TypeVar
+
+from sentence_transformers import SentenceTransformer, CrossEncoder
+
+
+T = TypeVar("T")
+
+
+class ModelRegistry:
+    """
+    Lazily load models by name, once per process.
+
+    Loading is guarded by one lock per model, so concurrent first accesses
+    wait for a single load while other models can load in parallel.
+    """
+
+    def __init__(self) -> None:
+        self._models: dict[tuple[str, str], Any] = {}
+        self._locks: dict[tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, name: str, loader: Callable[[str], T]) -> T:
+        """
+        Get a model, loading it on first access.
+
+        Args:
+            kind (str): Model kind (e.g. 'embedding', 'cross-encoder').
+            name (str): Model name.
+            loader (Callable): Function loading the model from its name.
+
+        Returns:
+            T: The shared model instance.
+        """
+        key = (kind, name)
+
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+
+        with lock:
+            # Another thread may have loaded it while we were waiting
+            model = self._models.get(key)
+            if model is None:
+                try:
+                    model = loader(name)
+                except Exception as e:
+                    print(f"Error loading {kind} model '{name}': {e}")
+                    raise
+                self._models[key] = model
+
+        return model
+
+    def get_embedding_model(self, name: str) -> SentenceTransformer:
+        return self.get("embedding", name, lambda n: SentenceTransformer(n, device="cpu"))
+
+    def get_cross_encoder(self, name: str) -> CrossEncoder:
+        return self.get("cross-encoder", name, lambda n: CrossEncoder(n))
+
+    def loaded(self) -> list[str]:
+        """
+        Returns:
+            list[str]: Loaded models, as 'kind:name'
+        """
+        return [f"{kind}:{name}" for kind, name in self._models]
+
+
+registry = ModelRegistry()
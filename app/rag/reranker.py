@@ -11,6 +11,7 @@ from typing import Optional
 from sentence_transformers import CrossEncoder
 
 from app.models import Chunk
+from app.rag.registry import registry
 
 
 class Reranker:
@@ -24,9 +25,6 @@ class Reranker:
         model_name (str): Name of the cross-encoder model.
     """
 
-    _model: Optional[CrossEncoder] = None
-    _current_model_name: Optional[str] = None
-
     def __init__(
         self,
         model_name: Optional[str] = None,
@@ -40,36 +38,21 @@ class Reranker:
         """
         self.model_name = model_name or os.getenv("RERANKER_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
 
-        try:
-            Reranker._model = CrossEncoder(self.model_name)
-        except Exception as e:
-            print(f"Error loading reranker model '{self.model_name}': {e}")
-            raise
+        # Load the model now (once per process) so that errors show up at startup
+        self.model
 
     @property
     def model(self) -> CrossEncoder:
         """
-        Get or load the cross-encoder model (lazy initialization, singleton).
+        Get the cross-encoder model from the process-wide model registry.
 
-        The model is shared across all CrossEncoder instances to
-        avoid loading it multiple times.
+        The model is loaded on first access and shared across all Reranker
+        instances.
 
         Returns:
             CrossEncoder: The loaded model instance.
         """
-        if (
-            Reranker._model is None
-            or Reranker._current_model_name != self.model_name
-        ):
-            try:
-                Reranker._model = CrossEncoder(self.model_name)
-            except Exception as e:
-                print(f"Error loading reranker model '{self.model_name}': {e}")
-                raise
-
-            Reranker._current_model_name = self.model_name
-
-        return Reranker._model
+        return registry.get_cross_encoder(self.model_name)
 
     def rerank(self, query: str, chunks: list[Chunk], threeshold = -2) -> list[Chunk]:
         """
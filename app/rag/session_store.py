@@ -0,0 +1,516 @@
+"""
+Session Store Module.
+
+This module provides bounded, thread-safe stores for chat sessions: idle
+sessions expire after a TTL (removed by a background sweeper) and the least
+recently used ones are evicted above a maximum count.
+
+- MemorySessionStore keeps the sessions in the process (default).
+- SQLiteSessionStore shares them between worker processes through a SQLite
+  database, with an in-process cache (updates are written behind).
+"""
+
+import json
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Iterator, Optional, TypeVar
+
+from app.database import SessionDB
+
+
+V = TypeVar("V")
+
+
+class BaseSessionStore(ABC, Generic[V]):
+    """
+    Store of sessions by id, with idle TTL and maximum count.
+
+    Attributes:
+        max_sessions (int): Maximum number of sessions.
+        ttl (float|None): Idle lifetime in seconds, None for no expiry.
+        sweep_interval (float): Seconds between two sweeps of expired sessions.
+    """
+
+    def __init__(
+            self,
+            max_sessions: int = 1000,
+            ttl: Optional[float] = 3600,
+            sweep_interval: float = 60
+        ) -> None:
+        """
+        Args:
+            max_sessions (int): Maximum number of sessions. Defaults to 1000.
+            ttl (float, optional): Idle lifetime in seconds. Defaults to 3600.
+            sweep_interval (float): Seconds between two sweeps. Defaults to 60.
+        """
+        if max_sessions < 1:
+            raise ValueError(f"Session store size must be at least 1, got {max_sessions}")
+
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.evicted = 0
+        self.expired = 0
+
+        self._stop = threading.Event()
+        self._sweeper: threading.Thread|None = None
+
+    @abstractmethod
+    def get(self, id: str) -> Optional[V]:
+        """
+        Get a session and mark it as recently used.
+
+        Args:
+            id (str): Session id.
+
+        Returns:
+            V|None: The session, None if missing or expired.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def set(self, id: str, session: V) -> None:
+        """
+        Store a session, evicting the least recently used ones if full.
+
+        Args:
+            id (str): Session id.
+            session (V): Session to store.
+        """
+        raise NotImplementedError
+
+    def save(self, id: str) -> None:
+        """
+        Persist the changes made to a stored session (no-op for in-memory stores).
+
+        Args:
+            id (str): Session id.
+        """
+
+    @abstractmethod
+    def pop(self, id: str) -> Optional[V]:
+        """
+        Remove a session.
+
+        Args:
+            id (str): Session id.
+
+        Returns:
+            V|None: The removed session, None if missing.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def sweep(self) -> int:
+        """
+        Remove the expired sessions.
+
+        Returns:
+            int: Number of removed sessions.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def stats(self) -> dict[str, Any]:
+        """
+        Store counters and estimated memory use.
+
+        Returns:
+            dict: sessions, max_sessions, ttl, evicted, expired, contexts and bytes
+        """
+        raise NotImplementedError
+
+    @property
+    def _needs_sweeper(self) -> bool:
+        # Expired sessions must be removed in the background
+        return self.ttl is not None
+
+    def __sweep_loop(self) -> None:
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"Error sweeping sessions: {e}")
+
+    def start(self) -> None:
+        """
+        Start the background sweeper thread (no-op if already running).
+        """
+        if not self._needs_sweeper or (self._sweeper is not None and self._sweeper.is_alive()):
+            return
+
+        self._stop.clear()
+        self._sweeper = threading.Thread(target=self.__sweep_loop, name="session-sweeper", daemon=True)
+        self._sweeper.start()
+
+    def stop(self) -> None:
+        """
+        Stop the background sweeper thread.
+        """
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+
+
+class MemorySessionStore(BaseSessionStore[V]):
+    """
+    In-process LRU store of sessions. Sessions are lost on restart and are only
+    visible to the worker process that created them.
+    """
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+
+        self._sessions: OrderedDict[str, tuple[V, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._sessions
+
+    def __iter__(self) -> Iterator[V]:
+        with self._lock:
+            sessions = [session for session, _ in self._sessions.values()]
+        return iter(sessions)
+
+    def _is_expired(self, last_access: float, now: float) -> bool:
+        return self.ttl is not None and now - last_access > self.ttl
+
+    def get(self, id: str) -> Optional[V]:
+        now = time.monotonic()
+
+        with self._lock:
+            entry = self._sessions.get(id)
+            if entry is None:
+                return None
+
+            if self._is_expired(entry[1], now):
+                del self._sessions[id]
+                self.expired += 1
+                return None
+
+            self._sessions[id] = (entry[0], now)
+            self._sessions.move_to_end(id)
+            return entry[0]
+
+    def set(self, id: str, session: V) -> None:
+        with self._lock:
+            self._sessions[id] = (session, time.monotonic())
+            self._sessions.move_to_end(id)
+
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+
+    def pop(self, id: str) -> Optional[V]:
+        with self._lock:
+            entry = self._sessions.pop(id, None)
+        return entry[0] if entry is not None else None
+
+    def sweep(self) -> int:
+        if self.ttl is None:
+            return 0
+
+        now = time.monotonic()
+        with self._lock:
+            # Least recently used first: stop at the first session still alive
+            expired = []
+            for id, (_, last_access) in self._sessions.items():
+                if not self._is_expired(last_access, now):
+                    break
+                expired.append(id)
+
+            for id in expired:
+                del self._sessions[id]
+            self.expired += len(expired)
+
+        return len(expired)
+
+    def stats(self) -> dict[str, Any]:
+        sessions = list(self)
+        return {
+            "backend": "memory",
+            "sessions": len(sessions),
+            "max_sessions": self.max_sessions,
+            "ttl": self.ttl,
+            "evicted": self.evicted,
+            "expired": self.expired,
+            "contexts": sum(len(getattr(session, "contexts", ())) for session in sessions),
+            "bytes": sum(getattr(session, "nbytes", 0) for session in sessions),
+        }
+
+
+class SQLiteSessionStore(BaseSessionStore[V]):
+    """
+    Sessions shared by every worker process through a SQLite (WAL) database,
+    stored as zlib-compressed JSON.
+
+    Recently used sessions stay in an in-process LRU cache: a cached session is
+    reused as long as its version in the database is unchanged. New sessions are
+    written at once by `set`, so that any worker can serve the next request.
+    Updates are write-behind: `save` marks the session as dirty and a writer
+    thread flushes the dirty sessions in one transaction, off the request path.
+    A flush only overwrites the version the session was loaded with, a session
+    updated by another process meanwhile is reloaded instead.
+    Expiry and eviction (by the sweeper thread, even without TTL) are based on
+    the last access time: reads are recorded in memory and written by the sweeper
+    before it removes sessions.
+    """
+
+    def __init__(
+            self,
+            *args,
+            dump: Callable[[V], dict],
+            load: Callable[[dict], V],
+            cache_size: int = 128,
+            session_db: Optional[SessionDB] = None,
+            **kwargs
+        ) -> None:
+        """
+        Args:
+            dump (Callable): Function converting a session to a JSON serializable dict.
+            load (Callable): Function converting a dict back to a session.
+            cache_size (int): Maximum number of cached sessions. Defaults to 128.
+            session_db (SessionDB, optional): Session database. Defaults to a new SessionDB.
+            *args, **kwargs: See `BaseSessionStore`.
+        """
+        super().__init__(*args, **kwargs)
+
+        self.dump = dump
+        self.load = load
+        self.cache_size = cache_size
+        self.session_db = session_db or SessionDB()
+
+        # Cached sessions with the version they were loaded or written with
+        self._cache: OrderedDict[str, tuple[V, int]] = OrderedDict()
+        self._dirty: set[str] = set()
+        # Last read time of the sessions read since the last sweep
+        self._accessed: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._writer: threading.Thread|None = None
+
+    def _encode(self, session: V) -> tuple[bytes, int]:
+        data = self.dump(session)
+        blob = zlib.compress(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode())
+        return blob, len(data.get("contexts", ()))
+
+    def _decode(self, blob: bytes) -> V:
+        return self.load(json.loads(zlib.decompress(blob)))
+
+    def _cache_put(self, id: str, session: V, version: int) -> None:
+        # Must be called with the lock held, dirty sessions are never evicted before being written
+        self._cache[id] = (session, version)
+        self._cache.move_to_end(id)
+
+        for cached_id in list(self._cache):
+            if len(self._cache) <= self.cache_size:
+                break
+            if cached_id not in self._dirty:
+                del self._cache[cached_id]
+
+    def get(self, id: str) -> Optional[V]:
+        session = self._get(id)
+        if session is not None:
+            with self._lock:
+                self._accessed[id] = time.time()
+        return session
+
+    def _get(self, id: str) -> Optional[V]:
+        with self._lock:
+            cached = self._cache.get(id)
+            if cached is not None and id in self._dirty:
+                # Not written yet, the local copy is the latest
+                self._cache.move_to_end(id)
+                return cached[0]
+
+        version = self.session_db.get_version(id)
+
+        with self._lock:
+            if version is None:
+                self._cache.pop(id, None)
+                return None
+
+            if cached is not None and cached[1] == version:
+                self._cache.move_to_end(id)
+                return cached[0]
+
+        # Missing from the cache or updated by another process
+        row = self.session_db.get_session(id)
+        if row is None:
+            return None
+
+        version, blob = row
+        session = self._decode(blob)
+
+        with self._lock:
+            current = self._cache.get(id)
+            # Changed in this process meanwhile, or already reloaded: keep the local copy
+            if current is not None and (id in self._dirty or current[1] >= version):
+                self._cache.move_to_end(id)
+                return current[0]
+
+            self._cache_put(id, session, version)
+
+        return session
+
+    def set(self, id: str, session: V) -> None:
+        # Written before returning: the next request may reach another worker
+        version = time.time_ns()
+        blob, contexts = self._encode(session)
+        self.session_db.set_sessions([(id, version, time.time(), contexts, blob, None)])
+
+        with self._lock:
+            self._dirty.discard(id)
+            self._cache_put(id, session, version)
+
+    def save(self, id: str) -> None:
+        with self._lock:
+            if id not in self._cache:
+                return
+            self._dirty.add(id)
+        self._wake.set()
+
+    def pop(self, id: str) -> Optional[V]:
+        with self._lock:
+            cached = self._cache.pop(id, None)
+            self._dirty.discard(id)
+            self._accessed.pop(id, None)
+
+        if cached is not None:
+            session = cached[0]
+        else:
+            row = self.session_db.get_session(id)
+            session = self._decode(row[1]) if row is not None else None
+
+        self.session_db.delete_session(id)
+        return session
+
+    def flush(self) -> int:
+        """
+        Write the dirty sessions, in one transaction.
+
+        Returns:
+            int: Number of written sessions.
+        """
+        with self._lock:
+            self._wake.clear()
+            dirty = [(id, *self._cache[id]) for id in self._dirty if id in self._cache]
+            self._dirty.clear()
+
+        if not dirty:
+            return 0
+
+        rows = []
+        versions = []
+        now = time.time()
+        for id, session, expected in dirty:
+            # Unique version, known before the write so this process never reloads its own write
+            version = time.time_ns()
+            blob, contexts = self._encode(session)
+            rows.append((id, version, now, contexts, blob, expected))
+            versions.append(version)
+
+            with self._lock:
+                if id in self._cache:
+                    self._cache[id] = (session, version)
+
+        try:
+            conflicts = self.session_db.set_sessions(rows)
+        except Exception as e:
+            print(f"Error writing sessions: {e}")
+            with self._lock:
+                # Not written: the next flush expects the stored version again
+                for (id, session, expected), version in zip(dirty, versions):
+                    cached = self._cache.get(id)
+                    if cached is not None and cached[1] == version:
+                        self._cache[id] = (session, expected)
+                self._dirty.update(id for id, *_ in dirty)
+            raise
+
+        with self._lock:
+            for id in conflicts:
+                # Updated by another process since it was loaded, the next `get` reloads it
+                print(f"Session {id} was updated by another process, its local changes are dropped")
+                self._cache.pop(id, None)
+                self._dirty.discard(id)
+
+        return len(rows) - len(conflicts)
+
+    def __write_loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait()
+            try:
+                self.flush()
+            except Exception:
+                # Retry on the next wake up
+                time.sleep(1)
+
+    @property
+    def _needs_sweeper(self) -> bool:
+        # The maximum number of sessions is only enforced by the sweeps
+        return True
+
+    def sweep(self) -> int:
+        with self._lock:
+            accessed, self._accessed = self._accessed, {}
+        if accessed:
+            # Read sessions are not expired nor evicted before those only written
+            self.session_db.touch_sessions(accessed)
+
+        removed = 0
+        if self.ttl is not None:
+            expired = self.session_db.delete_expired(time.time() - self.ttl)
+            self.expired += expired
+            removed += expired
+
+        evicted = self.session_db.delete_oldest(self.max_sessions)
+        self.evicted += evicted
+
+        return removed + evicted
+
+    def start(self) -> None:
+        """
+        Start the writer thread and the background sweeper thread.
+        """
+        super().start()
+
+        if self._writer is None or not self._writer.is_alive():
+            self._stop.clear()
+            self._writer = threading.Thread(target=self.__write_loop, name="session-writer", daemon=True)
+            self._writer.start()
+
+    def stop(self) -> None:
+        """
+        Stop the background threads and write the pending sessions.
+        """
+        super().stop()
+
+        self._wake.set()
+        if self._writer is not None:
+            self._writer.join()
+            self._writer = None
+
+        self.flush()
+        self.session_db.close()
+
+    def stats(self) -> dict[str, Any]:
+        sessions, contexts, size = self.session_db.get_stats()
+        return {
+            "backend": "sqlite",
+            "sessions": sessions,
+            "max_sessions": self.max_sessions,
+            "ttl": self.ttl,
+            "evicted": self.evicted,
+            "expired": self.expired,
+            "contexts": contexts,
+            "bytes": size,
+            "cached": len(self._cache),
+            "dirty": len(self._dirty),
+        }
@@ -0,0 +1,525 @@
+"""
+Vector Index Module.
+
+In-process vector indexes used by VectorStore as an alternative to the sqlite-vec
+KNN query (`DocumentDB.get_k_nearest`).
+"""
+
+import os
+import tempfile
+from abc import ABC, abstractmethod
+from typing import Literal
+
+import numpy as np
+import sqlean as sqlite3
+
+from app.database import DocumentDB
+from app.config import settings
+
+
+class BaseIndex(ABC):
+    """
+    Base class of in-memory vector indexes.
+
+    Attributes:
+        chunk_ids (np.ndarray): Chunk ID of each indexed vector.
+        document_ids (np.ndarray): Document ID of each indexed vector.
+        signature (tuple|None): DocumentDB signature the index was built from.
+        version (int|None): Chunk version the index holds (see `DocumentDB.get_chunk_version`).
+        exact (bool): False if search distances are approximate and must be rescored.
+    """
+
+    chunk_ids: np.ndarray
+    document_ids: np.ndarray
+    signature: tuple|None = None
+    version: int|None = None
+    exact: bool = True
+
+    def __len__(self) -> int:
+        return len(self.chunk_ids)
+
+    @staticmethod
+    def _normalize(X: np.ndarray) -> np.ndarray:
+        """
+        L2 normalize vectors so that a dot product is a cosine similarity
+
+        Args:
+            X (np.ndarray): Vector or matrix of row vectors
+
+        Returns:
+            np.ndarray: Contiguous normalized float32 copy
+        """
+        X = np.array(X, dtype=np.float32, order='C')
+        norms = np.linalg.norm(X, axis=-1, keepdims=True)
+        norms[norms == 0] = 1
+        X /= norms
+        return X
+
+    @staticmethod
+    def _top_k(similarities: np.ndarray, k: int) -> np.ndarray:
+        """
+        Positions of the k highest similarities, sorted by decreasing similarity
+
+        Args:
+            similarities (np.ndarray): Similarity scores
+            k (int): Number of positions to keep
+
+        Returns:
+            np.ndarray: Sorted positions
+        """
+        k = min(k, len(similarities))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+
+        top = np.argpartition(-similarities, k - 1)[:k]
+        return top[np.argsort(-similarities[top])]
+
+    @classmethod
+    @abstractmethod
+    def from_db(cls, document_db: DocumentDB, conn: sqlite3.Connection) -> "BaseIndex":
+        ...
+
+    @classmethod
+    def load(cls, document_db: DocumentDB, conn: sqlite3.Connection) -> "BaseIndex":
+        """
+        Get the index for the current database content. Indexes that are not
+        persisted are simply built from database.
+
+        Args:
+            document_db (DocumentDB): Document database
+            conn (sqlite3.Connection): DB connection
+
+        Returns:
+            BaseIndex: The index
+        """
+        return cls.from_db(document_db, conn)
+
+    @abstractmethod
+    def add(self, chunk_ids: np.ndarray, document_ids: np.ndarray, embeddings: np.ndarray) -> None:
+        """
+        Append vectors to the index. Attributes are replaced, never modified in place, so
+        a shallow copy of the index can be extended while the original keeps serving.
+
+        Args:
+            chunk_ids (np.ndarray): Chunk ID of each row
+            document_ids (np.ndarray): Document ID of each row
+            embeddings (np.ndarray): (n, d) float32 embeddings matrix
+        """
+        ...
+
+    @abstractmethod
+    def search(self, embedding: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Search the k nearest chunks of an embedding
+
+        Args:
+            embedding (np.ndarray): Query embedding
+            k (int): Number of chunks to retrieve
+
+        Returns:
+            np.ndarray: Chunk IDs, nearest first
+            np.ndarray: Cosine distances
+        """
+        ...
+
+
+class FlatIndex(BaseIndex):
+    """
+    Exhaustive in-memory index: one contiguous matrix scanned with a single
+    matrix-vector product.
+
+    The matrix holds pre-normalized float32 embeddings, or their int8 (4x smaller)
+    or 1-bit (32x smaller) codes. Quantized distances are approximate and must be
+    rescored with the exact embeddings (see `exact`).
+    """
+
+    block_size = 8192
+
+    def __init__(
+            self,
+            chunk_ids: np.ndarray,
+            document_ids: np.ndarray,
+            embeddings: np.ndarray,
+            quantization: Literal["none", "int8", "bit"] = "none"
+        ) -> None:
+        """
+        Args:
+            chunk_ids (np.ndarray): Chunk ID of each row
+            document_ids (np.ndarray): Document ID of each row
+            embeddings (np.ndarray): (n, d) float32 embeddings, or their codes if quantized
+            quantization (str, optional): 'none', 'int8' or 'bit'. Default to 'none'
+        """
+        self.chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        self.document_ids = np.asarray(document_ids, dtype=np.int64)
+        self.quantization = quantization
+        self.exact = quantization == 'none'
+
+        match quantization:
+            case 'none':
+                self.embeddings = self._normalize(embeddings)
+            case 'int8':
+                if embeddings.dtype != np.int8:
+                    embeddings = DocumentDB.quantize(embeddings, 'int8')
+                self.embeddings = np.ascontiguousarray(embeddings)
+                self._norms = self.__block_map(lambda block: np.linalg.norm(block, axis=1))
+            case 'bit':
+                if embeddings.dtype != np.uint8:
+                    embeddings = DocumentDB.quantize(embeddings, 'bit')
+                # Packed bits viewed as 64-bit words for XOR / popcount
+                self.embeddings = np.ascontiguousarray(embeddings).view(np.uint64)
+            case _:
+                raise ValueError(f"Invalid quantization parameter '{quantization}'")
+
+    def __block_map(self, func) -> np.ndarray:
+        """
+        Apply a function on float32 blocks of the int8 codes, so the whole
+        matrix is never converted at once
+        """
+        return np.concatenate([
+            func(self.embeddings[start:start + self.block_size].astype(np.float32))
+            for start in range(0, len(self.embeddings), self.block_size)
+        ] or [np.empty(0, dtype=np.float32)])
+
+    @property
+    def nbytes(self) -> int:
+        return self.embeddings.nbytes
+
+    @classmethod
+    def from_db(cls, document_db: DocumentDB, conn: sqlite3.Connection) -> "FlatIndex":
+        """
+        Build the index from every chunk stored in database, using the
+        settings.EMBEDDING_QUANTIZATION representation
+
+        Args:
+            document_db (DocumentDB): Document database
+            conn (sqlite3.Connection): DB connection
+
+        Returns:
+            FlatIndex: The built index
+        """
+        signature = document_db.signature()
+        quantization = settings.EMBEDDING_QUANTIZATION
+        index = cls(
+            *document_db.get_embeddings(conn, quantization),
+            quantization=quantization
+        )
+        index.signature = signature
+        index.version = document_db.get_chunk_version(conn)
+        return index
+
+    def add(self, chunk_ids: np.ndarray, document_ids: np.ndarray, embeddings: np.ndarray) -> None:
+        if not len(embeddings):
+            return
+
+        added = FlatIndex(chunk_ids, document_ids, embeddings, quantization=self.quantization)
+
+        self.chunk_ids = np.concatenate([self.chunk_ids, added.chunk_ids])
+        self.document_ids = np.concatenate([self.document_ids, added.document_ids])
+        self.embeddings = np.concatenate([self.embeddings, added.embeddings])
+        if self.quantization == 'int8':
+            self._norms = np.concatenate([self._norms, added._norms])
+
+    def search(self, embedding: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        match self.quantization:
+            case 'int8':
+                query = DocumentDB.quantize(embedding, 'int8').astype(np.float32)
+                dots = self.__block_map(lambda block: block @ query)
+                similarities = dots / np.maximum(self._norms * np.linalg.norm(query), 1e-12)
+                distances = 1 - similarities
+            case 'bit':
+                query = DocumentDB.quantize(embedding, 'bit').view(np.uint64)
+                hamming = np.bitwise_count(self.embeddings ^ query).sum(axis=1, dtype=np.int64)
+                # Normalized hamming distance
+                distances = hamming / (self.embeddings.shape[1] * 64)
+                similarities = -distances
+            case _:
+                similarities = self.embeddings @ self._normalize(embedding)
+                distances = 1 - similarities
+
+        top = self._top_k(similarities, k)
+
+        return self.chunk_ids[top], distances[top]
+
+
+class IVFIndex(BaseIndex):
+    """
+    Approximate in-memory index (IVF-flat): vectors are clustered with spherical
+    k-means and only the `nprobe` clusters closest to the query are scanned.
+
+    Attributes:
+        path (str): Index file, relative to settings.DATA_PATH.
+        nprobe (int): Number of clusters scanned per search.
+    """
+
+    path = 'db/ivf.npz'
+    max_train_size = 256
+
+    def __init__(
+            self,
+            chunk_ids: np.ndarray,
+            document_ids: np.ndarray,
+            embeddings: np.ndarray,
+            centroids: np.ndarray,
+            offsets: np.ndarray,
+            nprobe: int = 8
+        ) -> None:
+        """
+        Args:
+            chunk_ids (np.ndarray): Chunk ID of each row, grouped by cluster
+            document_ids (np.ndarray): Document ID of each row, grouped by cluster
+            embeddings (np.ndarray): (n, d) embeddings matrix, grouped by cluster
+            centroids (np.ndarray): (nlist, d) cluster centroids
+            offsets (np.ndarray): (nlist + 1,) start row of each cluster
+            nprobe (int): Number of clusters scanned per search. Default to 8
+        """
+        self.chunk_ids = np.asarray(chunk_ids, dtype=np.int64)
+        self.document_ids = np.asarray(document_ids, dtype=np.int64)
+        self.embeddings = self._normalize(embeddings)
+        self.centroids = self._normalize(centroids)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @staticmethod
+    def _assign(X: np.ndarray, centroids: np.ndarray, batch_size: int = 65536) -> np.ndarray:
+        """
+        Find the nearest centroid of each vector
+
+        Args:
+            X (np.ndarray): (n, d) normalized vectors
+            centroids (np.ndarray): (nlist, d) normalized centroids
+            batch_size (int): Number of vectors compared at once. Default to 65536
+
+        Returns:
+            np.ndarray: (n,) centroid index of each vector
+        """
+        return np.concatenate([
+            np.argmax(X[i:i + batch_size] @ centroids.T, axis=1)
+            for i in range(0, len(X), batch_size)
+        ] or [np.empty(0, dtype=np.int64)])
+
+    @classmethod
+    def _kmeans(cls, X: np.ndarray, n_clusters: int, n_iter: int = 20, seed: int = 0) -> np.ndarray:
+        """
+        Spherical k-means, trained on a sample of at most `max_train_size` vectors per cluster
+
+        Args:
+            X (np.ndarray): (n, d) normalized vectors
+            n_clusters (int): Number of clusters
+            n_iter (int): Number of iterations. Default to 20
+            seed (int): Random seed. Default to 0
+
+        Returns:
+            np.ndarray: (n_clusters, d) normalized centroids
+        """
+        rng = np.random.default_rng(seed)
+
+        train_size = min(len(X), cls.max_train_size * n_clusters)
+        sample = X[rng.choice(len(X), train_size, replace=False)] if train_size < len(X) else X
+        centroids = sample[rng.choice(len(sample), n_clusters, replace=False)]
+
+        for _ in range(n_iter):
+            assign = cls._assign(sample, centroids)
+            order = np.argsort(assign, kind='stable')
+            counts = np.bincount(assign, minlength=n_clusters)
+
+            sums = np.zeros_like(centroids)
+            filled = counts > 0
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[filled]
+            sums[filled] = np.add.reduceat(sample[order], starts, axis=0)
+
+            # Reseed empty clusters with random vectors
+            sums[~filled] = sample[rng.choice(len(sample), int((~filled).sum()))]
+            centroids = cls._normalize(sums)
+
+        return centroids
+
+    @classmethod
+    def build(
+            cls,
+            chunk_ids: np.ndarray,
+            document_ids: np.ndarray,
+            embeddings: np.ndarray,
+            nlist: int|None = None,
+            nprobe: int = 8
+        ) -> "IVFIndex":
+        """
+        Cluster the vectors and build the index
+
+        Args:
+            chunk_ids (np.ndarray): Chunk ID of each row
+            document_ids (np.ndarray): Document ID of each row
+            embeddings (np.ndarray): (n, d) embeddings matrix
+            nlist (int, optional): Number of clusters. Default to 4 * sqrt(n)
+            nprobe (int): Number of clusters scanned per search. Default to 8
+
+        Returns:
+            IVFIndex: The built index
+        """
+        X = cls._normalize(embeddings)
+        n = len(X)
+        nlist = min(nlist or max(1, int(4 * np.sqrt(n))), n)
+
+        centroids = cls._kmeans(X, nlist) if n else np.empty((0, X.shape[-1]), dtype=np.float32)
+        assign = cls._assign(X, centroids)
+
+        order = np.argsort(assign, kind='stable')
+        offsets = np.concatenate(([0], np.cumsum(np.bincount(assign, minlength=nlist))))
+
+        return cls(
+            chunk_ids=np.asarray(chunk_ids)[order],
+            document_ids=np.asarray(document_ids)[order],
+            embeddings=X[order],
+            centroids=centroids,
+            offsets=offsets,
+            nprobe=nprobe
+        )
+
+    @classmethod
+    def from_db(cls, document_db: DocumentDB, conn: sqlite3.Connection) -> "IVFIndex":
+        """
+        Build the index from every chunk stored in database
+
+        Args:
+            document_db (DocumentDB): Document database
+            conn (sqlite3.Connection): DB connection
+
+        Returns:
+            IVFIndex: The built index
+        """
+        signature = document_db.signature()
+        index = cls.build(
+            *document_db.get_embeddings(conn),
+            nlist=settings.IVF_NLIST,
+            nprobe=settings.IVF_NPROBE
+        )
+        index.signature = signature
+        index.version = document_db.get_chunk_version(conn)
+        return index
+
+    @classmethod
+    def load(cls, document_db: DocumentDB, conn: sqlite3.Connection) -> "IVFIndex":
+        """
+        Load the persisted index, or build and save it if it is missing or out of date
+
+        Args:
+            document_db (DocumentDB): Document database
+            conn (sqlite3.Connection): DB connection
+
+        Returns:
+            IVFIndex: The loaded index
+        """
+        signature = document_db.signature()
+        index = cls.read()
+
+        # The persisted index must hold exactly the chunks stored in database
+        if index is None or index.version != document_db.get_chunk_version(conn):
+            index = cls.from_db(document_db, conn)
+            index.save()
+
+        index.signature = signature
+        return index
+
+    @classmethod
+    def read(cls) -> "IVFIndex|None":
+        """
+        Read the persisted index, without checking it against the database
+
+        Returns:
+            IVFIndex|None: The persisted index, None if missing
+        """
+        path = os.path.join(settings.DATA_PATH, cls.path)
+
+        try:
+            with np.load(path) as data:
+                index = cls(
+                    chunk_ids=data['chunk_ids'],
+                    document_ids=data['document_ids'],
+                    embeddings=data['embeddings'],
+                    centroids=data['centroids'],
+                    offsets=data['offsets'],
+                    nprobe=settings.IVF_NPROBE
+                )
+                # Indexes saved without their chunk version are rebuilt by `load`
+                if 'version' in data:
+                    index.version = int(data['version'])
+                return index
+        except FileNotFoundError:
+            return None
+
+    def add(self, chunk_ids: np.ndarray, document_ids: np.ndarray, embeddings: np.ndarray) -> None:
+        """
+        Append vectors to their nearest cluster, without retraining the centroids (see `BaseIndex.add`)
+        """
+        if not len(embeddings):
+            return
+        if not self.nlist:
+            # Nothing to assign to, cluster the new vectors
+            index = self.build(chunk_ids, document_ids, embeddings, nprobe=self.nprobe)
+            self.chunk_ids, self.document_ids, self.embeddings = index.chunk_ids, index.document_ids, index.embeddings
+            self.centroids, self.offsets = index.centroids, index.offsets
+            return
+
+        X = self._normalize(embeddings)
+        clusters = np.concatenate([
+            np.repeat(np.arange(self.nlist), np.diff(self.offsets)),
+            self._assign(X, self.centroids)
+        ])
+        order = np.argsort(clusters, kind='stable')
+
+        self.chunk_ids = np.concatenate([self.chunk_ids, np.asarray(chunk_ids, dtype=np.int64)])[order]
+        self.document_ids = np.concatenate([self.document_ids, np.asarray(document_ids, dtype=np.int64)])[order]
+        self.embeddings = np.concatenate([self.embeddings, X])[order]
+        self.offsets = np.concatenate(([0], np.cumsum(np.bincount(clusters, minlength=self.nlist))))
+
+    def save(self) -> str:
+        """
+        Persist the index next to the database (settings.DATA_PATH)
+
+        Returns:
+            str: Index file path
+        """
+        path = os.path.join(settings.DATA_PATH, self.path)
+
+        # Temporary file of its own: several processes (workers, feed_db) may save at once
+        tmp = tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.tmp.npz', delete=False)
+        try:
+            with tmp:
+                np.savez(
+                    tmp,
+                    chunk_ids=self.chunk_ids,
+                    document_ids=self.document_ids,
+                    embeddings=self.embeddings,
+                    centroids=self.centroids,
+                    offsets=self.offsets,
+                    **({'version': self.version} if self.version is not None else {})
+                )
+            # Atomic replace so a serving process never reads a partial file
+            os.replace(tmp.name, path)
+        except BaseException:
+            os.remove(tmp.name)
+            raise
+
+        return path
+
+    def search(
+            self,
+            embedding: np.ndarray,
+            k: int,
+            nprobe: int|None = None
+        ) -> tuple[np.ndarray, np.ndarray]:
+        query = self._normalize(embedding)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+
+        lists = self._top_k(self.centroids @ query, nprobe)
+        bounds = [(self.offsets[i], self.offsets[i + 1]) for i in lists]
+
+        # Clusters are contiguous row ranges, scanned without copying the vectors
+        rows = np.concatenate([np.arange(start, end) for start, end in bounds] or [[]]).astype(np.int64)
+        similarities = np.concatenate([self.embeddings[start:end] @ query for start, end in bounds] or [[]])
+        top = self._top_k(similarities, k)
+
+        return self.chunk_ids[rows[top]], 1 - similarities[top]
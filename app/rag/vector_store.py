@@ -1,15 +1,172 @@
-from app.rag import Vectorizer, Reranker
+import copy
+import threading
+from typing import Optional
+
+import numpy as np
+
+from app.rag import LRUCache, Vectorizer, Reranker, BaseIndex, FlatIndex, IVFIndex
 from app.database import db
-from app.models import Chunk
+from app.models import Chunk, ChunkRef
+from app.config import settings
+
+
+# Chunks (with their source) shared by every VectorStore instance, keyed on chunk ID.
+# Contexts only keep chunk references, resolved through this cache.
+chunk_cache: LRUCache[int, Chunk] = LRUCache(maxsize=settings.CHUNK_CACHE_SIZE)
 
 
 class VectorStore:
-    
-    def __init__(self) -> None:
+
+    index_types: dict[str, type[BaseIndex]] = {
+        'flat': FlatIndex,
+        'ivf': IVFIndex
+    }
+
+    def __init__(self, index_type: Optional[str] = None) -> None:
+        """
+        Args:
+            index_type (str, optional): 'sqlite' to query the vec0 table or the name of an
+                in-memory index (see `index_types`). Default to settings.VECTOR_INDEX
+        """
         self.vectorizer = Vectorizer()
         self.reranker = Reranker()
         self.document_db = db
 
+        self._chunks_signature: tuple|None = None
+
+        self.index_type = index_type or settings.VECTOR_INDEX
+        self._index: BaseIndex|None = None
+        self._index_lock = threading.Lock()
+
+        self.search_mode = settings.SQLITE_SEARCH_MODE
+        if self.index_type != 'sqlite':
+            self._index = self.build_index()
+        elif self.search_mode == 'knn':
+            with self.document_db.reader() as conn:
+                if not self.document_db.has_cosine_knn(conn):
+                    # KNN distances would be L2 ones, compared with a cosine threshold
+                    print("The Chunk table has no cosine KNN index, searching in 'scan' mode until `_scripts/migrate_db.py` is run")
+                    self.search_mode = 'scan'
+
+    def build_index(self) -> BaseIndex:
+        """
+        Load (or build) the in-memory index from the document database
+
+        Returns:
+            BaseIndex: The built index
+        """
+        index_cls = self.index_types.get(self.index_type)
+        if index_cls is None:
+            raise ValueError(f"Unknown index type '{self.index_type}'")
+
+        with self.document_db.reader() as conn:
+            return index_cls.load(self.document_db, conn)
+
+    def __rebuild_index(self) -> None:
+        try:
+            # Reference assignment is atomic, searches keep using the old index meanwhile
+            self._index = self.build_index()
+        finally:
+            self._index_lock.release()
+
+    def refresh_index(self) -> None:
+        """
+        Rebuild the in-memory index in the background if the database changed since
+        it was built. The current index keeps serving until the new one is swapped in.
+        """
+        if self._index is None or self._index.signature == self.document_db.signature():
+            return
+
+        if self._index_lock.acquire(blocking=False):
+            threading.Thread(target=self.__rebuild_index, daemon=True).start()
+
+    def publish(
+            self,
+            chunk_ids: np.ndarray,
+            document_ids: np.ndarray,
+            embeddings: np.ndarray,
+            since: tuple,
+            version: int|None = None
+        ) -> None:
+        """
+        Add new chunks to the in-memory index without rebuilding it: a copy of the index
+        is extended and swapped in, searches keep using the current one meanwhile.
+
+        Args:
+            chunk_ids (np.ndarray): New chunk IDs
+            document_ids (np.ndarray): Their document IDs
+            embeddings (np.ndarray): Their float32 embeddings
+            since (tuple): Database signature before the chunks were written. If the index
+                is older, it is rebuilt instead (see `refresh_index`)
+            version (int, optional): Chunk version once the chunks were written
+                (see `DocumentDB.get_chunk_version`)
+        """
+        if self._index is None:
+            return
+
+        # Waits for a background rebuild to finish
+        with self._index_lock:
+            index = self._index
+            stale = index.signature != since
+            if not stale:
+                index = copy.copy(index)
+                index.add(chunk_ids, document_ids, embeddings)
+                index.signature = self.document_db.signature()
+                index.version = version
+                self._index = index
+
+        if stale:
+            self.refresh_index()
+        elif isinstance(index, IVFIndex):
+            # Up to date for the next start
+            index.save()
+
+    def _index_search(self, index: BaseIndex, embeddings, k: int) -> list[Chunk]:
+        """
+        Search the nearest chunks with the in-memory index and load them from database
+
+        Args:
+            index (BaseIndex): Index to search
+            embeddings (np.ndarray): Query embedding
+            k (int): Number of chunks to retrieve
+
+        Returns:
+            list[Chunk]: Nearest chunks, closest first
+        """
+        oversample = 1 if index.exact else settings.QUANTIZATION_OVERSAMPLE
+        chunk_ids, distances = index.search(embeddings, k * oversample)
+
+        with self.document_db.reader() as conn:
+            if index.exact:
+                distance_map = dict(zip(chunk_ids.tolist(), distances.tolist()))
+            else:
+                # Rescore the quantized candidates with the exact float32 embeddings
+                distance_map = self.document_db.get_distances(embeddings, chunk_ids.tolist(), conn)
+                distance_map = dict(sorted(distance_map.items(), key=lambda item: item[1])[:k])
+
+            distance_map = {
+                id: distance for id, distance in distance_map.items()
+                if distance <= self.document_db.max_distance
+            }
+
+            if not distance_map:
+                return []
+
+            chunks = self.document_db.get_chunks(conn, list(distance_map))
+            documents = self.document_db.get_document(
+                conn,
+                list({chunk.document_id for chunk in chunks})
+            )
+
+        sources = {document.id: document for document in documents}
+        for chunk in chunks:
+            chunk.distance = distance_map[chunk.id]
+            chunk.source = sources.get(chunk.document_id)
+
+        # Same output as get_k_nearest: chunks with a source, nearest first
+        chunks = [chunk for chunk in chunks if chunk.source is not None]
+        return sorted(chunks, key=lambda chunk: chunk.distance)
+
     def search(self, query: str, k=10) -> list[Chunk]:
         """
         Search nearest documents from a query. Embed the query, search for the nearest chunks
@@ -22,16 +179,79 @@ class VectorStore:
         Returns:
             list[Chunk]: List of document chunk
         """
-        
+
         embeddings = self.vectorizer.generate_embeddings(query)
 
-        with self.document_db.connect() as conn:
-            chunks = self.document_db.get_k_nearest(
-                embeddings, 
-                k=k, 
-                conn=conn
-            )
+        self.refresh_index()
+        index = self._index
+
+        if index is not None:
+            chunks = self._index_search(index, embeddings, k)
+        else:
+            with self.document_db.reader() as conn:
+                chunks = self.document_db.get_k_nearest(
+                    embeddings,
+                    k=k,
+                    conn=conn,
+                    mode=self.search_mode,
+                    quantization=settings.EMBEDDING_QUANTIZATION,
+                    oversample=settings.QUANTIZATION_OVERSAMPLE
+                )
 
         reranked_chunks = self.reranker.rerank(query, chunks)
 
-        return reranked_chunks
\ No newline at end of file
+        # Contexts built from these chunks will resolve them from cache
+        self._check_chunk_cache()
+        for chunk in reranked_chunks:
+            chunk_cache.set(chunk.id, chunk.model_copy(update={'score': None, 'distance': None}))
+
+        return reranked_chunks
+
+    def _check_chunk_cache(self) -> None:
+        """
+        Clear the chunk cache if the database changed since it was filled
+        """
+        signature = self.document_db.signature()
+        if signature != self._chunks_signature:
+            chunk_cache.clear()
+            self._chunks_signature = signature
+
+    def get_chunks(self, refs: list[ChunkRef]) -> list[Chunk]:
+        """
+        Resolve chunk references (e.g. from a Context), through the shared chunk cache.
+        The cache is cleared when the database changes.
+
+        Args:
+            refs (list[ChunkRef]): Chunk references, with their scores
+
+        Returns:
+            list[Chunk]: Chunks with their source, score and distance, in the references order
+                (deleted chunks are skipped)
+        """
+        self._check_chunk_cache()
+
+        chunks = {}
+        for ref in refs:
+            chunk = chunk_cache.get(ref.id)
+            if chunk is not None:
+                chunks[ref.id] = chunk
+
+        missing = [ref.id for ref in refs if ref.id not in chunks]
+        if missing:
+            with self.document_db.reader() as conn:
+                loaded = self.document_db.get_chunks(conn, missing)
+                documents = self.document_db.get_document(
+                    conn,
+                    list({chunk.document_id for chunk in loaded})
+                )
+
+            sources = {document.id: document for document in documents}
+            for chunk in loaded:
+                chunk.source = sources.get(chunk.document_id)
+                chunk_cache.set(chunk.id, chunk)
+                chunks[chunk.id] = chunk
+
+        return [
+            chunks[ref.id].model_copy(update={'score': ref.score, 'distance': ref.distance})
+            for ref in refs if ref.id in chunks
+        ]
@@ -6,11 +6,23 @@ using sentence-transformers models.
 """
 
 import os
+import unicodedata
 import numpy as np
-from typing import Optional
+from typing import Iterable, Iterator, Optional
 
 from sentence_transformers import SentenceTransformer
 
+from app.rag.cache import LRUCache
+from app.rag.registry import registry
+from app.config import settings
+
+
+# Query embeddings shared by every Vectorizer instance, keyed on (model name, normalized text)
+embedding_cache: LRUCache[tuple[str, str], np.ndarray] = LRUCache(
+    maxsize=settings.EMBEDDING_CACHE_SIZE,
+    ttl=settings.EMBEDDING_CACHE_TTL
+)
+
 
 class Vectorizer:
     """
@@ -25,9 +37,6 @@ class Vectorizer:
         chunk_overlap (int): Overlap between consecutive chunks.
     """
 
-    _model: Optional[SentenceTransformer] = None
-    _current_model_name: Optional[str] = None
-
     def __init__(
         self,
         model_name: Optional[str] = None,
@@ -45,11 +54,8 @@ class Vectorizer:
         """
         self.model_name = model_name or os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
 
-        try:
-            Vectorizer._model = SentenceTransformer(self.model_name, device="cpu")
-        except Exception as e:
-            print(f"Error loading embedding model '{self.model_name}': {e}")
-            raise
+        # Load the model now (once per process) so that errors show up at startup
+        self.model
 
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
@@ -57,31 +63,19 @@ class Vectorizer:
     @property
     def model(self) -> SentenceTransformer:
         """
-        Get or load the embedding model (lazy initialization, singleton).
+        Get the embedding model from the process-wide model registry.
 
-        The model is shared across all Vectorizer instances to
-        avoid loading it multiple times.
+        The model is loaded on first access and shared across all Vectorizer
+        instances and services.
 
         Returns:
             SentenceTransformer: The loaded model instance.
         """
-        if (
-            Vectorizer._model is None
-            or Vectorizer._current_model_name != self.model_name
-        ):
-            try:
-                Vectorizer._model = SentenceTransformer(self.model_name, device="cpu")
-            except Exception as e:
-                print(f"Error loading embedding model '{self.model_name}': {e}")
-                raise
-
-            Vectorizer._current_model_name = self.model_name
-
-        return Vectorizer._model
+        return registry.get_embedding_model(self.model_name)
 
     def generate_embeddings(self, text: str) -> np.ndarray:
         """
-        Generate embeddings for text string.
+        Generate embeddings for text string. Results are cached (see `embedding_cache`).
 
         Args:
             text (str): Text strings to embed.
@@ -92,8 +86,63 @@ class Vectorizer:
         if not text:
             raise ValueError("Can't embed empty string")
 
-        embeddings = self.model.encode(text, show_progress_bar=False)
-        return np.array(embeddings.tolist(), dtype=np.float32)
+        key = (self.model_name, self.normalize_text(text))
+        embeddings = embedding_cache.get(key)
+
+        if embeddings is None:
+            embeddings = np.asarray(
+                self.model.encode(text, show_progress_bar=False),
+                dtype=np.float32
+            )
+            # Shared between callers, must not be modified in place
+            embeddings.setflags(write=False)
+            embedding_cache.set(key, embeddings)
+
+        return embeddings
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """
+        Normalize a query for cache lookup (unicode form and whitespaces).
+
+        Args:
+            text (str): Text to normalize.
+
+        Returns:
+            str: Normalized text.
+        """
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def generate_embeddings_batch(
+            self,
+            texts: list[str],
+            batch_size: int = 64
+        ) -> np.ndarray:
+        """
+        Generate embeddings for a list of text strings, batch_size texts per model call.
+
+        Args:
+            texts (list[str]): Text strings to embed.
+            batch_size (int): Number of texts encoded at once. Defaults to 64.
+
+        Returns:
+            np.ndarray: (len(texts), dim) float32 embeddings matrix.
+        """
+        if not all(texts):
+            raise ValueError("Can't embed empty string")
+
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+
+        # `encode` already batches texts of similar length together, output order is kept
+        embeddings = self.model.encode(
+            texts,
+            batch_size=batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True
+        )
+
+        return embeddings.astype(np.float32, copy=False)
 
     def chunk_text(self, text: str) -> list[str]:
         """
@@ -120,3 +169,38 @@ class Vectorizer:
             start += self.chunk_size - self.chunk_overlap
 
         return chunks
+
+    def chunk_stream(self, texts: Iterable[str], separator: str = "\n\n") -> Iterator[str]:
+        """
+        Chunk text given in parts (e.g. PDF pages) as it arrives: same chunks as
+        `chunk_text(separator.join(texts))`, crossing the parts boundaries, without
+        holding the whole text.
+
+        Args:
+            texts (Iterable[str]): Parts of the text, in order.
+            separator (str): Inserted between two parts. Defaults to a blank line.
+
+        Yields:
+            str: Text chunks.
+        """
+        step = self.chunk_size - self.chunk_overlap
+        # Text from the start of the next chunk
+        buffer = ""
+        emitted = False
+
+        for i, text in enumerate(texts):
+            buffer += separator + text if i else text
+
+            start = 0
+            while len(buffer) - start >= self.chunk_size:
+                yield buffer[start:start + self.chunk_size]
+                start += step
+                emitted = True
+            buffer = buffer[start:]
+
+        if not buffer and not emitted:
+            raise ValueError("Can't chunk empty string")
+
+        while buffer:
+            yield buffer[:self.chunk_size]
+            buffer = buffer[step:]
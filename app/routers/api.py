@@ -1,11 +1,18 @@
-from fastapi import APIRouter, Request
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, File, Form, HTTPException, Request, UploadFile
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from io import BytesIO
+import json
+import queue
 
 from typing import Literal
 
-from app.services import RagService, PlotService
-from app.models import ChatRequest, SessionRequest
+from app.services import RagService, PlotService, IngestionService
+from app.services.executor import run_cpu
+from app.services.compression import accepted_encoding, compress
+from app.config import settings
+from app.models import Chunk, ChatRequest, SessionRequest
+from app.rag import embedding_cache, chunk_cache, registry
 
 
 router = APIRouter(
@@ -28,7 +35,8 @@ async def create_session(request: Request):
         }
     """
     rag_service: RagService = request.app.state.rag_service
-    session = rag_service.llm_handler.create_session()
+    # Written to the session database with the SQLite backend
+    session = await run_in_threadpool(rag_service.llm_handler.create_session)
 
     return {
         'session_id': session.id
@@ -49,8 +57,9 @@ async def clear_session(body: SessionRequest, request: Request):
         }
     """
     rag_service: RagService = request.app.state.rag_service
-    session = rag_service.llm_handler.get_session(body.session_id)
+    session = await run_in_threadpool(rag_service.llm_handler.get_session, body.session_id)
     session.clear_messages()
+    rag_service.llm_handler.save_session(session)
 
     return {
         'success': True
@@ -74,7 +83,7 @@ async def download_session(
         StreamingResponse: txt or json file
     """
     rag_service: RagService = request.app.state.rag_service
-    session = rag_service.llm_handler.get_session(session_id)
+    session = await run_in_threadpool(rag_service.llm_handler.get_session, session_id)
 
     content = session.dump_messages(format)
     buffer = BytesIO(content.encode("utf-8"))
@@ -112,11 +121,12 @@ async def send(body: ChatRequest, request: Request):
             context: {
                 id (str): UUID of the context used for query,
                 length (int): amount of documents in context
-            }
+            },
+            prompt_tokens (int|None): Tokens of the prompt sent to the LLM
         }
     """
     rag_service: RagService = request.app.state.rag_service
-    response, context = rag_service.make_query(
+    response, context, prompt_tokens = await rag_service.make_query_async(
         body.query,
         session_id=body.session_id
     )
@@ -126,11 +136,63 @@ async def send(body: ChatRequest, request: Request):
         'context': {
             'id': context.id if context else None,
             'length': len(context.chunks) if context else None
-        }
+        },
+        'prompt_tokens': prompt_tokens
     }
 
+@router.post("/send_stream", summary="Query the chatbot with RAG, streaming the response (SSE)")
+async def send_stream(body: ChatRequest, request: Request):
+    """
+    Send a message to LLM with RAG context and stream the response as Server-Sent Events
+
+    Args:
+        body (ChatRequest): Chat message payload (role, content)
+        request (Request): Default request argument
+
+    Returns:
+        StreamingResponse: text/event-stream of events:
+            context: {id (str): UUID of the context used for query, length (int): amount of documents in context}
+            token: {text (str): next part of the LLM response, raw Markdown}
+            response: {text (str): whole LLM response as plain text, replaces the tokens}
+            done: {prompt_tokens (int|None): Tokens of the prompt sent to the LLM}
+            error: {error (str): error message}
+    """
+    rag_service: RagService = request.app.state.rag_service
+    # Fail before streaming if the session doesn't exist
+    await run_in_threadpool(rag_service.llm_handler.get_session, body.session_id)
+
+    def event(name: str, data: dict) -> str:
+        return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+    async def events():
+        prompt_tokens = None
+        try:
+            async for kind, value in rag_service.make_query_stream(body.query, session_id=body.session_id):
+                match kind:
+                    case 'context':
+                        yield event('context', {
+                            'id': value.id if value else None,
+                            'length': len(value.chunks) if value else None
+                        })
+                    case 'prompt_tokens':
+                        prompt_tokens = value
+                    case _:
+                        yield event(kind, {'text': value})
+            yield event('done', {'prompt_tokens': prompt_tokens})
+        except Exception as e:
+            yield event('error', {'error': str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @router.get("/get_context", summary="Retrieve RAG chunks from a context ID")
-async def get_context(request: Request, session_id: str, context_id: str):
+async def get_context(request: Request, session_id: str, context_id: str, fields: str|None = None):
     """
     Retrieve a list of chunks used for RAG from a context ID
 
@@ -138,24 +200,37 @@ async def get_context(request: Request, session_id: str, context_id: str):
         request (Request): Default request argument
         session_id (str): LLM session ID
         context_id (str): Context ID
+        fields (str, optional): Comma separated chunk fields to return (e.g. 'id,content,emb_3d').
+            Default to every field but the embeddings
 
     Returns:
         json: {
             chunks (list[Chunk]): Chunks objects
         }
     """
+    match fields:
+        case None:
+            include = set(Chunk.model_fields) - {'emb_384d', 'emb_3d'}
+        case _:
+            include = {field.strip() for field in fields.split(',') if field.strip()}
+            unknown = include - set(Chunk.model_fields)
+            if unknown:
+                raise HTTPException(422, f"Unknown chunk fields: {', '.join(sorted(unknown))}")
+
     rag_service: RagService = request.app.state.rag_service
-    session = rag_service.llm_handler.get_session(session_id)
+    session = await run_in_threadpool(rag_service.llm_handler.get_session, session_id)
     context = session.get_context(context_id)
 
+    chunks = await run_cpu(rag_service.vector_store.get_chunks, context.chunks)
+
     return {
         'chunks': [
-            chunk.model_dump() for chunk in context.chunks
+            chunk.model_dump(include=include) for chunk in chunks
         ]
     }
 
 @router.get("/plot_context", summary="Project user query and context chunks in 3d space")
-def plot_context(request: Request, session_id: str, context_id: str):
+async def plot_context(request: Request, session_id: str, context_id: str, base_version: str|None = None):
     """
     Create a 3d scatter plot of a RAG context
 
@@ -163,22 +238,152 @@ def plot_context(request: Request, session_id: str, context_id: str):
         request (Request): Default request argument
         session_id (str): LLM session ID
         context_id (str): Context ID
+        base_version (str, optional): `base_version` of a previous response. If the chunks
+            trace didn't change since, only the query and context overlay is returned
 
     Returns:
         json: {
-            3d_scatter (json): Plotly json plot
+            3d_scatter (json): Plotly json plot (if no delta),
+            overlay (json): Plotly json list of the context and query traces, to append to
+                the previous plot data (if delta),
+            base_version (str): Version of the chunks trace
         }
+        Compressed (br or gzip) if accepted by the client
     """
     rag_service: RagService = request.app.state.rag_service
-    session = rag_service.llm_handler.get_session(session_id)
+    session = await run_in_threadpool(rag_service.llm_handler.get_session, session_id)
     context = session.get_context(context_id)
 
     plot_service: PlotService = request.app.state.plot_service
-    plot = plot_service.project(
+    plot, version, delta = await run_cpu(
+        plot_service.project,
         query=context.query,
-        chunks=context.chunks
+        chunks=context.chunks,
+        base_version=base_version
+    )
+
+    body = json.dumps({'overlay' if delta else '3d_scatter': plot, 'base_version': version}).encode()
+    body, encoding = await run_cpu(
+        compress,
+        body,
+        accepted_encoding(request.headers.get('accept-encoding')),
+        settings.PLOT_COMPRESS_MIN_SIZE
     )
 
+    headers = {'Vary': 'Accept-Encoding'}
+    if encoding is not None:
+        headers['Content-Encoding'] = encoding
+
+    return Response(content=body, media_type='application/json', headers=headers)
+
+@router.get("/stats", summary="Cache counters and loaded models")
+async def stats(request: Request):
+    """
+    Report cache counters (used to size the caches) and loaded models
+
+    Args:
+        request (Request): Default request argument
+
+    Returns:
+        json: {
+            embedding_cache (dict): Query embeddings cache size, hits and misses,
+            chunk_cache (dict): Context chunks cache size, hits and misses,
+            answer_cache (dict|None): Semantic answer cache size, hits and misses, None if disabled,
+            models (list[str]): Models loaded in this process
+        }
+    """
+    rag_service: RagService = request.app.state.rag_service
+    answer_cache = rag_service.answer_cache
+
     return {
-        '3d_scatter': plot
-    }
\ No newline at end of file
+        'embedding_cache': embedding_cache.stats(),
+        'chunk_cache': chunk_cache.stats(),
+        'answer_cache': answer_cache.stats() if answer_cache is not None else None,
+        'models': registry.loaded()
+    }
+
+@router.get("/sessions", summary="Chat sessions counters and memory use")
+async def sessions(request: Request):
+    """
+    Report the session store counters and the estimated memory used by sessions
+
+    Args:
+        request (Request): Default request argument
+
+    Returns:
+        json: {
+            backend (str): Session store backend ('memory' or 'sqlite'),
+            sessions (int): Number of live sessions,
+            max_sessions (int): Maximum number of sessions before LRU eviction,
+            ttl (float|None): Idle session lifetime in seconds,
+            evicted (int): Sessions evicted since startup,
+            expired (int): Sessions expired since startup,
+            contexts (int): RAG contexts stored by the live sessions,
+            bytes (int): Estimated memory used by the live sessions (stored bytes for 'sqlite')
+        }
+    """
+    rag_service: RagService = request.app.state.rag_service
+    return await run_in_threadpool(rag_service.llm_handler.sessions.stats)
+
+@router.post("/documents", summary="Upload documents to the knowledge base", status_code=202)
+async def upload_documents(
+        request: Request,
+        files: list[UploadFile] = File(...),
+        category: str = Form("uploads")
+    ):
+    """
+    Queue the ingestion of uploaded documents (.txt, .pdf or .md). They are parsed, chunked,
+    embedded and made searchable in the background, see `/documents/{job_id}` for the status
+
+    Args:
+        request (Request): Default request argument
+        files (list[UploadFile]): Documents to add (multipart form)
+        category (str): Category of the documents. Default to 'uploads'
+
+    Returns:
+        json: Ingestion job, see `document_job`
+    """
+    ingestion_service: IngestionService = request.app.state.ingestion_service
+
+    try:
+        job = await run_in_threadpool(
+            ingestion_service.submit,
+            category,
+            [(file.filename, file.file) for file in files]
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except queue.Full:
+        raise HTTPException(status_code=503, detail="Too many documents waiting for ingestion, retry later")
+
+    return job.to_dict()
+
+@router.get("/documents/{job_id}", summary="Status of a document ingestion job")
+async def document_job(request: Request, job_id: str):
+    """
+    Get the status of a document ingestion job
+
+    Args:
+        request (Request): Default request argument
+        job_id (str): Job ID returned by the upload
+
+    Returns:
+        json: {
+            job_id (str): Job ID,
+            status (str): 'queued', 'running', 'done' or 'failed',
+            category (str): Category of the documents,
+            files (list[str]): Uploaded file names,
+            documents (dict): Number of added, modified and unchanged documents,
+            chunks (int): Number of chunks added,
+            progress (dict|None): Ingestion counters and throughput,
+            error (str|None): Error message if failed,
+            created_at, started_at, finished_at (float|None): UNIX timestamps
+        }
+    """
+    ingestion_service: IngestionService = request.app.state.ingestion_service
+
+    job = ingestion_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job '{job_id}'")
+
+    return job.to_dict()
\ No newline at end of file
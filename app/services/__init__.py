@@ -1,2 +1,3 @@
 from .rag_service import RagService
-from .plot_service import PlotService
\ No newline at end of file
+from .plot_service import PlotService
+from .ingestion_service import IngestionService, IngestionJob
\ No newline at end of file
@@ -0,0 +1,58 @@
+import gzip
+
+try:
+    # Optional, better ratio than gzip for JSON
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def accepted_encoding(accept_encoding: str|None) -> str|None:
+    """
+    Pick the response encoding from an Accept-Encoding header: br (if the brotli
+    package is installed), else gzip
+
+    Args:
+        accept_encoding (str, optional): Accept-Encoding request header
+
+    Returns:
+        str|None: 'br', 'gzip' or None (no compression)
+    """
+    accepted = set()
+    for value in (accept_encoding or "").lower().split(","):
+        coding, _, params = value.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        accepted.add(coding.strip())
+
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str|None, min_size: int = 0) -> tuple[bytes, str|None]:
+    """
+    Compress a response body
+
+    Args:
+        body (bytes): Response body
+        encoding (str, optional): 'br', 'gzip' or None (see `accepted_encoding`)
+        min_size (int): Smaller bodies are not compressed. Default to 0
+
+    Returns:
+        bytes: Body, compressed or not
+        str|None: Content-Encoding of the body, None if not compressed
+    """
+    if len(body) < min_size:
+        return body, None
+
+    match encoding:
+        case "br" if brotli is not None:
+            # Quality 5: close to the best ratio on JSON, for a fraction of the time of 11
+            return brotli.compress(body, quality=5), "br"
+        case "gzip":
+            return gzip.compress(body, compresslevel=6), "gzip"
+        case _:
+            return body, None
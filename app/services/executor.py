@@ -0,0 +1,64 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, TypeVar
+
+from app.config import settings
+
+
+T = TypeVar("T")
+
+
+# Size-limited pool for CPU-bound stages (embedding, KNN, reranking, projection).
+# Torch and NumPy release the GIL, so threads run these stages in parallel while
+# the event loop keeps serving other requests. Created on first use, so that a
+# new application lifespan in the same process gets a new pool after a shutdown.
+_cpu_executor: ThreadPoolExecutor|None = None
+_cpu_executor_lock = threading.Lock()
+
+
+def get_cpu_executor() -> ThreadPoolExecutor:
+    """
+    Get the CPU executor, created if needed
+
+    Returns:
+        ThreadPoolExecutor: CPU executor (settings.CPU_WORKERS threads)
+    """
+    global _cpu_executor
+
+    with _cpu_executor_lock:
+        if _cpu_executor is None:
+            _cpu_executor = ThreadPoolExecutor(
+                max_workers=settings.CPU_WORKERS,
+                thread_name_prefix="cpu-worker"
+            )
+        return _cpu_executor
+
+
+def shutdown_cpu_executor() -> None:
+    """
+    Shut the CPU executor down (pending calls are cancelled), the next call creates a new one
+    """
+    global _cpu_executor
+
+    with _cpu_executor_lock:
+        executor, _cpu_executor = _cpu_executor, None
+
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_cpu(func: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Run a CPU-bound function in the CPU executor and await its result
+
+    Args:
+        func (Callable): Function to run
+        *args, **kwargs: Function arguments
+
+    Returns:
+        T: Function result
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_cpu_executor(), functools.partial(func, *args, **kwargs))
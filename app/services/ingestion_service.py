@@ -0,0 +1,303 @@
+import os
+import queue
+import re
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, BinaryIO
+
+from app.database import db
+from app.rag import VectorStore, Reductor
+from app.ingestion import IngestionPipeline, IngestionProgress, diff_documents
+from app.models import Document
+from app.config import settings
+
+
+
+class IngestionJob:
+    """
+    Ingestion of a set of uploaded files, run by the `IngestionService` worker.
+
+    Attributes:
+        id (str): Job UUID.
+        status (str): 'queued', 'running', 'done' or 'failed'.
+        category (str): Category of the documents.
+        files (list[str]): Uploaded file names.
+    """
+
+    def __init__(self, category: str, files: list[str], uploads_path: str) -> None:
+        """
+        Args:
+            category (str): Category of the documents
+            files (list[str]): Uploaded file names
+            uploads_path (str): Directory where the job files are spooled
+        """
+        self.id = str(uuid.uuid4())
+        self.status = "queued"
+        self.category = category
+        self.files = files
+        self.upload_dir = os.path.join(uploads_path, self.id)
+
+        self.added = 0
+        self.modified = 0
+        self.unchanged = 0
+        self.chunks = 0
+        self.error: str|None = None
+        self.progress: IngestionProgress|None = None
+
+        self.created_at = time.time()
+        self.started_at: float|None = None
+        self.finished_at: float|None = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed")
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "category": self.category,
+            "files": self.files,
+            "documents": {
+                "added": self.added,
+                "modified": self.modified,
+                "unchanged": self.unchanged,
+            },
+            "chunks": self.chunks,
+            "progress": self.progress.stats() if self.progress is not None else None,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestionService:
+    """
+    Background ingestion of uploaded documents.
+
+    Uploads are spooled under DATA_PATH/uploads and queued. A single worker thread
+    (the only database writer of the process) parses, chunks and embeds them, places
+    the new chunks in the fitted t-SNE, moves the files to DATA_PATH/files (so `feed_db`
+    sees them as unchanged), commits and publishes the chunks to the live index.
+    """
+
+    extensions = ('txt', 'pdf', 'md')
+
+    def __init__(self, vector_store: VectorStore, reductor: Reductor|None = None) -> None:
+        """
+        Args:
+            vector_store (VectorStore): Serving vector store, its vectorizer embeds the chunks
+                and its in-memory index receives them
+            reductor (Reductor, optional): Places the new chunks in the 3d plot. Default to a new Reductor
+        """
+        self.vector_store = vector_store
+        self.reductor = reductor or Reductor()
+        self.document_db = db
+
+        # Parse in the worker thread, no process pool forked from the server (not even
+        # for the PDF pages, whatever settings.PDF_PAGE_WORKERS)
+        self.pipeline = IngestionPipeline(
+            vector_store.vectorizer,
+            self.document_db,
+            parse_workers=0,
+            embed_batch_size=settings.INGEST_JOB_BATCH_SIZE,
+            pdf_workers=0
+        )
+
+        self.files_path = os.path.join(settings.DATA_PATH, 'files')
+        self.uploads_path = os.path.join(settings.DATA_PATH, 'uploads')
+
+        self.jobs: OrderedDict[str, IngestionJob] = OrderedDict()
+        self._jobs_lock = threading.Lock()
+        self._queue: queue.Queue[IngestionJob|None] = queue.Queue(maxsize=settings.INGEST_JOB_QUEUE_SIZE)
+        self._worker: threading.Thread|None = None
+
+    @classmethod
+    def _safe_name(cls, name: str|None, kind: str) -> str:
+        """
+        Check a category or file name, that must not escape its directory
+        """
+        name = (name or "").strip()
+        if not name or name.startswith('.') or not re.fullmatch(r"[\w\-. ]+", name):
+            raise ValueError(f"Invalid {kind} name '{name}'")
+        return name
+
+    def submit(self, category: str, files: list[tuple[str|None, BinaryIO]]) -> IngestionJob:
+        """
+        Spool uploaded files to disk and queue their ingestion
+
+        Args:
+            category (str): Category of the documents
+            files (list[tuple[str, BinaryIO]]): File names and contents
+
+        Raises:
+            ValueError: Invalid category, file name or extension
+            queue.Full: Too many queued jobs
+
+        Returns:
+            IngestionJob: The queued job
+        """
+        category = self._safe_name(category, "category")
+        names = [self._safe_name(name, "file") for name, _ in files]
+        if not names:
+            raise ValueError("No file uploaded")
+        if len(set(names)) != len(names):
+            raise ValueError("Duplicate file names")
+        for name in names:
+            if name.split('.')[-1].lower() not in self.extensions:
+                raise ValueError(f"Unsupported file type '{name}', expected one of {', '.join(self.extensions)}")
+
+        if self._queue.full():
+            raise queue.Full()
+
+        job = IngestionJob(category, names, self.uploads_path)
+        os.makedirs(job.upload_dir)
+
+        for name, (_, content) in zip(names, files):
+            with open(os.path.join(job.upload_dir, name), 'wb') as f:
+                shutil.copyfileobj(content, f)
+
+        with self._jobs_lock:
+            self.jobs[job.id] = job
+            self._forget_jobs()
+
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self._discard(job)
+            raise
+
+        return job
+
+    def get_job(self, job_id: str) -> IngestionJob|None:
+        """
+        Args:
+            job_id (str): Job UUID
+
+        Returns:
+            IngestionJob|None: The job, None if unknown or forgotten
+        """
+        with self._jobs_lock:
+            return self.jobs.get(job_id)
+
+    def _forget_jobs(self) -> None:
+        # Must be called with the lock held, only finished jobs are forgotten
+        finished = [id for id, job in self.jobs.items() if job.finished]
+        for id in finished[:max(len(finished) - settings.INGEST_JOBS_KEPT, 0)]:
+            del self.jobs[id]
+
+    def _discard(self, job: IngestionJob) -> None:
+        with self._jobs_lock:
+            self.jobs.pop(job.id, None)
+        shutil.rmtree(job.upload_dir, ignore_errors=True)
+
+    def run_job(self, job: IngestionJob) -> None:
+        """
+        Ingest the files of a job (see the class docstring), in one transaction
+
+        Args:
+            job (IngestionJob): Job to run
+        """
+        job.status = "running"
+        job.started_at = time.time()
+        job.progress = IngestionProgress(total_files=len(job.files), interval=0)
+
+        try:
+            uploads = []
+            for name in job.files:
+                path = os.path.join(job.upload_dir, name)
+                stat = os.stat(path)
+                document = Document(
+                    name=''.join(name.split('.')[:-1]),
+                    category=job.category,
+                    mtime=stat.st_mtime,
+                    size=stat.st_size
+                )
+                uploads.append((document, path))
+
+            signature = self.document_db.signature()
+
+            with self.document_db.writer() as conn:
+                stored = [
+                    document for document in self.document_db.get_document(conn)
+                    if document.category == job.category
+                ]
+                # Re-uploaded files are compared by content, removed ones are not concerned
+                changes = diff_documents(uploads, stored)
+                job.added, job.modified = len(changes.added), len(changes.modified)
+                job.unchanged = len(changes.unchanged) + len(changes.touched)
+
+                # The uploaded files replace the stored ones: update their size and mtime too
+                self.document_db.delete_chunks([document.id for document, _ in changes.modified], conn) #type: ignore
+                self.document_db.update_documents(
+                    [document for document, _ in changes.modified] + changes.touched,
+                    conn=conn
+                )
+
+                new_ids = self.pipeline.run(changes.added + changes.modified, conn, job.progress)
+                job.chunks = len(new_ids)
+
+                embeddings = None
+                version = self.document_db.get_chunk_version(conn)
+                if new_ids:
+                    chunk_ids, document_ids, embeddings = self.document_db.get_embeddings(conn, min_id=new_ids[0])
+                    if self.reductor.model is not None:
+                        self.document_db.set_projections(chunk_ids, self.reductor.transform(embeddings), conn=conn)
+
+                # Keep the files with the other documents before committing: if a move fails,
+                # the rows are rolled back, `feed_db` never sees stored documents without their file
+                # (a file already replaced is seen as modified)
+                target = os.path.join(self.files_path, job.category)
+                os.makedirs(target, exist_ok=True)
+                for _, path in uploads:
+                    os.replace(path, os.path.join(target, os.path.basename(path)))
+
+            if changes.modified:
+                # Deleted chunks: the index is rebuilt in the background
+                self.vector_store.refresh_index()
+            elif embeddings is not None:
+                self.vector_store.publish(chunk_ids, document_ids, embeddings, since=signature, version=version)
+
+            job.status = "done"
+        except Exception as e:
+            print(f"Error ingesting {job.files}: {e}")
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            shutil.rmtree(job.upload_dir, ignore_errors=True)
+
+    def __work_loop(self) -> None:
+        while (job := self._queue.get()) is not None:
+            self.run_job(job)
+
+    def start(self) -> None:
+        """
+        Start the worker thread (no-op if already running)
+        """
+        if self._worker is not None and self._worker.is_alive():
+            return
+
+        self._worker = threading.Thread(target=self.__work_loop, name="ingestion-worker", daemon=True)
+        self._worker.start()
+
+    def close(self) -> None:
+        """
+        Finish the running job and stop the worker thread, queued jobs are dropped
+        """
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                self._discard(job)
+
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
@@ -1,41 +1,204 @@
+import hashlib
+import threading
+from typing import NamedTuple
+
+import numpy as np
+
 from app.database import db
 from app.rag import Vectorizer, Reductor
 from app.plots import Scatter3D
-from app.models import Chunk
+from app.models import ChunkRef
+from app.config import settings
+
 
 
+class PlotBase(NamedTuple):
+    """
+    Static part of the scatterplot, rebuilt when the database changes
+    """
+    signature: tuple
+    version: str
+    ids: np.ndarray
+    coords: np.ndarray
+    json: tuple[str, str]
+
 
 class PlotService:
     
-    def __init__(self) -> None:
-        self.scatter_3d = Scatter3D()
+    def __init__(self, projection: str|None = None, compact: bool|None = None) -> None:
+        """
+        Args:
+            projection (str, optional): Query placement mode, 'interpolate', 'parametric' or
+                'exact' (see `Reductor`). Default to settings.PROJECTION_MODE
+            compact (bool, optional): Typed arrays in the plot JSON (see `Scatter3D`).
+                Default to settings.PLOT_COMPACT
+        """
+        self.scatter_3d = Scatter3D(compact=settings.PLOT_COMPACT if compact is None else compact)
         self.vectorizer = Vectorizer()
         self.reductor = Reductor()
         self.document_db = db
+        self.projection = projection or settings.PROJECTION_MODE
+
+        self._base: PlotBase|None = None
+        self._base_lock = threading.Lock()
+        self._mapper_lock = threading.Lock()
+
+        # Precompute the chunks trace at startup
+        try:
+            self.get_base()
+        except Exception as e:
+            print(f"Could not build the base scatterplot: {e}")
+
+    def get_base(self) -> PlotBase:
+        """
+        Get the static part of the scatterplot (every chunk projection), rebuilt
+        only if the database changed since it was built
+
+        Returns:
+            PlotBase: Chunk IDs (sorted), their projections, the serialized trace and layout and their version
+        """
+        signature = self.document_db.signature()
+        base = self._base
+        if base is not None and base.signature == signature:
+            return base
+
+        with self._base_lock:
+            # Another thread may have rebuilt it while we were waiting
+            base = self._base
+            if base is not None and base.signature == signature:
+                return base
+
+            with self.document_db.reader() as conn:
+                ids, _, coords = self.document_db.get_projections(conn)
+
+            order = np.argsort(ids)
+            ids, coords = ids[order], coords[order]
+
+            base = PlotBase(
+                signature=signature,
+                version=hashlib.sha1(repr(signature).encode()).hexdigest()[:16],
+                ids=ids,
+                coords=coords,
+                json=self.scatter_3d.base_json(ids, coords)
+            )
+            self._base = base
+
+        return base
+
+    def project_query(self, query: str, chunks: list[ChunkRef], base: PlotBase) -> np.ndarray:
+        """
+        Place the query in the chunks 3d space (see `Reductor`)
+
+        Args:
+            query (str): User LLM query
+            chunks (list[ChunkRef]): References to the chunks used for RAG
+            base (PlotBase): Chunk projections
+
+        Returns:
+            np.ndarray: Query 3d projection (1, 3)
+        """
+        match self.projection:
+            case 'exact':
+                return self.reductor.transform(self.vectorizer.generate_embeddings(query))
+            case 'parametric':
+                if self.reductor.mapper is None:
+                    # Fitted once, concurrent first requests wait for it
+                    with self._mapper_lock:
+                        if self.reductor.mapper is None:
+                            self.fit_mapper()
+                return self.reductor.transform_parametric(self.vectorizer.generate_embeddings(query))
+            case 'interpolate':
+                # Reuse the distances of the retrieved chunks, else search the nearest chunks
+                ids = np.asarray([chunk.id for chunk in chunks if chunk.distance is not None], dtype=np.int64)
+                distances = np.asarray([chunk.distance for chunk in chunks if chunk.distance is not None], dtype=np.float32)
+
+                positions, found = self._positions(base, ids)
+                if len(positions) == 0:
+                    query_emb = self.vectorizer.generate_embeddings(query)
+                    with self.document_db.reader() as conn:
+                        ids, distances = self.document_db.get_nearest_ids(
+                            query_emb, settings.PROJECTION_NEIGHBORS, conn
+                        )
+                    positions, found = self._positions(base, ids)
+
+                    if len(positions) == 0:
+                        # No projected chunk to interpolate from (empty database or chunks not placed yet)
+                        if self.reductor.mapper is not None:
+                            return self.reductor.transform_parametric(query_emb)
+                        if self.reductor.model is not None:
+                            return self.reductor.transform(query_emb)
+                        return np.zeros((1, 3), dtype=np.float32)
+
+                return self.reductor.interpolate(distances[found], base.coords[positions])
+            case _:
+                raise ValueError(f"Unknown projection mode '{self.projection}'")
+
+    def fit_mapper(self) -> None:
+        """
+        Fit the parametric mapper on the stored chunk embeddings and projections
+        (for a t-SNE fitted without it)
+        """
+        with self.document_db.reader() as conn:
+            ids, _, embeddings = self.document_db.get_embeddings(conn)
+            ids_3d, _, coords = self.document_db.get_projections(conn)
 
-    def project(self, query: str, chunks: list[Chunk]) -> str:
+        # Align both matrices on chunk IDs
+        embeddings = embeddings[np.argsort(ids)]
+        coords = coords[np.argsort(ids_3d)]
+
+        self.reductor.fit_mapper(embeddings, coords)
+
+    @staticmethod
+    def _positions(base: PlotBase, ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
         """
-        Create a 3d scatterplot of query and RAG chunks embeddings
+        Positions of chunk IDs in the (sorted) base IDs
+
+        Args:
+            base (PlotBase): Chunk projections
+            ids (np.ndarray): Chunk IDs
+
+        Returns:
+            np.ndarray: Positions in `base.ids` and `base.coords` of the found IDs, in the order of `ids`
+            np.ndarray: Mask of the found IDs
+        """
+        if len(base.ids) == 0:
+            return np.empty(0, dtype=np.int64), np.zeros(len(ids), dtype=bool)
+
+        positions = np.minimum(np.searchsorted(base.ids, ids), len(base.ids) - 1)
+        found = base.ids[positions] == ids
+        return positions[found], found
+
+    def project(
+            self,
+            query: str,
+            chunks: list[ChunkRef],
+            base_version: str|None = None
+        ) -> tuple[str, str, bool]:
+        """
+        Create a 3d scatterplot of query and RAG chunks embeddings. Only the query and
+        context chunks overlay is computed, the chunks trace is cached (see `get_base`).
 
         Args:
             query (str): User LLM query
-            chunks (list[Chunk]): List of chunks used for RAG
+            chunks (list[ChunkRef]): References to the chunks used for RAG
+            base_version (str, optional): Version of the base figure held by the client.
+                If it is still current, only the overlay traces are returned. Default to None
 
         Returns:
-            str: Plotly json plot
+            str: Plotly json plot, or json list of overlay traces if delta
+            str: Version of the base figure
+            bool: True if only the overlay traces are returned (delta)
         """
-        query_emb = self.vectorizer.generate_embeddings(query)
-        query_emb_3d = self.reductor.transform(query_emb)
+        base = self.get_base()
+        query_emb_3d = self.project_query(query, chunks, base)
+
+        # Projections of the context chunks, looked up in the sorted base IDs
+        selected_chunk_ids = np.asarray([chunk.id for chunk in chunks], dtype=np.int64)
+        positions, _ = self._positions(base, selected_chunk_ids)
 
-        with self.document_db.connect() as conn:
-            all_chunks = self.document_db.get_chunks(conn)
-        
-        selected_chunk_ids = [chunk.id for chunk in chunks if chunk.id is not None]
+        overlay_json = self.scatter_3d.overlay_json(base.coords[positions], query_emb_3d[0])
 
-        fig_json = self.scatter_3d.plot(
-            chunks=all_chunks,
-            query_emb=query_emb_3d[0],
-            highlight_ids=selected_chunk_ids
-        )
+        if base_version == base.version:
+            return overlay_json, base.version, True
 
-        return fig_json
\ No newline at end of file
+        return self.scatter_3d.combine(base.json, overlay_json), base.version, False
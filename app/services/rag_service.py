@@ -1,6 +1,15 @@
-from app.rag import VectorStore, LLMHandler
+import uuid
+from typing import Any, AsyncGenerator, Hashable
+
+import numpy as np
+from starlette.concurrency import run_in_threadpool
+
+from app.rag import VectorStore, LLMHandler, SemanticCache
+from app.rag.llm import LLMSession
 from app.exceptions import UnsafeRequestException
 from app.models import Context
+from app.services.executor import run_cpu
+from app.config import settings
 
 
 
@@ -11,11 +20,81 @@ class RagService:
         self.vector_store = VectorStore()
         self.llm_handler = LLMHandler()
 
+        self.answer_cache: SemanticCache[tuple[str, Context|None]]|None = None
+        if settings.ANSWER_CACHE:
+            self.answer_cache = SemanticCache(
+                maxsize=settings.ANSWER_CACHE_SIZE,
+                threshold=settings.ANSWER_CACHE_THRESHOLD,
+                ttl=settings.ANSWER_CACHE_TTL
+            )
+        self._signature: tuple|None = None
+        self._version: int|None = None
+
+    def _chunk_version(self) -> Hashable:
+        """
+        Version of the chunk set, the answer cache is cleared when it changes
+
+        Returns:
+            int: Chunk version (see `DocumentDB.get_chunk_version`)
+        """
+        document_db = self.vector_store.document_db
+
+        # Only read the version when the DB files changed
+        signature = document_db.signature()
+        if signature != self._signature:
+            with document_db.reader() as conn:
+                self._version = document_db.get_chunk_version(conn)
+            self._signature = signature
+
+        return self._version
+
+    def _lookup_answer(
+            self,
+            query: str,
+            session: LLMSession
+            ) -> tuple[tuple[np.ndarray, Hashable]|None, tuple[str, Context|None]|None]:
+        """
+        Look for a cached answer to a near-duplicate question. Only first-turn
+        messages use the cache, later ones depend on the conversation.
+
+        Args:
+            query (str): User query
+            session (LLMSession): Chat bot session
+
+        Returns:
+            tuple[np.ndarray, Hashable]|None: Cache key (query embedding, chunk version) to store the answer, None if not cacheable
+            tuple[str, Context|None]|None: Cached LLM response and a new context for `query`, None on a miss
+        """
+        if self.answer_cache is None or not session.is_first_turn:
+            return None, None
+
+        # Query embeddings are cached, retrieval won't compute it again on a miss
+        embedding = self.vector_store.vectorizer.generate_embeddings(query)
+        version = self._chunk_version()
+
+        cached = self.answer_cache.get(embedding, version)
+        if cached is not None and cached[1] is not None:
+            # Each session gets its own copy of the context, for the current query
+            response, context = cached
+            cached = response, context.model_copy(update={'id': str(uuid.uuid4()), 'query': query}, deep=True)
+
+        return (embedding, version), cached
+
+    def _store_answer(
+            self,
+            key: tuple[np.ndarray, Hashable]|None,
+            response: str,
+            context: Context|None
+            ) -> None:
+        if self.answer_cache is not None and key is not None:
+            embedding, version = key
+            self.answer_cache.set(embedding, (response, context), version)
+
     def make_query(
             self, 
             query: str, 
             session_id: str
-            ) -> tuple[str, Context|None]:
+            ) -> tuple[str, Context|None, int]:
         """
         Process RAG, set conversation if provided and make a query to the LLM
 
@@ -26,10 +105,18 @@ class RagService:
         Returns:
             str: LLM response
             Context|None: Context object used for query
+            int: Tokens of the prompt sent to the LLM (0 for a cached answer)
         """
         # Retrieve LLM session
         session = self.llm_handler.get_session(session_id)
 
+        # Answer near-duplicate first questions from cache
+        key, cached = self._lookup_answer(query, session)
+        if cached is not None:
+            session.add_exchange(query, *cached)
+            self.llm_handler.save_session(session)
+            return *cached, 0
+
         # Retrieve related document chunks (RAG)
         related_chunks = self.vector_store.search(query)
 
@@ -39,10 +126,113 @@ class RagService:
             context = session.build_context(query, related_chunks)
 
         # Query LLM
-        response = session.send_message(
+        response, prompt_tokens = session.send_message(
             query, 
             context=context
         )
+        self.llm_handler.save_session(session)
+        self._store_answer(key, response, context)
+
+        return response, context, prompt_tokens
+
+    async def make_query_async(
+            self,
+            query: str,
+            session_id: str
+            ) -> tuple[str, Context|None, int]:
+        """
+        Same as `make_query` without blocking the event loop: retrieval runs in the
+        CPU executor and the LLM call is awaited on the shared async HTTP pool
+
+        Args:
+            query (str): User query
+            session_id (str): UUID of the chat bot session
+
+        Returns:
+            str: LLM response
+            Context|None: Context object used for query
+            int: Tokens of the prompt sent to the LLM (0 for a cached answer)
+        """
+        # Retrieve LLM session (the SQLite session store blocks)
+        session = await run_in_threadpool(self.llm_handler.get_session, session_id)
+
+        # Answer near-duplicate first questions from cache
+        key, cached = await run_cpu(self._lookup_answer, query, session)
+        if cached is not None:
+            session.add_exchange(query, *cached)
+            self.llm_handler.save_session(session)
+            return *cached, 0
+
+        # Retrieve related document chunks (RAG)
+        related_chunks = await run_cpu(self.vector_store.search, query)
+
+        # Build RAG prompt from chunks
+        context = None
+        if related_chunks:
+            context = session.build_context(query, related_chunks)
+
+        # Query LLM
+        response, prompt_tokens = await session.send_message_async(
+            query,
+            context=context
+        )
+        self.llm_handler.save_session(session)
+        self._store_answer(key, response, context)
+
+        return response, context, prompt_tokens
+
+    async def make_query_stream(
+            self,
+            query: str,
+            session_id: str
+            ) -> AsyncGenerator[tuple[str, Any], None]:
+        """
+        Streaming variant of `make_query_async`: the context is yielded as soon as
+        retrieval is done, then the LLM response text as it is generated
+
+        Args:
+            query (str): User query
+            session_id (str): UUID of the chat bot session
+
+        Yields:
+            tuple[str, Context|None]: ('context', context object used for query), first
+            tuple[str, str]: ('token', raw Markdown chunk of the LLM response), as generated
+            tuple[str, int]: ('prompt_tokens', tokens of the prompt sent to the LLM, 0 for a cached answer)
+            tuple[str, str]: ('response', whole LLM response as plain text), last
+        """
+        # Retrieve LLM session (the SQLite session store blocks)
+        session = await run_in_threadpool(self.llm_handler.get_session, session_id)
+
+        # Answer near-duplicate first questions from cache
+        key, cached = await run_cpu(self._lookup_answer, query, session)
+        if cached is not None:
+            session.add_exchange(query, *cached)
+            self.llm_handler.save_session(session)
+            yield 'context', cached[1]
+            yield 'token', cached[0]
+            yield 'prompt_tokens', 0
+            yield 'response', cached[0]
+            return
+
+        # Retrieve related document chunks (RAG)
+        related_chunks = await run_cpu(self.vector_store.search, query)
+
+        # Build RAG prompt from chunks
+        context = None
+        if related_chunks:
+            context = session.build_context(query, related_chunks)
+
+        yield 'context', context
 
-        return response, context
+        # Stream LLM response
+        response = None
+        try:
+            async for kind, value in session.send_message_stream(query, context=context):
+                if kind == 'response':
+                    response = value
+                yield kind, value
+        finally:
+            self.llm_handler.save_session(session)
 
+        if response is not None:
+            self._store_answer(key, response, context)
@@ -0,0 +1,95 @@
+import os
+
+# Settings require an API key, no request reaches the Mistral API in the tests
+os.environ.setdefault("mistral_api_key", "test")
+
+import runpy
+import zlib
+
+import numpy as np
+import pytest
+
+from app.config import settings
+from app.database import db
+from app.models import Chunk, Document
+from app.rag import registry, embedding_cache, chunk_cache
+
+
+class FakeEmbeddingModel:
+    """Bag of words embeddings, like `SentenceTransformer.encode`: texts sharing words are close"""
+
+    dimension = 384
+
+    def _encode(self, text: str) -> np.ndarray:
+        embedding = np.zeros(self.dimension, dtype=np.float32)
+        for word in text.lower().split():
+            rng = np.random.default_rng(zlib.crc32(word.encode()))
+            embedding += rng.standard_normal(self.dimension).astype(np.float32)
+        norm = np.linalg.norm(embedding)
+        return embedding / norm if norm else embedding
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        if isinstance(texts, str):
+            return self._encode(texts)
+        return np.stack([self._encode(text) for text in texts])
+
+
+class FakeCrossEncoder:
+    """Scores every pair 0, above the reranking threshold"""
+
+    def predict(self, pairs, **kwargs) -> np.ndarray:
+        return np.zeros(len(pairs), dtype=np.float32)
+
+
+@pytest.fixture
+def data_path(tmp_path, monkeypatch) -> str:
+    """DATA_PATH with an empty document database (`_scripts/create_db.py`), used by `db`"""
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("data/db")
+    runpy.run_module("app._scripts.create_db")
+
+    path = str(tmp_path / "data")
+    monkeypatch.setattr(settings, "DATA_PATH", path)
+    monkeypatch.setattr(db, "db_path", os.path.join(path, db.path))
+    chunk_cache.clear()
+
+    yield path
+
+    db.close()
+    chunk_cache.clear()
+
+
+@pytest.fixture
+def fake_models(monkeypatch) -> FakeEmbeddingModel:
+    """Stub embedding and cross-encoder models, no model is downloaded"""
+    model = FakeEmbeddingModel()
+    monkeypatch.setattr(registry, "get_embedding_model", lambda name: model)
+    monkeypatch.setattr(registry, "get_cross_encoder", lambda name: FakeCrossEncoder())
+    embedding_cache.clear()
+
+    yield model
+
+    embedding_cache.clear()
+
+
+@pytest.fixture
+def add_document(data_path):
+    """Write a document and its chunks in `db`, returns the created chunk IDs"""
+
+    def add(name: str, embeddings: np.ndarray, contents: list[str]|None = None) -> list[int]:
+        with db.writer() as conn:
+            document_id, = db.add_documents([Document(name=name, category="tests")], conn)
+            return db.add_chunks(
+                (
+                    Chunk(
+                        document_id=document_id,
+                        content=content,
+                        emb_384d=embedding,
+                        emb_3d=np.zeros(3, dtype=np.float32)
+                    )
+                    for content, embedding in zip(contents or [f"{name} {i}" for i in range(len(embeddings))], embeddings)
+                ),
+                conn
+            )
+
+    return add
@@ -0,0 +1,62 @@
+import pytest
+
+from app.config import settings
+from app.rag.llm import LLMSession
+from app.services import RagService
+
+
+CONTENTS = ["étudiant en master data science à Lyon", "passionné de ski et de trampoline à Annecy"]
+
+
+@pytest.fixture
+def rag_service(data_path, fake_models, add_document, monkeypatch):
+    add_document("cv", fake_models.encode(CONTENTS), CONTENTS)
+    monkeypatch.setattr(settings, "ANSWER_CACHE", True)
+    monkeypatch.setattr(settings, "VECTOR_INDEX", "sqlite")
+
+    # One LLM call per answer, counted
+    calls = []
+
+    def send_message(self, message, context=None):
+        calls.append(message)
+        self.add_exchange(message, f"answer {len(calls)}")
+        return f"answer {len(calls)}", 12
+
+    monkeypatch.setattr(LLMSession, "send_message", send_message)
+
+    service = RagService()
+    service.calls = calls #type: ignore
+    yield service
+    service.llm_handler.close()
+
+
+def test_cached_answer_gets_its_own_context(rag_service):
+    first = rag_service.llm_handler.create_session()
+    second = rag_service.llm_handler.create_session()
+
+    response, context, prompt_tokens = rag_service.make_query("master à Lyon ?", first.id)
+    assert (response, prompt_tokens) == ("answer 1", 12)
+    assert context is not None
+
+    # Same normalized query: answered from the cache
+    cached_response, cached_context, prompt_tokens = rag_service.make_query("master  à Lyon ?", second.id)
+    assert (cached_response, prompt_tokens) == ("answer 1", 0)
+    assert rag_service.calls == ["master à Lyon ?"]
+
+    assert cached_context.id != context.id
+    assert cached_context.query == "master  à Lyon ?"
+    assert cached_context.chunks == context.chunks
+    assert second.get_context(cached_context.id) is cached_context
+    assert first.get_context(context.id).query == "master à Lyon ?"
+
+
+def test_cache_is_invalidated_by_new_chunks(rag_service, fake_models, add_document):
+    rag_service.make_query("master à Lyon ?", rag_service.llm_handler.create_session().id)
+    rag_service.make_query("master à Lyon ?", rag_service.llm_handler.create_session().id)
+    assert len(rag_service.calls) == 1
+
+    add_document("projects", fake_models.encode(["master project in Lyon"]), ["master project in Lyon"])
+
+    response, _, prompt_tokens = rag_service.make_query("master à Lyon ?", rag_service.llm_handler.create_session().id)
+    assert (response, prompt_tokens) == ("answer 2", 12)
+    assert len(rag_service.calls) == 2
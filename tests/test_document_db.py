@@ -0,0 +1,41 @@
+import numpy as np
+
+from app.database import db
+
+
+def random_embeddings(n: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, 384)).astype(np.float32)
+
+
+def test_chunk_ids_are_not_reused_after_delete(add_document):
+    first = add_document("first", random_embeddings(3, 0))
+    second = add_document("second", random_embeddings(2, 1))
+    assert first + second == [1, 2, 3, 4, 5]
+
+    with db.writer() as conn:
+        version = db.get_chunk_version(conn)
+        assert db.delete_documents([db.get_document(conn)[-1].id], conn) == 2 #type: ignore
+        deleted_version = db.get_chunk_version(conn)
+
+    # Same count and highest chunk ID as before the delete, but new IDs and version
+    third = add_document("third", random_embeddings(2, 2))
+    with db.reader() as conn:
+        assert db.get_chunk_stats(conn) == (5, 7)
+        assert db.get_chunk_version(conn) > deleted_version > version
+
+    assert third == [6, 7]
+
+
+def test_delete_chunks_bumps_the_version(add_document):
+    add_document("doc", random_embeddings(2, 0))
+
+    with db.writer() as conn:
+        version = db.get_chunk_version(conn)
+        document_id = db.get_document(conn)[0].id
+        assert db.delete_chunks([document_id], conn) == 2 #type: ignore
+        assert db.get_chunk_version(conn) > version
+
+        # Nothing deleted: unchanged
+        version = db.get_chunk_version(conn)
+        assert db.delete_chunks([document_id], conn) == 0 #type: ignore
+        assert db.get_chunk_version(conn) == version
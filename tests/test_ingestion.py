@@ -0,0 +1,63 @@
+import os
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+
+
+@pytest.fixture(params=["sqlite", "flat", "ivf"])
+def client(request, data_path, fake_models, monkeypatch):
+    monkeypatch.setattr(settings, "VECTOR_INDEX", request.param)
+    with TestClient(app) as client:
+        yield client
+
+
+def wait(client: TestClient, job_id: str, timeout: float = 30) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/api/documents/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(.05)
+    raise TimeoutError(f"Ingestion job {job_id} still running")
+
+
+def test_uploaded_documents_are_searchable(client, data_path):
+    files = [
+        ("files", ("zebra.txt", b"The zebra migration happens every spring near the lake.")),
+        ("files", ("notes.md", b"# Notes\n\nSki and trampoline videos in Annecy.")),
+    ]
+    response = client.post("/api/documents", files=files, data={"category": "uploads"})
+    assert response.status_code == 202
+
+    job = wait(client, response.json()["job_id"])
+    assert job["status"] == "done", job["error"]
+    assert job["documents"] == {"added": 2, "modified": 0, "unchanged": 0}
+    assert job["chunks"] == 2
+
+    # Kept with the other documents, the spooled upload is removed
+    assert sorted(os.listdir(os.path.join(data_path, "files", "uploads"))) == ["notes.md", "zebra.txt"]
+    assert os.listdir(os.path.join(data_path, "uploads")) == []
+
+    vector_store = app.state.rag_service.vector_store
+    chunks = vector_store.search("zebra migration spring")
+    assert chunks[0].source.name == "zebra"
+
+    # Re-uploaded unchanged: nothing embedded
+    response = client.post("/api/documents", files=files[:1], data={"category": "uploads"})
+    job = wait(client, response.json()["job_id"])
+    assert job["documents"] == {"added": 0, "modified": 0, "unchanged": 1}
+    assert job["chunks"] == 0
+
+
+def test_invalid_uploads_are_rejected(client):
+    response = client.post("/api/documents", files=[("files", ("run.exe", b".."))])
+    assert response.status_code == 422
+
+    response = client.post("/api/documents", files=[("files", ("a.txt", b".."))], data={"category": "../etc"})
+    assert response.status_code == 422
+
+    assert client.get("/api/documents/unknown").status_code == 404
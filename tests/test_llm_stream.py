@@ -0,0 +1,120 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from mistralai.models import AssistantMessage
+
+from app.parser import ParseMD
+from app.rag.llm import LLMSession
+
+
+REPLY = """Voici **un texte en gras
+sur deux lignes** ok.
+
+Para un.
+
+Para deux.
+
+```python
+print("code")
+```
+
+- premier point
+- second *point*
+
+1. un
+2. deux 😀
+"""
+
+
+class FakeStream:
+    """Async context manager over chat completion events, like `chat.stream_async`"""
+
+    def __init__(self, deltas: list[str], error: Exception|None = None) -> None:
+        self.deltas = deltas
+        self.error = error
+
+    async def __aenter__(self):
+        return self.events()
+
+    async def __aexit__(self, *exc_info) -> None:
+        return None
+
+    async def events(self):
+        for delta in self.deltas:
+            yield SimpleNamespace(data=SimpleNamespace(
+                usage=None,
+                choices=[SimpleNamespace(delta=SimpleNamespace(content=delta))]
+            ))
+        if self.error is not None:
+            raise self.error
+
+
+def split(text: str, size: int) -> list[str]:
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.fixture
+def session(monkeypatch) -> LLMSession:
+    session = LLMSession()
+    stream = FakeStream(split(REPLY, 3))
+
+    async def stream_async(**kwargs):
+        return stream
+
+    client = SimpleNamespace(chat=SimpleNamespace(stream_async=stream_async))
+    monkeypatch.setattr(LLMSession, "client", property(lambda self: client))
+    session.stream = stream #type: ignore
+    return session
+
+
+async def collect(session: LLMSession, message: str, limit: int|None = None) -> list[tuple[str, str]]:
+    events = []
+    stream = session.send_message_stream(message)
+    try:
+        async for event in stream:
+            events.append(event)
+            if limit is not None and len(events) >= limit:
+                break
+    finally:
+        await stream.aclose()
+    return events
+
+
+def test_stream_matches_full_parse(session):
+    events = asyncio.run(collect(session, "Bonjour"))
+
+    tokens = [text for kind, text in events if kind == 'token']
+    responses = [text for kind, text in events if kind == 'response']
+    prompt_tokens = [count for kind, count in events if kind == 'prompt_tokens']
+
+    assert "".join(tokens) == REPLY
+    assert events[-1][0] == 'response'
+    assert responses == [ParseMD.from_string(REPLY, remove_emojis=True)]
+    # Multi-line bold, code fences and paragraph breaks are parsed as in `send_message`
+    assert "**" not in responses[0] and "```" not in responses[0]
+    assert "Para un.\nPara deux." in responses[0]
+    # Estimated, the fake stream reports no usage
+    assert prompt_tokens == [LLMSession.estimate_tokens(session.messages[:-1])]
+
+    assert isinstance(session.messages[-1], AssistantMessage)
+    assert session.messages[-1].content == REPLY
+
+
+def test_failed_stream_keeps_history(session):
+    history = list(session.messages)
+    session.stream.error = RuntimeError("LLM error") #type: ignore
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(collect(session, "Bonjour"))
+
+    assert session.messages == history
+
+
+def test_disconnected_stream_keeps_history(session):
+    history = list(session.messages)
+
+    events = asyncio.run(collect(session, "Bonjour", limit=2))
+
+    assert [kind for kind, _ in events] == ['token', 'token']
+    assert session.messages == history
@@ -0,0 +1,99 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.rag import session_store
+from app.rag.session_store import SQLiteSessionStore
+
+
+class Clock:
+    """Wall clock of the session store, moved forward by the tests"""
+
+    def __init__(self) -> None:
+        self.now = time.time()
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(session_store, "time", SimpleNamespace(
+        time=clock.time,
+        time_ns=time.time_ns,
+        monotonic=time.monotonic,
+        sleep=time.sleep
+    ))
+    return clock
+
+
+def make_store(**kwargs) -> SQLiteSessionStore[dict]:
+    # Background threads are not started, the tests flush and sweep themselves
+    return SQLiteSessionStore(dump=dict, load=dict, **kwargs)
+
+
+def test_new_session_is_visible_to_other_processes(data_path):
+    first, second = make_store(), make_store()
+
+    first.set("a", {"messages": 1})
+
+    assert second.get("a") == {"messages": 1}
+
+
+def test_concurrent_update_is_detected(data_path):
+    first, second = make_store(), make_store()
+    first.set("a", {"messages": 1})
+
+    session_first = first.get("a")
+    session_second = second.get("a")
+    session_first["messages"] = 2 #type: ignore
+    session_second["messages"] = 3 #type: ignore
+
+    first.save("a")
+    assert first.flush() == 1
+
+    # Loaded before the first write: not written, the local changes are dropped
+    second.save("a")
+    assert second.flush() == 0
+    assert second.get("a") == {"messages": 2}
+
+    # Reloaded: its next update is written
+    session_second = second.get("a")
+    session_second["messages"] = 4 #type: ignore
+    second.save("a")
+    assert second.flush() == 1
+    assert first.get("a") == {"messages": 4}
+
+
+def test_idle_sessions_expire(data_path, clock):
+    store = make_store(ttl=60)
+    store.set("read", {})
+    store.set("idle", {})
+
+    clock.now += 45
+    # Reads count as access, written by the sweeper
+    assert store.get("read") == {}
+    assert store.sweep() == 0
+
+    clock.now += 45
+    assert store.sweep() == 1
+    assert store.get("read") == {}
+    assert store.get("idle") is None
+    assert store.expired == 1
+
+
+def test_least_recently_used_sessions_are_evicted_without_ttl(data_path, clock):
+    store = make_store(ttl=None, max_sessions=2)
+    for id in ("a", "b", "c"):
+        store.set(id, {})
+        clock.now += 1
+
+    clock.now += 1
+    store.get("a")
+
+    assert store.sweep() == 1
+    assert store.get("b") is None
+    assert store.get("a") == {} and store.get("c") == {}
+    assert store.evicted == 1
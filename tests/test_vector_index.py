@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from app.database import db
+from app.rag import FlatIndex, IVFIndex
+
+
+@pytest.fixture
+def embeddings(add_document) -> np.ndarray:
+    # Clustered embeddings, like document chunks
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((8, 384))
+    embeddings = (centers[rng.integers(0, 8, 400)] + .5 * rng.standard_normal((400, 384))).astype(np.float32)
+
+    for i in range(4):
+        add_document(f"doc{i}", embeddings[i * 100:(i + 1) * 100])
+
+    return embeddings
+
+
+def test_index_results_match(embeddings):
+    queries = embeddings[[0, 150, 399]] + .1 * np.random.default_rng(1).standard_normal((3, 384)).astype(np.float32)
+
+    with db.reader() as conn:
+        flat = FlatIndex.from_db(db, conn)
+        ivf = IVFIndex.from_db(db, conn)
+        # Every cluster scanned: exact
+        ivf.nprobe = ivf.nlist
+
+        for query in queries:
+            flat_ids, flat_distances = flat.search(query, 10)
+            ivf_ids, ivf_distances = ivf.search(query, 10)
+            knn = db.get_k_nearest(query, 10, conn, mode='knn')
+            scan = db.get_k_nearest(query, 10, conn, mode='scan')
+
+            assert flat_ids.tolist() == ivf_ids.tolist()
+            assert [chunk.id for chunk in knn] == flat_ids.tolist()
+            assert [chunk.id for chunk in scan] == flat_ids.tolist()
+            np.testing.assert_allclose(ivf_distances, flat_distances, atol=1e-5)
+            np.testing.assert_allclose([chunk.distance for chunk in knn], flat_distances, atol=1e-5)
+
+
+def test_ivf_index_is_rebuilt_on_version_change(embeddings, add_document):
+    with db.reader() as conn:
+        IVFIndex.from_db(db, conn).save()
+
+    with db.reader() as conn:
+        assert IVFIndex.load(db, conn).version == db.get_chunk_version(conn)
+
+    ids = add_document("new", embeddings[:5])
+
+    with db.reader() as conn:
+        index = IVFIndex.load(db, conn)
+        assert index.version == db.get_chunk_version(conn)
+        assert set(ids) <= set(index.chunk_ids.tolist())